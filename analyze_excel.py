@@ -1,44 +1,64 @@
+import argparse
 import pandas as pd
 import sys
 
-def analyze_excel(filename):
+from excel_parsing import parse_workbook_cached
+
+# Формат сводки листа в кэше; менять при изменении summarize_sheet
+ANALYSIS_CACHE_KIND = "analysis-v1"
+
+def summarize_sheet(filename, sheet):
+    """Сводка одного листа (выполняется в отдельном процессе)"""
+    df = pd.read_excel(filename, sheet_name=sheet)
+    return {
+        "rows": df.shape[0],
+        "columns": [str(col) for col in df.columns],
+        "head": None if df.empty else df.head(5).to_string(),
+    }
+
+def analyze_excel(filename, workers=None, use_cache=True):
     """Анализирует Excel-файл и выводит информацию о листах и их содержимом"""
     print(f"Анализ файла: {filename}")
-    
+
     # Загружаем Excel-файл
     try:
-        # Получаем имена всех листов в файле
-        xlsx = pd.ExcelFile(filename)
-        sheet_names = xlsx.sheet_names
-        
-        print(f"\nФайл содержит {len(sheet_names)} листов:")
+        # Листы разбираются параллельно, сводка кэшируется по хэшу файла
+        summaries, from_cache = parse_workbook_cached(
+            filename, ANALYSIS_CACHE_KIND, lambda sheet_names: sheet_names, summarize_sheet,
+            workers=workers, use_cache=use_cache
+        )
+        sheet_names = list(summaries)
+
+        print(f"\nФайл содержит {len(sheet_names)} листов:" + (" (из кэша)" if from_cache else ""))
         for i, sheet in enumerate(sheet_names, 1):
             print(f"{i}. {sheet}")
-        
-        # Анализируем каждый лист
+
+        # Выводим сводку по каждому листу
         for sheet in sheet_names:
+            summary = summaries[sheet]
             print(f"\n=== Лист: {sheet} ===")
-            
-            # Загружаем данные листа
-            df = pd.read_excel(filename, sheet_name=sheet)
-            
+
             # Базовая информация о листе
-            print(f"Размеры: {df.shape[0]} строк, {df.shape[1]} столбцов")
+            print(f"Размеры: {summary['rows']} строк, {len(summary['columns'])} столбцов")
             print("Столбцы:")
-            for col in df.columns:
+            for col in summary["columns"]:
                 print(f"  - {col}")
-            
+
             # Показываем первые несколько строк (если данные есть)
-            if not df.empty:
+            if summary["head"] is not None:
                 print("\nПервые 5 строк:")
-                print(df.head(5).to_string())
-            
+                print(summary["head"])
+
             print('-' * 80)
-            
+
     except Exception as e:
         print(f"Ошибка при анализе файла: {e}")
         return
 
 if __name__ == "__main__":
-    file_path = "ОФС стандартизированная полностью_v2.xlsx"
-    analyze_excel(file_path) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Анализ листов Excel-файла")
+    parser.add_argument("file", nargs="?", default="ОФС стандартизированная полностью_v2.xlsx")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для разбора листов")
+    parser.add_argument("--no-cache", action="store_true", help="разобрать файл заново, не используя кэш")
+    args = parser.parse_args()
+    analyze_excel(args.file, workers=args.workers, use_cache=not args.no_cache)
@@ -0,0 +1,56 @@
+"""Invitation codes table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Коды приглашений Telegram-бота (раньше хранились в памяти процесса)
+    op.create_table(
+        'invitation_codes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=16), nullable=False),
+        sa.Column('telegram_id', sa.String(length=64), nullable=False),
+        sa.Column('user_full_name', sa.String(length=255), nullable=True),
+        sa.Column('position_id', sa.Integer(), nullable=False),
+        sa.Column('position_name', sa.String(length=255), nullable=True),
+        sa.Column('division_id', sa.Integer(), nullable=True),
+        sa.Column('division_name', sa.String(length=255), nullable=True),
+        sa.Column('organization_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('is_used', sa.Boolean(), nullable=False),
+        sa.Column('used_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Создаем индексы
+    op.create_index(op.f('ix_invitation_codes_id'), 'invitation_codes', ['id'], unique=False)
+    op.create_index(op.f('ix_invitation_codes_code'), 'invitation_codes', ['code'], unique=True)
+    op.create_index(op.f('ix_invitation_codes_telegram_id'), 'invitation_codes', ['telegram_id'], unique=False)
+    op.create_index(op.f('ix_invitation_codes_expires_at'), 'invitation_codes', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Удаляем индексы
+    op.drop_index(op.f('ix_invitation_codes_expires_at'), table_name='invitation_codes')
+    op.drop_index(op.f('ix_invitation_codes_telegram_id'), table_name='invitation_codes')
+    op.drop_index(op.f('ix_invitation_codes_code'), table_name='invitation_codes')
+    op.drop_index(op.f('ix_invitation_codes_id'), table_name='invitation_codes')
+    # Удаляем таблицу
+    op.drop_table('invitation_codes')
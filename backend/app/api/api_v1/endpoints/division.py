@@ -1,5 +1,6 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, models, schemas
 from app.api import deps
@@ -37,16 +38,27 @@ async def get_divisions(
     
     return divisions
 
-@router.get("/tree", response_model=List[schemas.Division])
+@router.get("/tree", response_model=List[schemas.DivisionWithChildren])
 async def get_division_tree(
     db: AsyncSession = Depends(deps.get_db),
+    organization_id: int = Query(..., description="ID организации"),
+    include_inactive: bool = Query(False, description="Включать неактивные отделы"),
+    include_sections: bool = Query(False, description="Добавить к отделам секции и их функции"),
+    stream: bool = Query(False, description="Отдавать дерево потоком, по одному корневому отделу"),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Получить дерево подразделений.
     """
-    divisions = await crud.division.get_tree(db)
-    return divisions
+    tree = await crud.division.get_division_tree(
+        db,
+        organization_id=organization_id,
+        include_inactive=include_inactive,
+        include_leaves=include_sections,
+    )
+    if stream:
+        return StreamingResponse(crud.division.iter_tree_json(tree), media_type="application/json")
+    return tree
 
 @router.post("/", response_model=schemas.Division)
 async def create_division(
@@ -1,5 +1,6 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -33,18 +34,48 @@ async def read_organizations(
     )
     return organizations
 
+def _compact_tree(nodes: List[models.Organization]) -> List[dict]:
+    """
+    Компактное представление дерева: только поля, нужные для отрисовки,
+    без пустых списков children
+    """
+    result = []
+    for org in nodes:
+        node = {
+            "id": org.id,
+            "name": org.name,
+            "code": org.code,
+            "org_type": org.org_type,
+            "is_active": org.is_active,
+        }
+        children = getattr(org, "children", None)
+        if children:
+            node["children"] = _compact_tree(children)
+        result.append(node)
+    return result
+
 @router.get("/tree", response_model=List[schemas.OrganizationWithChildren])
 async def get_organization_tree(
     db: AsyncSession = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_optional_current_active_user),
     active_only: bool = True,
+    root_id: Optional[int] = None,
+    max_depth: Optional[int] = Query(None, ge=0),
+    compact: bool = False,
 ) -> Any:
     """
     Получить древовидную структуру организаций.
+    root_id - вернуть только поддерево этой организации, max_depth - ограничить число
+    уровней дочерних элементов, compact - сокращенный набор полей без пустых children.
     """
-    # Получаем только корневые организации (без parent_id)
-    root_organizations = await crud.organization.get_root_organizations(db)
-    return root_organizations
+    if root_id is not None and not await crud.organization.get(db, id=root_id):
+        raise HTTPException(status_code=404, detail=f"Организация с ID {root_id} не найдена")
+    
+    # Все организации загружаются одним запросом и связываются в дерево в памяти
+    tree = await crud.organization.get_tree(db, root_id=root_id, max_depth=max_depth)
+    if compact:
+        return JSONResponse(content=_compact_tree(tree))
+    return tree
 
 @router.get("/by-type/{org_type}", response_model=List[schemas.Organization])
 async def get_organizations_by_type(
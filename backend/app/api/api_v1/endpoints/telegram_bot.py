@@ -1,17 +1,24 @@
 from typing import Any, List, Dict, Optional
+import asyncio
+import logging
 import uuid
-import random
-import string
-from datetime import datetime, timedelta
+from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Body
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
-from app.crud import crud_position, crud_division
+from app.core.config import settings
+from app.crud import crud_position
+from app.crud.crud_invitation_code import invitation_code as crud_invitation_code
+from app.db.session import AsyncSessionLocal
 from app.models.staff import Staff
+from app.schemas.invitation_code import InvitationCodeCreate
 from app.schemas.staff import StaffCreate, Staff as StaffSchema
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/webhook", status_code=status.HTTP_200_OK)
@@ -95,12 +102,34 @@ def get_organizations(db: Session = Depends(deps.get_db)):
             {"id": 1, "name": "OFS Global", "description": "Ошибка: " + str(e)}
         ]
 
-# Словарь для хранения сгенерированных кодов (в реальной системе нужно хранить в БД)
-# { "код": {"telegram_id": "...", "position_id": 1, "division_id": 2, "expires_at": "2023-01-01"} }
-invitation_codes = {}
+# Ответы validate-invitation для причин, по которым код не удалось погасить
+INVITATION_ERRORS = {
+    "not_found": "Invalid invitation code",
+    "expired": "Invitation code has expired",
+    "wrong_user": "Invitation code is not assigned to this user",
+    "used": "Invitation code has already been used",
+}
+
+async def invitation_code_sweeper(interval: Optional[int] = None) -> None:
+    """
+    Фоновая очистка просроченных кодов приглашений.
+
+    Запускается при старте приложения в каждом воркере; удаление идемпотентно,
+    поэтому несколько одновременно работающих очисток друг другу не мешают.
+    """
+    interval = interval or settings.INVITATION_CODE_SWEEP_INTERVAL_SECONDS
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                removed = await crud_invitation_code.purge_expired(db)
+            if removed:
+                logger.info(f"Удалено просроченных кодов приглашений: {removed}")
+        except Exception as e:
+            logger.error(f"Ошибка при очистке кодов приглашений: {e}")
+        await asyncio.sleep(interval)
 
 @router.post("/generate-invitation", status_code=status.HTTP_200_OK)
-def generate_invitation_code(data: Dict[Any, Any], db: Session = Depends(deps.get_db)):
+async def generate_invitation_code(data: Dict[Any, Any], db: AsyncSession = Depends(deps.get_db)):
     """
     Генерирует код приглашения для регистрации сотрудника
     """
@@ -119,116 +148,88 @@ def generate_invitation_code(data: Dict[Any, Any], db: Session = Depends(deps.ge
         organization_id = data.get("organization_id", 1)
         
         # Проверяем существование должности
-        position = None
-        if db:
-            position = crud_position.get(db, id=position_id)
-            if not position:
-                return {"status": "error", "message": f"Position with id {position_id} not found"}
+        position = await crud_position.get(db, id=position_id)
+        if not position:
+            return {"status": "error", "message": f"Position with id {position_id} not found"}
         
         # Проверяем существование отдела, если он указан
         division = None
-        if division_id and db:
-            division = crud_division.get(db, id=division_id)
+        if division_id:
+            division = await crud.division.get(db, id=division_id)
             if not division:
                 return {"status": "error", "message": f"Division with id {division_id} not found"}
         
-        # Генерируем уникальный код (6 символов: буквы и цифры)
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        
-        # Устанавливаем срок действия (24 часа)
-        expires_at = (datetime.now() + timedelta(hours=24)).isoformat()
-        
-        # Сохраняем код в словаре (в реальной системе - в БД)
-        invitation_codes[code] = {
-            "telegram_id": telegram_id,
-            "user_full_name": user_full_name,
-            "position_id": position_id,
-            "position_name": position.name if position else "Unknown",
-            "division_id": division_id,
-            "division_name": division.name if division else None,
-            "organization_id": organization_id,
-            "created_at": datetime.now().isoformat(),
-            "expires_at": expires_at,
-            "is_used": False
-        }
+        # Сохраняем код в таблице invitation_codes (уникальность кода проверяет БД)
+        invitation = await crud_invitation_code.create_code(
+            db,
+            obj_in=InvitationCodeCreate(
+                telegram_id=str(telegram_id),
+                user_full_name=user_full_name,
+                position_id=position_id,
+                position_name=position.name,
+                division_id=division_id,
+                division_name=division.name if division else None,
+                organization_id=organization_id,
+            ),
+            ttl=timedelta(hours=settings.INVITATION_CODE_TTL_HOURS),
+        )
         
         # Возвращаем код
         return {
             "status": "success",
             "message": "Invitation code generated successfully",
-            "code": code,
+            "code": invitation.code,
             "position": {
                 "id": position_id,
-                "name": position.name if position else "Unknown"
+                "name": position.name
             },
             "division": {
                 "id": division_id,
                 "name": division.name if division else None
             } if division_id else None,
             "organization_id": organization_id,
-            "expires_at": expires_at
+            "expires_at": invitation.expires_at.isoformat()
         }
     except Exception as e:
-        print(f"Ошибка в generate_invitation_code: {str(e)}")
+        logger.error(f"Ошибка в generate_invitation_code: {str(e)}")
         return {"status": "error", "message": str(e)}
 
 @router.post("/validate-invitation", status_code=status.HTTP_200_OK)
-def validate_invitation_code(data: Dict[str, Any], db: Session = Depends(deps.get_db)):
+async def validate_invitation_code(data: Dict[str, Any], db: AsyncSession = Depends(deps.get_db)):
     """
-    Проверяет валидность кода приглашения
+    Проверяет код приглашения и погашает его (повторно код не принимается)
     """
     try:
         # Получаем данные из запроса
         code = data.get("code", "")
         telegram_id = data.get("telegram_id", "")
         
-        # Проверяем существование кода
-        if code not in invitation_codes:
-            return {"status": "error", "message": "Invalid invitation code"}
-        
-        # Получаем данные кода
-        code_data = invitation_codes[code]
-        
-        # Проверяем срок действия
-        if datetime.now() > datetime.fromisoformat(code_data["expires_at"]):
-            return {"status": "error", "message": "Invitation code has expired"}
-        
-        # Проверяем, что код принадлежит этому пользователю
-        if str(code_data["telegram_id"]) != str(telegram_id):
-            return {"status": "error", "message": "Invitation code is not assigned to this user"}
+        # Проверка срока, владельца и погашение - один атомарный запрос
+        code_data, reason = await crud_invitation_code.consume(db, code=code, telegram_id=telegram_id)
+        if code_data is None:
+            return {"status": "error", "message": INVITATION_ERRORS[reason]}
         
-        # Проверяем, что код не использован
-        if code_data.get("is_used", False):
-            return {"status": "error", "message": "Invitation code has already been used"}
-        
-        # Получаем данные о должности из БД
-        position = None
-        if db:
-            position = crud_position.get(db, id=code_data["position_id"])
-        
-        # Получаем данные об отделе из БД, если указан
+        # Актуальные названия должности и отдела, если они есть в БД
+        position = await crud_position.get(db, id=code_data.position_id)
         division = None
-        if code_data.get("division_id") and db:
-            division = crud_division.get(db, id=code_data["division_id"])
-        
-        # Отмечаем код как использованный
-        code_data["is_used"] = True
+        if code_data.division_id:
+            division = await crud.division.get(db, id=code_data.division_id)
         
         # Возвращаем данные кода
         return {
             "status": "success",
             "message": "Invitation code is valid",
             "position": {
-                "id": code_data["position_id"],
-                "name": position.name if position else code_data.get("position_name", "Unknown")
+                "id": code_data.position_id,
+                "name": position.name if position else (code_data.position_name or "Unknown")
             },
             "division": {
-                "id": code_data.get("division_id"),
-                "name": division.name if division else code_data.get("division_name")
-            } if code_data.get("division_id") else None,
-            "organization_id": code_data.get("organization_id", 1),
-            "user_full_name": code_data.get("user_full_name", "")
+                "id": code_data.division_id,
+                "name": division.name if division else code_data.division_name
+            } if code_data.division_id else None,
+            "organization_id": code_data.organization_id or 1,
+            "user_full_name": code_data.user_full_name or ""
         }
     except Exception as e:
-        print(f"Ошибка в validate_invitation_code: {str(e)}")
-        return {"status": "error", "message": str(e)} 
\ No newline at end of file
+        logger.error(f"Ошибка в validate_invitation_code: {str(e)}")
+        return {"status": "error", "message": str(e)}
@@ -78,6 +78,14 @@ class Settings(BaseSettings):
     # Директория для загрузки файлов
     UPLOAD_DIR: str = os.path.join(os.getcwd(), "uploads")
 
+    # Коды приглашений Telegram-бота: срок действия и период фоновой очистки
+    INVITATION_CODE_TTL_HOURS: int = 24
+    INVITATION_CODE_SWEEP_INTERVAL_SECONDS: int = 600
+
+    # Срок жизни кэша деревьев отделов в секундах (0 - без срока); та же переменная,
+    # что и у кэша иерархий full_api, т.к. отделы меняют и другие процессы
+    ORG_TREE_CACHE_TTL: float = float(os.getenv("OFS_ORG_TREE_CACHE_TTL", "300"))
+
     # SQLAlchemy settings
     SQLALCHEMY_ECHO: bool = False  # Enable SQL query logging for debugging
     
@@ -2,4 +2,5 @@ from .crud_division import division
 # from .crud_staff import staff
 from .crud_functional_relation import functional_relation
 from .crud_position import crud_position
-from .crud_organization import organization 
\ No newline at end of file
+from .crud_organization import organization 
+from .crud_invitation_code import invitation_code
@@ -1,11 +1,17 @@
-from typing import List, Dict, Any, Optional, Union, Tuple
+import copy
+import json
+import time
+from typing import List, Dict, Any, Iterator, Optional, Union, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, select, func
+from sqlalchemy import and_, or_, select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import true
 
+from app.core.config import settings
 from app.crud.base import CRUDBase
 from app.models.division import Division
+from app.models.function import Function
+from app.models.section import Section
 from app.schemas.division import DivisionCreate, DivisionUpdate
 
 from fastapi.encoders import jsonable_encoder
@@ -18,6 +24,38 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
     CRUD операции с отделами.
     """
     
+    def __init__(self, model):
+        super().__init__(model)
+        # Кэш деревьев отделов: (organization_id, include_inactive) -> (время сборки, дерево).
+        # Сбрасывается всеми операциями записи этого CRUD, а записи других процессов
+        # (воркеры uvicorn, full_api, скрипты импорта) видны после ORG_TREE_CACHE_TTL.
+        self._tree_cache: Dict[Tuple[int, bool], Tuple[float, List[Dict[str, Any]]]] = {}
+        self._tree_version = 0
+    
+    def invalidate_tree_cache(self) -> None:
+        """
+        Сбросить кэш деревьев отделов (после любых изменений отделов).
+        """
+        self._tree_version += 1
+        self._tree_cache.clear()
+    
+    async def create(self, db: AsyncSession, *, obj_in: DivisionCreate) -> Division:
+        db_obj = await super().create(db, obj_in=obj_in)
+        self.invalidate_tree_cache()
+        return db_obj
+    
+    async def update(
+        self, db: AsyncSession, *, db_obj: Division, obj_in: Union[DivisionUpdate, Dict[str, Any]]
+    ) -> Division:
+        db_obj = await super().update(db, db_obj=db_obj, obj_in=obj_in)
+        self.invalidate_tree_cache()
+        return db_obj
+    
+    async def remove(self, db: AsyncSession, *, id: int) -> Division:
+        obj = await super().remove(db, id=id)
+        self.invalidate_tree_cache()
+        return obj
+    
     def get_by_name(self, db: Session, *, name: str, organization_id: int) -> Optional[Division]:
         """
         Получить отдел по названию и организации.
@@ -135,32 +173,119 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
             Division.parent_id == None
         ).all()
     
+    def _descendants_cte(self, *, division_id: int, include_inactive: bool = True):
+        """
+        Рекурсивный CTE с id всех потомков отдела (без самого отдела).
+        При include_inactive=False неактивные отделы и их ветки в него не попадают.
+        """
+        filters = [] if include_inactive else [Division.is_active == True]
+        subtree = (
+            select(Division.id)
+            .where(Division.parent_id == division_id, *filters)
+            .cte("division_subtree", recursive=True)
+        )
+        # UNION (а не UNION ALL) защищает от зацикливания на испорченных данных
+        return subtree.union(
+            select(Division.id)
+            .join(subtree, Division.parent_id == subtree.c.id)
+            .where(*filters)
+        )
+    
+    async def get_descendant_ids(
+        self, db: AsyncSession, *, division_id: int, include_inactive: bool = False
+    ) -> List[int]:
+        """
+        Получить id всех потомков отдела одним запросом.
+        """
+        subtree = self._descendants_cte(division_id=division_id, include_inactive=include_inactive)
+        result = await db.execute(select(subtree.c.id))
+        return list(result.scalars().all())
+    
     async def get_all_descendants(
         self, db: AsyncSession, *, division_id: int, include_inactive: bool = False
     ) -> List[Division]:
         """
         Получить все дочерние отделы и их потомков для указанного отдела.
+        Один рекурсивный запрос; результат упорядочен по уровню.
+        """
+        subtree = self._descendants_cte(division_id=division_id, include_inactive=include_inactive)
+        result = await db.execute(
+            select(Division)
+            .where(Division.id.in_(select(subtree.c.id)))
+            .order_by(Division.level, Division.id)
+        )
+        return result.scalars().all()
+    
+    @staticmethod
+    def build_tree(
+        divisions: List[Dict[str, Any]],
+        sections: Optional[List[Dict[str, Any]]] = None,
+        functions: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
         """
-        descendants = []
-        children = await self.get_children(db, division_id=division_id, include_inactive=include_inactive)
+        Собирает дерево из плоского списка отделов за линейное время.
+        Порядок входных данных любой: родитель может идти после потомков.
+        Отделы, чей родитель отсутствует в списке (например, отфильтрован как
+        неактивный), в дерево не попадают. Если переданы sections/functions,
+        они добавляются к отделам как листья (section.division_id, function.section_id).
+        """
+        nodes = {}
+        for dept in divisions:
+            node = dict(dept)
+            node["children"] = []
+            if sections is not None:
+                node["sections"] = []
+            nodes[node["id"]] = node
         
-        descendants.extend(children)
+        tree = []
+        for node in nodes.values():
+            parent_id = node.get("parent_id")
+            if parent_id is None:
+                tree.append(node)
+            elif parent_id in nodes:
+                nodes[parent_id]["children"].append(node)
         
-        for child in children:
-            child_descendants = await self.get_all_descendants(
-                db, division_id=child.id, include_inactive=include_inactive
-            )
-            descendants.extend(child_descendants)
-            
-        return descendants
+        if sections is not None:
+            section_nodes = {}
+            for section in sections:
+                section_node = dict(section)
+                section_node["functions"] = []
+                section_nodes[section_node["id"]] = section_node
+                division_node = nodes.get(section_node.get("division_id"))
+                if division_node is not None:
+                    division_node["sections"].append(section_node)
+            for function in functions or []:
+                section_node = section_nodes.get(function.get("section_id"))
+                if section_node is not None:
+                    section_node["functions"].append(dict(function))
+        return tree
     
     async def get_division_tree(
-        self, db: AsyncSession, *, organization_id: int, include_inactive: bool = False
+        self,
+        db: AsyncSession,
+        *,
+        organization_id: int,
+        include_inactive: bool = False,
+        include_leaves: bool = False,
     ) -> List[Dict[str, Any]]:
         """
         Получить древовидную структуру отделов для указанной организации.
-        Возвращает только корневые отделы с рекурсивно загруженными дочерними элементами.
-        """
+        Возвращает только корневые отделы с рекурсивно загруженными дочерними элементами;
+        include_leaves=True добавляет к отделам их секции (sections) с функциями (functions).
+        Дерево без листьев кэшируется до ближайшего изменения отделов через этот
+        CRUD, но не дольше settings.ORG_TREE_CACHE_TTL; каждый вызов получает свою
+        копию. Секции и функции меняются в обход этого CRUD, поэтому дерево
+        с листьями не кэшируется.
+        """
+        cache_key = (organization_id, include_inactive)
+        cached = None if include_leaves else self._tree_cache.get(cache_key)
+        if cached is not None:
+            built_at, tree = cached
+            ttl = settings.ORG_TREE_CACHE_TTL
+            if not ttl or time.monotonic() - built_at < ttl:
+                return copy.deepcopy(tree)
+        version = self._tree_version
+        
         # Получаем все отделы организации
         filters = [Division.organization_id == organization_id]
         if not include_inactive:
@@ -169,50 +294,45 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         result = await db.execute(
             select(Division)
             .where(and_(*filters))
-            .order_by(Division.level)
+            .order_by(Division.level, Division.id)
         )
-        all_Divisions = result.scalars().all()
+        divisions = [jsonable_encoder(dept) for dept in result.scalars().all()]
         
-        # Строим дерево отделов
-        Divisions_by_id = {dept.id: dept for dept in all_Divisions}
-        tree = []
-        for dept in all_Divisions:
-            # Устанавливаем дочерние отделы
-            dept_dict = jsonable_encoder(dept)
-            dept_dict["children"] = []
+        sections = functions = None
+        if include_leaves:
+            division_ids = select(Division.id).where(and_(*filters))
+            section_filters = [Section.division_id.in_(division_ids)]
+            if not include_inactive:
+                section_filters.append(Section.is_active == True)
+            result = await db.execute(select(Section).where(*section_filters).order_by(Section.id))
+            sections = [jsonable_encoder(section) for section in result.scalars().all()]
             
-            # Если отдел без родителя, добавляем в корень дерева
-            if dept.parent_id is None:
-                tree.append(dept_dict)
-            # Иначе добавляем как дочерний
-            elif dept.parent_id in Divisions_by_id:
-                parent = Divisions_by_id[dept.parent_id]
-                # Находим родителя в дереве
-                parent_dict = None
-                for d in tree:
-                    if d["id"] == parent.id:
-                        parent_dict = d
-                        break
-                
-                # Если родитель найден, добавляем к нему
-                if parent_dict:
-                    parent_dict["children"].append(dept_dict)
-                # Иначе родитель может быть на более глубоком уровне
-                else:
-                    # Рекурсивный поиск родителя в дереве
-                    def find_parent_and_add_child(nodes, child_dict):
-                        for node in nodes:
-                            if node["id"] == parent.id:
-                                node["children"].append(child_dict)
-                                return True
-                            if find_parent_and_add_child(node["children"], child_dict):
-                                return True
-                        return False
-                    
-                    find_parent_and_add_child(tree, dept_dict)
+            function_filters = [Function.section_id.in_([section["id"] for section in sections])]
+            if not include_inactive:
+                function_filters.append(Function.is_active == True)
+            result = await db.execute(select(Function).where(*function_filters).order_by(Function.id))
+            functions = [jsonable_encoder(function) for function in result.scalars().all()]
+        
+        tree = self.build_tree(divisions, sections, functions)
         
+        # Не сохраняем дерево, если во время сборки отделы успели измениться
+        if not include_leaves and version == self._tree_version:
+            self._tree_cache[cache_key] = (time.monotonic(), copy.deepcopy(tree))
         return tree
     
+    @staticmethod
+    def iter_tree_json(tree: List[Dict[str, Any]]) -> Iterator[bytes]:
+        """
+        Отдает дерево как JSON-массив по частям: по одному корневому отделу за раз,
+        чтобы ответ для крупных холдингов не собирался в памяти целиком.
+        """
+        yield b"["
+        for index, node in enumerate(tree):
+            if index:
+                yield b","
+            yield json.dumps(node, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        yield b"]"
+    
     async def create_with_parent(
         self, 
         db: AsyncSession, 
@@ -237,6 +357,7 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
         await db.commit()
+        self.invalidate_tree_cache()
         await db.refresh(db_obj)
         return db_obj
     
@@ -248,18 +369,51 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         obj_in: Union[BaseModel, Dict[str, Any]]
     ) -> Division:
         """
-        Обновление отдела с обновлением дочерних отделов, если необходимо
+        Обновление отдела с обновлением дочерних отделов, если необходимо.
+        Отдел и все его потомки обновляются в одной транзакции.
         """
         old_is_active = db_obj.is_active
-        updated_obj = await self.update(db, db_obj=db_obj, obj_in=obj_in)
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        
+        obj_data = jsonable_encoder(db_obj)
+        for field in obj_data:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+        db.add(db_obj)
         
         # Если изменилась активность, обновляем и дочерние отделы
-        if isinstance(obj_in, dict) and "is_active" in obj_in and old_is_active != obj_in["is_active"]:
-            await self._update_children_activity(db, parent_id=db_obj.id, is_active=obj_in["is_active"])
-        elif hasattr(obj_in, "is_active") and obj_in.is_active is not None and old_is_active != obj_in.is_active:
-            await self._update_children_activity(db, parent_id=db_obj.id, is_active=obj_in.is_active)
-            
-        return updated_obj
+        new_is_active = update_data.get("is_active")
+        if new_is_active is not None and old_is_active != new_is_active:
+            await db.flush()
+            await self._set_descendants_activity(db, parent_id=db_obj.id, is_active=new_is_active)
+        
+        await db.commit()
+        self.invalidate_tree_cache()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def _set_descendants_activity(
+        self, 
+        db: AsyncSession, 
+        *, 
+        parent_id: int, 
+        is_active: bool
+    ) -> int:
+        """
+        Один UPDATE активности для всех потомков отдела (без коммита).
+        Возвращает число обновленных отделов.
+        """
+        subtree = self._descendants_cte(division_id=parent_id)
+        result = await db.execute(
+            update(Division)
+            .where(Division.id.in_(select(subtree.c.id)))
+            .values(is_active=is_active)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
 
     async def _update_children_activity(
         self, 
@@ -269,20 +423,11 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         is_active: bool
     ) -> None:
         """
-        Рекурсивное обновление активности дочерних отделов
+        Обновление активности всех дочерних отделов одним запросом в одной транзакции
         """
-        # Получаем все дочерние отделы
-        children = await self.get_children(db, division_id=parent_id, include_inactive=True)
-        
-        for child in children:
-            # Обновляем активность
-            child.is_active = is_active
-            db.add(child)
-            
-            # Рекурсивно обновляем потомков
-            await self._update_children_activity(db, parent_id=child.id, is_active=is_active)
-        
+        await self._set_descendants_activity(db, parent_id=parent_id, is_active=is_active)
         await db.commit()
+        self.invalidate_tree_cache()
 
     async def move_division(
         self, db: AsyncSession, *, division_id: int, new_parent_id: Optional[int] = None
@@ -299,14 +444,15 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
             if new_parent_id == division_id:
                 return None
                 
-            # Получить всех потомков и убедиться, что новый родитель не является одним из них
-            descendants = await self.get_all_descendants(db, division_id=division_id)
-            if any(d.id == new_parent_id for d in descendants):
+            # Убедиться, что новый родитель не является одним из потомков
+            descendant_ids = await self.get_descendant_ids(db, division_id=division_id, include_inactive=True)
+            if new_parent_id in descendant_ids:
                 return None
         
         # Обновляем родителя
         division.parent_id = new_parent_id
         await db.commit()
+        self.invalidate_tree_cache()
         await db.refresh(division)
         
         return division
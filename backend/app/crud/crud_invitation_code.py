@@ -0,0 +1,116 @@
+import random
+import string
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models.invitation_code import InvitationCode
+from app.schemas.invitation_code import InvitationCodeCreate
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+# Сколько раз пробуем другой код при совпадении с уже выданным
+CODE_ATTEMPTS = 10
+
+
+def utcnow() -> datetime:
+    """Текущее время UTC без часового пояса (так время хранится в таблице)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CRUDInvitationCode(CRUDBase[InvitationCode, InvitationCodeCreate, InvitationCodeCreate]):
+    """
+    CRUD операции с кодами приглашений.
+
+    Все проверки выполняются в БД, поэтому хранилище общее для всех
+    воркеров uvicorn и переживает перезапуск: уникальность кода держит
+    уникальный индекс, а погашение кода - один условный UPDATE.
+    """
+
+    async def get_by_code(self, db: AsyncSession, *, code: str) -> Optional[InvitationCode]:
+        """
+        Получить код приглашения по значению.
+        """
+        result = await db.execute(select(InvitationCode).where(InvitationCode.code == code))
+        return result.scalar_one_or_none()
+
+    async def create_code(
+        self, db: AsyncSession, *, obj_in: InvitationCodeCreate, ttl: timedelta
+    ) -> InvitationCode:
+        """
+        Сгенерировать и сохранить новый код приглашения со сроком действия ttl.
+        """
+        now = utcnow()
+        for _ in range(CODE_ATTEMPTS):
+            db_obj = InvitationCode(
+                **obj_in.model_dump(),
+                code=''.join(random.choices(CODE_ALPHABET, k=CODE_LENGTH)),
+                created_at=now,
+                expires_at=now + ttl,
+                is_used=False,
+            )
+            db.add(db_obj)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Такой код уже выдан (в том числе другим воркером) - пробуем другой
+                await db.rollback()
+                continue
+            await db.refresh(db_obj)
+            return db_obj
+        raise RuntimeError("Не удалось сгенерировать уникальный код приглашения")
+
+    async def consume(
+        self, db: AsyncSession, *, code: str, telegram_id: str
+    ) -> Tuple[Optional[InvitationCode], Optional[str]]:
+        """
+        Проверить и погасить код одним атомарным UPDATE.
+
+        Возвращает (код, None) при успехе или (None, причина), где причина -
+        "not_found", "expired", "wrong_user" или "used". Из параллельных
+        запросов с одним кодом успешен ровно один.
+        """
+        now = utcnow()
+        result = await db.execute(
+            update(InvitationCode)
+            .where(
+                InvitationCode.code == code,
+                InvitationCode.telegram_id == str(telegram_id),
+                InvitationCode.is_used == False,
+                InvitationCode.expires_at > now,
+            )
+            .values(is_used=True, used_at=now)
+            .returning(InvitationCode)
+        )
+        consumed = result.scalar_one_or_none()
+        await db.commit()
+        if consumed is not None:
+            return consumed, None
+
+        # Погасить не удалось - выясняем причину для ответа боту
+        existing = await self.get_by_code(db, code=code)
+        if existing is None:
+            return None, "not_found"
+        if existing.expires_at <= now:
+            return None, "expired"
+        if existing.telegram_id != str(telegram_id):
+            return None, "wrong_user"
+        return None, "used"
+
+    async def purge_expired(self, db: AsyncSession, *, before: Optional[datetime] = None) -> int:
+        """
+        Удалить коды, срок действия которых истек до before (по умолчанию - сейчас).
+        Возвращает количество удаленных записей.
+        """
+        result = await db.execute(
+            delete(InvitationCode).where(InvitationCode.expires_at <= (before or utcnow()))
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+
+invitation_code = CRUDInvitationCode(InvitationCode)
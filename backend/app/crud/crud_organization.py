@@ -2,7 +2,7 @@ from typing import Any, Dict, Optional, Union, List
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, literal
 
 from app.crud.base import CRUDBase
 from app.models.organization import Organization
@@ -55,43 +55,80 @@ class CRUDOrganization(CRUDBase[Organization, OrganizationCreate, OrganizationUp
         result = await db.execute(query)
         return result.scalars().all()
 
+    def _subtree_query(self, root_id: int, max_depth: Optional[int] = None):
+        """
+        Запрос всех организаций поддерева root_id (включая сам корень) одним рекурсивным CTE
+        """
+        subtree = (
+            select(Organization.id, literal(0).label("depth"))
+            .where(Organization.id == root_id)
+            .cte("organization_subtree", recursive=True)
+        )
+        step = select(Organization.id, (subtree.c.depth + 1).label("depth")).join(
+            subtree, Organization.parent_id == subtree.c.id
+        )
+        if max_depth is not None:
+            step = step.where(subtree.c.depth < max_depth)
+        subtree = subtree.union(step)
+        return select(self.model).where(Organization.id.in_(select(subtree.c.id)))
+
+    def _build_tree(
+        self, orgs: List[Organization], root_ids: List[int], max_depth: Optional[int] = None
+    ) -> List[Organization]:
+        """
+        Связывает загруженные организации в дерево в памяти: у каждого узла
+        заполняется атрибут children. Узлы на глубине max_depth получают пустой
+        список детей. Возвращает корни в порядке root_ids.
+        """
+        by_id = {org.id: org for org in orgs}
+        children_by_parent: Dict[int, List[Organization]] = {}
+        for org in sorted(orgs, key=lambda o: o.id):
+            if org.parent_id is not None:
+                children_by_parent.setdefault(org.parent_id, []).append(org)
+        
+        roots = [by_id[root_id] for root_id in root_ids if root_id in by_id]
+        visited = set()
+        level = roots
+        depth = 0
+        while level:
+            next_level = []
+            for org in level:
+                visited.add(org.id)
+                if max_depth is not None and depth >= max_depth:
+                    org.children = []
+                    continue
+                # Защита от циклов в parent_id
+                org.children = [child for child in children_by_parent.get(org.id, []) if child.id not in visited]
+                next_level.extend(org.children)
+            level = next_level
+            depth += 1
+        return roots
+
+    async def get_tree(
+        self, db: AsyncSession, *, root_id: Optional[int] = None, max_depth: Optional[int] = None
+    ) -> List[Organization]:
+        """
+        Получить дерево организаций: все корневые организации или поддерево root_id.
+        Организации загружаются одним запросом и связываются в памяти;
+        max_depth ограничивает число уровней дочерних элементов (None - без ограничения).
+        """
+        if root_id is None:
+            result = await db.execute(select(self.model))
+            orgs = result.scalars().all()
+            root_ids = [org.id for org in sorted(orgs, key=lambda o: o.id) if org.parent_id is None]
+        else:
+            result = await db.execute(self._subtree_query(root_id, max_depth))
+            orgs = result.scalars().all()
+            root_ids = [root_id]
+        return self._build_tree(orgs, root_ids, max_depth)
+
     async def get_root_organizations(
-        self, db: AsyncSession
+        self, db: AsyncSession, *, max_depth: Optional[int] = 5
     ) -> List[Organization]:
         """
         Получить корневые организации (без родителя) с их дочерними элементами
         """
-        # Сначала получаем все корневые организации (parent_id IS NULL)
-        query = select(self.model).filter(Organization.parent_id.is_(None))
-        result = await db.execute(query)
-        root_orgs = result.scalars().all()
-        
-        # Для каждой корневой организации загружаем дочерние элементы
-        for org in root_orgs:
-            await self._load_children_recursive(db, org)
-            
-        return root_orgs
-
-    async def _load_children_recursive(
-        self, db: AsyncSession, parent_org: Organization, depth: int = 5
-    ) -> None:
-        """
-        Рекурсивно загрузить дочерние организации для данной родительской организации
-        """
-        if depth <= 0:
-            return  # Предотвращение бесконечной рекурсии
-            
-        # Получаем дочерние организации для текущего родителя
-        query = select(self.model).filter(Organization.parent_id == parent_org.id)
-        result = await db.execute(query)
-        children = result.scalars().all()
-        
-        # Устанавливаем дочерние организации для родителя
-        parent_org.children = children
-        
-        # Рекурсивно загружаем дочерние элементы для каждой дочерней организации
-        for child in children:
-            await self._load_children_recursive(db, child, depth - 1)
+        return await self.get_tree(db, max_depth=max_depth)
 
     async def count_children(
         self, db: AsyncSession, *, parent_id: int
@@ -172,39 +209,27 @@ class CRUDOrganization(CRUDBase[Organization, OrganizationCreate, OrganizationUp
         """
         return db.query(self.model).filter(Organization.parent_id == parent_id).all()
 
+    def get_tree_sync(
+        self, db: Session, *, root_id: Optional[int] = None, max_depth: Optional[int] = None
+    ) -> List[Organization]:
+        """
+        Получить дерево организаций одним запросом (синхронная версия)
+        """
+        if root_id is None:
+            orgs = db.query(self.model).all()
+            root_ids = [org.id for org in sorted(orgs, key=lambda o: o.id) if org.parent_id is None]
+        else:
+            orgs = db.execute(self._subtree_query(root_id, max_depth)).scalars().all()
+            root_ids = [root_id]
+        return self._build_tree(orgs, root_ids, max_depth)
+
     def get_root_organizations_sync(
-        self, db: Session
+        self, db: Session, *, max_depth: Optional[int] = 5
     ) -> List[Organization]:
         """
         Получить корневые организации (без родителя) с их дочерними элементами (синхронная версия)
         """
-        # Сначала получаем все корневые организации (parent_id IS NULL)
-        root_orgs = db.query(self.model).filter(Organization.parent_id.is_(None)).all()
-        
-        # Для каждой корневой организации загружаем дочерние элементы
-        for org in root_orgs:
-            self._load_children_recursive_sync(db, org)
-            
-        return root_orgs
-
-    def _load_children_recursive_sync(
-        self, db: Session, parent_org: Organization, depth: int = 5
-    ) -> None:
-        """
-        Рекурсивно загрузить дочерние организации для данной родительской организации (синхронная версия)
-        """
-        if depth <= 0:
-            return  # Предотвращение бесконечной рекурсии
-            
-        # Получаем дочерние организации для текущего родителя
-        children = db.query(self.model).filter(Organization.parent_id == parent_org.id).all()
-        
-        # Устанавливаем дочерние организации для родителя
-        parent_org.children = children
-        
-        # Рекурсивно загружаем дочерние элементы для каждой дочерней организации
-        for child in children:
-            self._load_children_recursive_sync(db, child, depth - 1)
+        return self.get_tree_sync(db, max_depth=max_depth)
 
     def count_children_sync(
         self, db: Session, *, parent_id: int
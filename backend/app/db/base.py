@@ -8,4 +8,5 @@ from app.models.position import Position  # noqa
 from app.models.staff import Staff  # noqa
 from app.models.user import User  # noqa
 from app.models.functional_relation import FunctionalRelation  # noqa
-from app.models.item import Item  # noqa 
\ No newline at end of file
+from app.models.item import Item  # noqa 
+from app.models.invitation_code import InvitationCode  # noqa
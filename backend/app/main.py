@@ -5,9 +5,11 @@ from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
+import asyncio
 import os
 
 from app.api.api_v1.api import api_router
+from app.api.api_v1.endpoints.telegram_bot import invitation_code_sweeper
 from app.core.config import settings
 
 app = FastAPI(
@@ -60,6 +62,18 @@ async def startup_event():
     # Создаем поддиректории для различных типов файлов
     os.makedirs(os.path.join(settings.UPLOAD_DIR, "photos"), exist_ok=True)
     os.makedirs(os.path.join(settings.UPLOAD_DIR, "documents"), exist_ok=True)
+    
+    # Фоновая очистка просроченных кодов приглашений Telegram-бота
+    app.state.invitation_sweeper = asyncio.create_task(invitation_code_sweeper())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Останавливаем фоновые задачи
+    """
+    sweeper = getattr(app.state, "invitation_sweeper", None)
+    if sweeper is not None:
+        sweeper.cancel()
 
 @app.get("/")
 def read_root():
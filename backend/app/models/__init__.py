@@ -13,5 +13,6 @@ from .organization import Organization
 # from .position import Position
 
 # Другие модели
+from .invitation_code import InvitationCode
 from .user import User
 from .item import Item 
\ No newline at end of file
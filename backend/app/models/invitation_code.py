@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from app.db.base_class import Base
+
+
+class InvitationCode(Base):
+    """
+    Модель кода приглашения для регистрации сотрудника через Telegram-бота.
+    Время хранится в UTC без часового пояса; просроченные коды удаляет
+    фоновая очистка.
+    """
+    __tablename__ = "invitation_codes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String(16), nullable=False, unique=True, index=True)
+    telegram_id = Column(String(64), nullable=False, index=True)
+    user_full_name = Column(String(255), nullable=True)
+    position_id = Column(Integer, nullable=False)
+    position_name = Column(String(255), nullable=True)
+    division_id = Column(Integer, nullable=True)
+    division_name = Column(String(255), nullable=True)
+    organization_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    is_used = Column(Boolean, nullable=False, default=False)
+    used_at = Column(DateTime, nullable=True)
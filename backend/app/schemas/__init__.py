@@ -6,7 +6,8 @@ from .user import User, UserCreate, UserInDB, UserUpdate
 
 # Основные схемы
 from .organization import Organization, OrganizationCreate, OrganizationInDB, OrganizationUpdate, OrgType, OrganizationWithChildren
-from .division import Division, DivisionCreate, DivisionInDB, DivisionUpdate
+from .division import Division, DivisionCreate, DivisionInDB, DivisionUpdate, DivisionWithChildren
 from .staff import Staff, StaffCreate, StaffInDB, StaffUpdate
 from .position import Position, PositionCreate, PositionInDB, PositionUpdate
-from .functional_relation import FunctionalRelation, FunctionalRelationCreate, FunctionalRelationInDB, FunctionalRelationUpdate, RelationType
\ No newline at end of file
+from .functional_relation import FunctionalRelation, FunctionalRelationCreate, FunctionalRelationInDB, FunctionalRelationUpdate, RelationType
+from .invitation_code import InvitationCode, InvitationCodeCreate
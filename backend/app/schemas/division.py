@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -47,6 +47,16 @@ class Division(DivisionBase):
     updated_at: datetime
 
 
+# Подразделение в дереве с дочерними подразделениями и (опционально) секциями
+class DivisionWithChildren(Division):
+    """
+    Узел дерева подразделений.
+    """
+    parent_id: Optional[int] = None
+    children: List["DivisionWithChildren"] = []
+    sections: Optional[List[Dict[str, Any]]] = None
+
+
 # Полная схема подразделения в БД
 class DivisionInDB(Division):
     """
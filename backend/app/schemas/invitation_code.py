@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class InvitationCodeBase(BaseModel):
+    telegram_id: str
+    user_full_name: Optional[str] = None
+    position_id: int
+    position_name: Optional[str] = None
+    division_id: Optional[int] = None
+    division_name: Optional[str] = None
+    organization_id: Optional[int] = 1
+
+
+class InvitationCodeCreate(InvitationCodeBase):
+    pass
+
+
+class InvitationCode(InvitationCodeBase):
+    id: int
+    code: str
+    created_at: datetime
+    expires_at: datetime
+    is_used: bool
+    used_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
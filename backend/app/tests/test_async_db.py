@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from async_db import AsyncDatabase
+from db_pool import SQLiteConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / "async.db"), size=2, timeout=0.2)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+    yield pool
+    pool.close()
+
+
+def test_run_and_helpers(pool):
+    adb = AsyncDatabase(pool, workers=2)
+
+    async def scenario():
+        new_id = await adb.execute("INSERT INTO items (name) VALUES (?)", ("первый",))
+        row = await adb.fetchone("SELECT name FROM items WHERE id = ?", (new_id,))
+        count = await adb.run(lambda conn, table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], "items")
+        return row["name"], count
+
+    try:
+        assert asyncio.run(scenario()) == ("первый", 1)
+        assert adb.stats()["completed"] == 3
+    finally:
+        adb.close()
+
+
+def test_exhausted_pool_maps_to_503(pool):
+    adb = AsyncDatabase(pool, workers=1)
+    held = [pool.acquire(), pool.acquire()]
+    try:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(adb.fetchall("SELECT * FROM items"))
+        assert exc.value.status_code == 503
+    finally:
+        for conn in held:
+            pool.release(conn)
+        adb.close()
+
+
+def test_async_acquire_waits_outside_caller_thread(pool):
+    async def scenario():
+        first = await pool.acquire_async()
+        second = await pool.acquire_async()
+        waiter = asyncio.ensure_future(pool.acquire_async())
+        await asyncio.sleep(0.05)
+        # Ожидающий запрос не блокирует цикл событий
+        assert not waiter.done()
+        pool.release(first)
+        third = await waiter
+        pool.release(second)
+        pool.release(third)
+
+    asyncio.run(scenario())
+    assert pool.stats()["in_use"] == 0
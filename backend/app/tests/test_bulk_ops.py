@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from bulk_ops import BulkResults, existing_ids, fetch_by_keys, insert_many
+from complete_schema import ALL_SCHEMAS
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    yield conn
+    conn.close()
+
+
+def test_insert_many_returns_ids_in_order(db):
+    db.execute("INSERT INTO positions (name, code) VALUES ('Старая', 'OLD')")
+    db.execute("DELETE FROM positions")
+
+    ids = insert_many(
+        db,
+        "INSERT INTO positions (name, code) VALUES (?, ?)",
+        [(f"Должность {i}", f"P{i}") for i in range(3)]
+    )
+    db.commit()
+
+    rows = db.execute("SELECT id, code FROM positions ORDER BY id").fetchall()
+    assert ids == [row["id"] for row in rows] == [2, 3, 4]
+    assert [row["code"] for row in rows] == ["P0", "P1", "P2"]
+
+
+def test_lookups_use_one_query_per_chunk(db):
+    db.executemany(
+        "INSERT INTO staff (email, first_name, last_name) VALUES (?, 'Имя', 'Фамилия')",
+        [(f"user{i}@ofs.ru",) for i in range(2000)]
+    )
+    queries = []
+    db.set_trace_callback(queries.append)
+
+    found = existing_ids(db, "staff", list(range(1, 1901)) + [None, 5000])
+    by_email = fetch_by_keys(db, "staff", "email", ["user7@ofs.ru", "nobody@ofs.ru"], "id, email")
+
+    db.set_trace_callback(None)
+    assert found == set(range(1, 1901))
+    assert list(by_email) == ["user7@ofs.ru"]
+    assert len(queries) == 4
+
+
+def test_summary_marks_untouched_items_skipped():
+    results = BulkResults(3)
+    results.error(1, "Ошибка")
+    results.done(2, "updated", 7)
+
+    summary = results.summary()
+    assert [item.status for item in summary.items] == ["skipped", "error", "updated"]
+    assert (summary.created, summary.updated, summary.errors) == (0, 1, 1)
@@ -0,0 +1,218 @@
+import random
+import sqlite3
+
+import pytest
+
+import closure_index
+from complete_schema import ALL_SCHEMAS
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("PRAGMA foreign_keys=ON")
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    conn.execute("INSERT INTO organizations (id, name, code, org_type) VALUES (1, 'Холдинг', 'HOLD', 'holding')")
+    conn.executemany(
+        "INSERT INTO staff (id, email, first_name, last_name) VALUES (?, ?, 'Имя', 'Фамилия')",
+        [(i, f"s{i}@ofs.ru") for i in range(1, 41)],
+    )
+    yield conn
+    conn.close()
+
+
+def add_division(db, division_id, parent_id=None):
+    db.execute(
+        "INSERT INTO divisions (id, name, code, organization_id, parent_id) VALUES (?, ?, ?, 1, ?)",
+        (division_id, f"Подразделение {division_id}", f"D{division_id}", parent_id),
+    )
+
+
+CYCLE_MESSAGES = {graph.cycle_message for graph in closure_index.GRAPHS.values()}
+
+
+def execute_unless_cycle(db, sql, params):
+    """Выполняет запрос; пропускает только ребра, отклоненные как цикл"""
+    try:
+        db.execute(sql, params)
+    except sqlite3.IntegrityError as e:
+        if str(e) not in CYCLE_MESSAGES:
+            raise
+
+
+def test_incremental_maintenance_matches_rebuild(db):
+    closure_index.install(db)
+    rng = random.Random(7)
+    for division_id in range(1, 61):
+        add_division(db, division_id, rng.randint(1, division_id - 1) if division_id > 1 else None)
+    for _ in range(150):
+        manager_id, subordinate_id = rng.sample(range(1, 41), 2)
+        relation_type = rng.choice(["administrative", "functional"])
+        execute_unless_cycle(
+            db,
+            "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, ?)",
+            (manager_id, subordinate_id, relation_type),
+        )
+
+    # Перемещения, деактивация, смена типа и удаление ребер
+    for _ in range(100):
+        execute_unless_cycle(
+            db,
+            "UPDATE divisions SET parent_id = ? WHERE id = ?",
+            (rng.choice([None, rng.randint(1, 60)]), rng.randint(1, 60)),
+        )
+    for _ in range(80):
+        relation_id = rng.randint(1, 150)
+        execute_unless_cycle(
+            db,
+            rng.choice([
+                "UPDATE functional_relations SET is_active = 1 - is_active WHERE id = ?",
+                "UPDATE functional_relations SET relation_type = 'administrative' WHERE id = ?",
+                "DELETE FROM functional_relations WHERE id = ?",
+            ]),
+            (relation_id,),
+        )
+
+    report = closure_index.check(db)
+    assert report["divisions"]["ok"] and report["staff"]["ok"]
+    assert report["staff"]["rows"] > 0
+
+
+def test_cycles_are_rejected(db):
+    closure_index.install(db)
+    add_division(db, 1)
+    add_division(db, 2, 1)
+    add_division(db, 3, 2)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("UPDATE divisions SET parent_id = 3 WHERE id = 1")
+
+    db.execute("INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (1, 2, 'administrative')")
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (2, 1, 'administrative')")
+    # Для других типов связей цикл допустим
+    db.execute("INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (2, 1, 'functional')")
+
+    assert closure_index.ancestor_ids(db, "divisions", 3) == {2: 1, 1: 2}
+    assert closure_index.descendant_ids(db, "divisions", 1, max_depth=1) == {2: 1}
+
+
+def test_install_builds_index_for_existing_data(db):
+    add_division(db, 1)
+    add_division(db, 2, 1)
+    db.executemany(
+        "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, 'administrative')",
+        [(1, 2), (1, 3), (2, 4), (3, 4)],
+    )
+
+    closure_index.install(db)
+
+    assert closure_index.descendant_ids(db, "divisions", 1) == {2: 1}
+    # К сотруднику 4 два пути через разных руководителей
+    assert closure_index.descendant_ids(db, "staff", 1) == {2: 1, 3: 1, 4: 2}
+    assert db.execute(
+        "SELECT paths FROM staff_admin_closure WHERE ancestor_id = 1 AND descendant_id = 4"
+    ).fetchone() == (2,)
+
+    db.execute("DELETE FROM functional_relations WHERE manager_id = 2")
+    assert closure_index.descendant_ids(db, "staff", 1) == {2: 1, 3: 1, 4: 2}
+    assert closure_index.check(db)["staff"]["ok"]
+
+
+def test_removing_edge_keeps_paths_of_other_lengths(db):
+    # Между 1 и 4 два пути разной длины: 1-2-3-4 и 1-5-6-7-4
+    db.executemany(
+        "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, 'administrative')",
+        [(1, 2), (2, 3), (3, 4), (1, 5), (5, 6), (6, 7), (7, 4)],
+    )
+    closure_index.install(db)
+    assert db.execute(
+        "SELECT depth, paths FROM staff_admin_closure WHERE ancestor_id = 1 AND descendant_id = 4 ORDER BY depth"
+    ).fetchall() == [(3, 1), (4, 1)]
+
+    db.execute("DELETE FROM functional_relations WHERE manager_id = 2 AND subordinate_id = 3")
+    assert db.execute(
+        "SELECT depth, paths FROM staff_admin_closure WHERE ancestor_id = 1 AND descendant_id = 4"
+    ).fetchall() == [(4, 1)]
+    assert closure_index.check(db)["staff"]["ok"]
+
+    db.execute("UPDATE functional_relations SET is_active = 0 WHERE manager_id = 7 AND subordinate_id = 4")
+    assert closure_index.descendant_ids(db, "staff", 1) == {2: 1, 5: 1, 6: 2, 7: 3}
+    assert closure_index.check(db)["staff"]["ok"]
+
+
+def test_install_replaces_outdated_triggers(db):
+    db.executemany(
+        "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, 'administrative')",
+        [(1, 2), (2, 3)],
+    )
+    closure_index.install(db)
+    # Триггер от прошлой версии, который не обновляет индекс
+    db.executescript("""
+        DROP TRIGGER staff_admin_closure_after_delete;
+        CREATE TRIGGER staff_admin_closure_after_delete AFTER DELETE ON functional_relations BEGIN SELECT 1; END;
+    """)
+
+    closure_index.install(db)
+    db.execute("DELETE FROM functional_relations WHERE manager_id = 2")
+
+    assert closure_index.descendant_ids(db, "staff", 1) == {2: 1}
+    assert closure_index.check(db)["staff"]["ok"]
+
+
+def closure_objects(db):
+    return db.execute(
+        "SELECT type, name FROM sqlite_master WHERE name LIKE 'staff_admin_closure%' ORDER BY name"
+    ).fetchall()
+
+
+def test_install_skips_graph_with_cycle_and_leaves_nothing_behind(db):
+    db.executemany(
+        "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, 'administrative')",
+        [(1, 2), (2, 3), (3, 1)],
+    )
+    db.commit()
+
+    add_division(db, 1)
+    db.commit()
+
+    # Граф с циклом пропускается, остальные устанавливаются
+    assert closure_index.install(db) == ["staff"]
+    # Ни таблицы, ни триггеров: следующий запуск построит индекс заново
+    assert closure_objects(db) == []
+    assert not closure_index.is_installed(db, "staff")
+    assert closure_index.is_installed(db, "divisions")
+
+    db.execute("DELETE FROM functional_relations WHERE manager_id = 3")
+    db.commit()
+    closure_index.install(db)
+    assert closure_index.descendant_ids(db, "staff", 1) == {2: 1, 3: 2}
+    assert closure_index.check(db)["staff"]["ok"]
+
+
+def test_install_rebuilds_empty_index_left_by_failed_install(db):
+    db.execute("INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (1, 2, 'administrative')")
+    db.executescript(closure_index.closure_schema(closure_index.GRAPHS["staff"]))
+
+    closure_index.install(db)
+
+    assert closure_index.descendant_ids(db, "staff", 1) == {2: 1}
+
+
+def test_rebuild_counts_paths_through_diamonds_without_enumerating_them(db):
+    # 13 ярусов ромбов: 1 -> (2, 3) -> 4 -> (5, 6) -> 7 ... до сотрудника 40, 2^13 путей
+    edges = []
+    for top in range(1, 38, 3):
+        edges += [(top, top + 1), (top, top + 2), (top + 1, top + 3), (top + 2, top + 3)]
+    db.executemany(
+        "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, 'administrative')",
+        edges,
+    )
+
+    closure_index.install(db)
+    closure_index.rebuild(db, "staff")
+
+    assert db.execute(
+        "SELECT depth, paths FROM staff_admin_closure WHERE ancestor_id = 1 AND descendant_id = 40"
+    ).fetchall() == [(26, 2 ** 13)]
+    assert closure_index.check(db)["staff"]["ok"]
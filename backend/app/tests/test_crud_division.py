@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.crud import crud_division as crud_division_module
+from app.crud.crud_division import division as crud_division
+from app.db.base_class import Base
+from app.models.division import Division
+from app.models.function import Function
+from app.models.organization import Organization
+from app.models.section import Section
+
+# Дерево: 1 -> (2 -> (4, 5 -> 7), 3 -> 6); отдел 5 неактивен
+TREE = {1: None, 2: 1, 3: 1, 4: 2, 5: 2, 6: 3, 7: 5}
+
+
+async def make_session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[Organization.__table__, Division.__table__, Section.__table__, Function.__table__],
+        )
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        db.add(Organization(id=1, name="Холдинг", code="HOLD", org_type="holding"))
+        for division_id, parent_id in TREE.items():
+            db.add(Division(
+                id=division_id, name=f"Отдел {division_id}", code=f"D{division_id}", level=0,
+                is_active=division_id != 5, organization_id=1, parent_id=parent_id,
+            ))
+        db.add(Section(id=1, name="Секция", division_id=4))
+        db.add(Function(id=1, name="Функция", code="F1", section_id=1))
+        await db.commit()
+    return engine, session_factory
+
+
+def test_descendants_in_one_query():
+    async def scenario():
+        engine, session_factory = await make_session_factory()
+        queries = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+        async with session_factory() as db:
+            active = await crud_division.get_all_descendants(db, division_id=1)
+            everything = await crud_division.get_descendant_ids(db, division_id=1, include_inactive=True)
+        await engine.dispose()
+        return [d.id for d in active], sorted(everything), len(queries)
+
+    active, everything, queries = asyncio.run(scenario())
+
+    # Неактивный отдел 5 отсекает и свою ветку
+    assert active == [2, 3, 4, 6]
+    assert everything == [2, 3, 4, 5, 6, 7]
+    assert queries == 2
+
+
+def test_update_with_children_is_one_transaction():
+    async def scenario():
+        engine, session_factory = await make_session_factory()
+        commits = []
+        event.listen(engine.sync_engine, "commit", lambda conn: commits.append(conn))
+        async with session_factory() as db:
+            root = await crud_division.get(db, id=2)
+            await crud_division.update_with_children(db, db_obj=root, obj_in={"is_active": False})
+            result = await db.execute(select(Division.id).where(Division.is_active == False).order_by(Division.id))
+            inactive = list(result.scalars().all())
+        await engine.dispose()
+        return inactive, len(commits)
+
+    inactive, commits = asyncio.run(scenario())
+
+    assert inactive == [2, 4, 5, 7]
+    assert commits == 1
+
+
+def test_build_tree_accepts_any_order():
+    rows = [{"id": division_id, "parent_id": parent_id} for division_id, parent_id in reversed(TREE.items())]
+
+    tree = crud_division.build_tree(rows)
+
+    def shape(nodes):
+        return [(node["id"], shape(node["children"])) for node in nodes]
+
+    assert shape(tree) == [(1, [(3, [(6, [])]), (2, [(5, [(7, [])]), (4, [])])])]
+
+
+def test_division_tree_with_section_leaves():
+    async def scenario():
+        engine, session_factory = await make_session_factory()
+        async with session_factory() as db:
+            tree = await crud_division.get_division_tree(db, organization_id=1, include_leaves=True)
+        await engine.dispose()
+        return tree
+
+    tree = asyncio.run(scenario())
+
+    division_2 = tree[0]["children"][0]
+    assert [child["id"] for child in division_2["children"]] == [4]
+    section = division_2["children"][0]["sections"][0]
+    assert (section["id"], [f["id"] for f in section["functions"]]) == (1, [1])
+    assert json.loads(b"".join(crud_division.iter_tree_json(tree))) == json.loads(json.dumps(tree))
+
+
+def test_cached_tree_is_copied_and_expires(monkeypatch):
+    async def scenario():
+        engine, session_factory = await make_session_factory()
+        crud_division.invalidate_tree_cache()
+        async with session_factory() as db:
+            tree = await crud_division.get_division_tree(db, organization_id=1)
+            tree[0]["children"].clear()
+            cached = await crud_division.get_division_tree(db, organization_id=1)
+            # Запись в обход CRUD (другой воркер, full_api, импорт) видна после TTL
+            await db.execute(Division.__table__.update().where(Division.id == 3).values(is_active=False))
+            await db.commit()
+            stale = await crud_division.get_division_tree(db, organization_id=1)
+            monkeypatch.setattr(crud_division_module.settings, "ORG_TREE_CACHE_TTL", 0.01)
+            await asyncio.sleep(0.02)
+            fresh = await crud_division.get_division_tree(db, organization_id=1)
+        await engine.dispose()
+        crud_division.invalidate_tree_cache()
+        return [[child["id"] for child in result[0]["children"]] for result in (cached, stale, fresh)]
+
+    assert asyncio.run(scenario()) == [[2, 3], [2, 3], [2]]
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.crud.crud_invitation_code import invitation_code as crud_invitation_code
+from app.models.invitation_code import InvitationCode
+from app.schemas.invitation_code import InvitationCodeCreate
+
+NEW_CODE = InvitationCodeCreate(telegram_id="42", user_full_name="Иван Петров", position_id=1, position_name="Разработчик")
+
+
+async def make_engines(url, count=1):
+    engines = [create_async_engine(url) for _ in range(count)]
+    async with engines[0].begin() as conn:
+        await conn.run_sync(InvitationCode.__table__.create)
+    return engines, [async_sessionmaker(engine, expire_on_commit=False) for engine in engines]
+
+
+def test_code_is_consumed_once():
+    async def scenario():
+        engines, (session_factory,) = await make_engines("sqlite+aiosqlite://")
+        async with session_factory() as db:
+            created = await crud_invitation_code.create_code(db, obj_in=NEW_CODE, ttl=timedelta(hours=1))
+            results = [
+                await crud_invitation_code.consume(db, code=created.code, telegram_id="7"),
+                await crud_invitation_code.consume(db, code=created.code, telegram_id="42"),
+                await crud_invitation_code.consume(db, code=created.code, telegram_id="42"),
+                await crud_invitation_code.consume(db, code="NOPE00", telegram_id="42"),
+            ]
+        await engines[0].dispose()
+        return [(code.position_name if code else None, reason) for code, reason in results]
+
+    assert asyncio.run(scenario()) == [
+        (None, "wrong_user"), ("Разработчик", None), (None, "used"), (None, "not_found"),
+    ]
+
+
+def test_expired_codes_are_rejected_and_purged():
+    async def scenario():
+        engines, (session_factory,) = await make_engines("sqlite+aiosqlite://")
+        async with session_factory() as db:
+            expired = await crud_invitation_code.create_code(db, obj_in=NEW_CODE, ttl=timedelta(seconds=-1))
+            await crud_invitation_code.create_code(db, obj_in=NEW_CODE, ttl=timedelta(hours=1))
+            _, reason = await crud_invitation_code.consume(db, code=expired.code, telegram_id="42")
+            removed = await crud_invitation_code.purge_expired(db)
+            left = (await db.execute(select(func.count()).select_from(InvitationCode))).scalar()
+        await engines[0].dispose()
+        return reason, removed, left
+
+    assert asyncio.run(scenario()) == ("expired", 1, 1)
+
+
+def test_parallel_consume_from_two_workers(tmp_path):
+    # Два движка к одному файлу БД - как два воркера uvicorn
+    async def scenario():
+        engines, factories = await make_engines(f"sqlite+aiosqlite:///{tmp_path / 'codes.db'}", count=2)
+        async with factories[0]() as db:
+            code = (await crud_invitation_code.create_code(db, obj_in=NEW_CODE, ttl=timedelta(hours=1))).code
+
+        async def consume(session_factory):
+            async with session_factory() as db:
+                return await crud_invitation_code.consume(db, code=code, telegram_id="42")
+
+        results = await asyncio.gather(*[consume(factories[i % 2]) for i in range(6)])
+        for engine in engines:
+            await engine.dispose()
+        return sorted(str(reason) for _, reason in results)
+
+    assert asyncio.run(scenario()) == ["None"] + ["used"] * 5
@@ -0,0 +1,54 @@
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.crud.crud_organization import organization as crud_organization
+from app.models.organization import Organization
+
+# Холдинг 1 -> юрлица 2, 3 -> локации 4, 5 (у юрлица 2); отдельный совет 6
+ORGS = [
+    (1, "holding", None), (2, "legal_entity", 1), (3, "legal_entity", 1),
+    (4, "location", 2), (5, "location", 2), (6, "board", None),
+]
+
+
+def load_tree(**kwargs):
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Organization.__table__.create)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_factory() as db:
+            for org_id, org_type, parent_id in ORGS:
+                db.add(Organization(id=org_id, name=f"Орг {org_id}", code=f"O{org_id}", org_type=org_type, parent_id=parent_id))
+            await db.commit()
+
+        queries = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+        async with session_factory() as db:
+            tree = await crud_organization.get_tree(db, **kwargs)
+        await engine.dispose()
+        return tree, len(queries)
+
+    return asyncio.run(scenario())
+
+
+def shape(nodes):
+    return [(org.id, shape(org.children)) for org in nodes]
+
+
+def test_full_tree_in_one_query():
+    tree, queries = load_tree()
+
+    assert queries == 1
+    assert shape(tree) == [(1, [(2, [(4, []), (5, [])]), (3, [])]), (6, [])]
+
+
+def test_subtree_and_depth_limit():
+    subtree, _ = load_tree(root_id=2)
+    assert shape(subtree) == [(2, [(4, []), (5, [])])]
+
+    shallow, _ = load_tree(max_depth=1)
+    assert shape(shallow) == [(1, [(2, []), (3, [])]), (6, [])]
+
@@ -0,0 +1,69 @@
+import gzip
+import sqlite3
+
+import pytest
+
+import db_backup
+
+
+@pytest.fixture
+def live_db(tmp_path):
+    # База в WAL, записи которой еще не перенесены из -wal в основной файл
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"item {i}",) for i in range(2000)])
+    conn.commit()
+    yield path
+    conn.close()
+
+
+def count_items(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_includes_wal_contents(live_db, tmp_path):
+    result = db_backup.create_backup(live_db, str(tmp_path / "backups"), compress=None, pages_per_step=2, step_pause_ms=0)
+
+    assert result.integrity == "ok"
+    assert result.steps > 1
+    assert count_items(result.path) == 2000
+
+
+def test_gzip_backup_restores(live_db, tmp_path):
+    result = db_backup.create_backup(live_db, str(tmp_path / "backups"), compress="gzip")
+
+    assert result.path.endswith(".db.gz")
+    restored = tmp_path / "restored.db"
+    with gzip.open(result.path, "rb") as src:
+        restored.write_bytes(src.read())
+    assert count_items(str(restored)) == 2000
+
+
+def test_old_backups_are_rotated(live_db, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    paths = [db_backup.create_backup(live_db, backup_dir, compress=None, keep=2).path for _ in range(4)]
+
+    assert [backup["path"] for backup in db_backup.list_backups(live_db, backup_dir)] == paths[:1:-1]
+
+
+def test_failed_compression_leaves_no_backup(live_db, tmp_path, monkeypatch):
+    backup_dir = tmp_path / "backups"
+
+    def broken_compress(source, target, compress):
+        with open(target, "wb") as dst:
+            dst.write(b"\x1f\x8b truncated")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(db_backup, "_compress", broken_compress)
+    with pytest.raises(db_backup.BackupError):
+        db_backup.create_backup(live_db, str(backup_dir), compress="gzip")
+
+    assert list(backup_dir.iterdir()) == []
+    assert db_backup.list_backups(live_db, str(backup_dir)) == []
@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import export_stream
+from complete_schema import ALL_SCHEMAS
+from db_pool import SQLiteConnectionPool
+from export_stream import ExportFormat, export_response, iter_export
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / "export.db"), size=1)
+    with pool.connection() as conn:
+        for schema in ALL_SCHEMAS:
+            conn.executescript(schema)
+        conn.executemany(
+            "INSERT INTO staff (email, first_name, last_name) VALUES (?, ?, ?)",
+            [(f"user{i}@ofs.ru", f"Имя {i}", "Иванов") for i in range(1, 6)]
+        )
+        conn.executemany(
+            "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (?, ?, ?)",
+            [(1, 2, "administrative"), (1, 3, "functional")]
+        )
+        conn.commit()
+    yield pool
+    pool.close()
+
+
+QUERY = "SELECT id, email, first_name, is_active FROM staff ORDER BY id"
+COLUMNS = ["id", "email", "first_name", "is_active"]
+
+
+def test_ndjson_export_is_chunked(pool):
+    chunks = list(iter_export(QUERY, [], COLUMNS, ExportFormat.NDJSON, chunk_size=2, pool=pool))
+
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3, 4, 5]
+    assert json.loads(lines[0])["first_name"] == "Имя 1"
+
+
+def test_csv_export_starts_with_header(pool):
+    def transform(row):
+        item = dict(row)
+        item["is_active"] = bool(item["is_active"])
+        return item
+
+    stream = iter_export(QUERY, [], COLUMNS, ExportFormat.CSV, transform, chunk_size=2, pool=pool)
+    assert next(stream) == b"id,email,first_name,is_active\r\n"
+
+    rows = list(csv.reader(io.StringIO(b"".join(stream).decode("utf-8"))))
+    assert rows[0] == ["1", "user1@ofs.ru", "Имя 1", "True"]
+    assert len(rows) == 5
+
+
+def test_connection_returned_when_client_disconnects(pool):
+    stream = iter_export(QUERY, [], COLUMNS, ExportFormat.NDJSON, chunk_size=1, pool=pool)
+    next(stream)
+    assert pool.stats()["in_use"] == 1
+
+    stream.close()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_export_response_takes_connection_before_streaming(pool):
+    async def scenario():
+        response = await export_response(QUERY, [], COLUMNS, ExportFormat.NDJSON, "staff", pool=pool)
+        in_use = pool.stats()["in_use"]
+        # Второй выгрузке слота нет: 503 до отправки заголовков
+        with pytest.raises(HTTPException) as error:
+            await export_response(QUERY, [], COLUMNS, ExportFormat.NDJSON, "staff", pool=pool)
+        # Клиент отключился до начала выгрузки: соединение возвращает фоновая задача
+        await response.background()
+        return in_use, error.value.status_code, pool.stats()["in_use"]
+
+    pool.timeout = 0.05
+    assert asyncio.run(scenario()) == (1, 503, 0)
+
+
+@pytest.mark.parametrize("url, rows", [
+    ("/staff/export", 5),
+    ("/functional-relations/export", 2),
+    ("/org-structure/matrix-relations/export", 2),
+])
+def test_export_endpoints_stream_rows(pool, monkeypatch, url, rows):
+    from fastapi.testclient import TestClient
+    from full_api import app
+
+    monkeypatch.setattr(export_stream, "export_pool", pool)
+    client = TestClient(app)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == rows
+    assert pool.stats()["in_use"] == 0
+
+    response = client.get(url, params={"format": "csv"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == rows + 1
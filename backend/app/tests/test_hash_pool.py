@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from hash_pool import BoundedExecutor, QueueFullError
+
+
+def test_rejects_when_queue_is_full():
+    pool = BoundedExecutor(workers=1, queue_limit=2)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(QueueFullError):
+            await pool.run(release.wait)
+        with pytest.raises(HTTPException) as exc:
+            await pool.run_or_503(release.wait)
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "1"
+
+        release.set()
+        await asyncio.gather(*running)
+
+    try:
+        asyncio.run(scenario())
+        stats = pool.stats()
+        assert (stats["completed"], stats["rejected"], stats["in_flight"]) == (2, 2, 0)
+    finally:
+        pool.close()
+
+
+def test_returns_result_of_function():
+    pool = BoundedExecutor(workers=2, queue_limit=4)
+    try:
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    finally:
+        pool.close()
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+from fastapi import HTTPException, Response
+
+from complete_schema import ALL_SCHEMAS
+from list_params import ListParams, NEXT_CURSOR_HEADER
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    conn.executemany(
+        "INSERT INTO sections (name, code, is_active) VALUES (?, ?, ?)",
+        [(f"Отдел {i}", f"S{i}", i % 2) for i in range(1, 8)]
+    )
+    yield conn
+    conn.close()
+
+
+def make_params(after_id=None, limit=None, fields=None):
+    return ListParams(response=Response(), after_id=after_id, limit=limit, fields=fields)
+
+
+def test_keyset_pages_cover_table_once(db):
+    seen = []
+    cursor = None
+    while True:
+        page = make_params(after_id=cursor, limit=3)
+        rows = page.fetch(db, "sections")
+        seen.extend(row["id"] for row in rows)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+        assert page.response.headers[NEXT_CURSOR_HEADER] == str(cursor)
+
+    assert seen == list(range(1, 8))
+
+
+def test_without_limit_returns_everything(db):
+    page = make_params()
+    assert len(page.fetch(db, "sections", ["is_active = ?"], [1])) == 4
+    assert page.next_cursor is None
+
+
+def test_fields_projection(db):
+    page = make_params(limit=2, fields="name,is_active")
+    response = page.projected(page.fetch(db, "sections"))
+
+    assert response.body.decode() == (
+        '[{"id":1,"name":"Отдел 1","is_active":true},{"id":2,"name":"Отдел 2","is_active":false}]'
+    )
+    assert response.headers[NEXT_CURSOR_HEADER] == "2"
+
+
+def test_unknown_field_is_rejected(db):
+    with pytest.raises(HTTPException) as exc:
+        make_params(fields="name,password").fetch(db, "sections")
+    assert exc.value.status_code == 400
@@ -0,0 +1,189 @@
+import sqlite3
+
+import pytest
+
+from complete_schema import ALL_SCHEMAS
+from org_structure_api import (
+    build_org_hierarchy_bulk,
+    build_org_hierarchy_recursive,
+    build_staff_forest,
+    get_org_hierarchy,
+    get_staff_detailed_info,
+    get_staff_detailed_info_batch,
+    get_staff_hierarchy,
+    load_staff_dossiers,
+    StaffInfoBatchRequest,
+)
+from org_tree_cache import hierarchy_cache
+
+
+@pytest.fixture
+def org_db():
+    """База в памяти с небольшой оргструктурой: холдинг, юрлицо, подразделения, отделы, функции"""
+    conn = sqlite3.connect(":memory:")
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    conn.executescript("""
+        INSERT INTO organizations (id, name, code, org_type, parent_id) VALUES
+            (1, 'Холдинг', 'HOLD', 'holding', NULL),
+            (2, 'ООО Бета', 'BETA', 'legal_entity', 1),
+            (3, 'ООО Альфа', 'ALFA', 'legal_entity', 1),
+            (4, 'Филиал', 'LOC', 'location', 3);
+        INSERT INTO divisions (id, name, code, organization_id, parent_id) VALUES
+            (1, 'Продажи', 'SALES', 1, NULL),
+            (2, 'Опт', 'OPT', 1, 1),
+            (3, 'Розница', 'RETAIL', 1, 1),
+            (4, 'Склад', 'STORE', 3, NULL),
+            (5, 'Экспедиция', 'EXP', 3, 4);
+        INSERT INTO sections (id, name, code) VALUES
+            (1, 'Отдел B', 'SB'), (2, 'Отдел A', 'SA'), (3, 'Приемка', 'SR');
+        INSERT INTO division_sections (division_id, section_id) VALUES
+            (1, 1), (1, 2), (2, 1), (4, 3), (5, 3);
+        INSERT INTO functions (id, name, code) VALUES
+            (1, 'Звонки', 'F1'), (2, 'Встречи', 'F2'), (3, 'Учет', 'F3');
+        INSERT INTO section_functions (section_id, function_id) VALUES
+            (1, 1), (1, 2), (3, 3);
+    """)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def staff_db():
+    """База в памяти с иерархией сотрудников: директор, два руководителя, исполнители"""
+    conn = sqlite3.connect(":memory:")
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    conn.executescript("""
+        INSERT INTO staff (id, email, first_name, last_name) VALUES
+            (1, 'ceo@ofs.ru', 'Иван', 'Директоров'),
+            (2, 'a@ofs.ru', 'Анна', 'Борисова'),
+            (3, 'b@ofs.ru', 'Петр', 'Алексеев'),
+            (4, 'c@ofs.ru', 'Олег', 'Васильев'),
+            (5, 'd@ofs.ru', 'Мария', 'Гусева');
+        INSERT INTO positions (id, name, code) VALUES (1, 'Директор', 'CEO'), (2, 'Руководитель', 'HEAD');
+        INSERT INTO staff_positions (staff_id, position_id, is_primary) VALUES (1, 1, 1), (2, 2, 1), (3, 2, 1);
+        INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES
+            (1, 2, 'administrative'),
+            (1, 3, 'administrative'),
+            (2, 4, 'administrative'),
+            (3, 5, 'administrative'),
+            (2, 5, 'functional');
+    """)
+    yield conn
+    conn.close()
+
+
+def test_bulk_hierarchy_matches_recursive(org_db):
+    assert build_org_hierarchy_bulk(org_db) == build_org_hierarchy_recursive(org_db)
+
+
+def test_bulk_hierarchy_query_count_is_constant(org_db):
+    queries = []
+    org_db.set_trace_callback(queries.append)
+    build_org_hierarchy_bulk(org_db)
+    small = len(queries)
+
+    org_db.executescript("""
+        INSERT INTO divisions (id, name, code, organization_id, parent_id) VALUES
+            (6, 'Логистика', 'LOG', 1, 3), (7, 'Маркетинг', 'MKT', 2, NULL);
+        INSERT INTO division_sections (division_id, section_id) VALUES (6, 2), (7, 3);
+    """)
+    queries.clear()
+    build_org_hierarchy_bulk(org_db)
+    org_db.set_trace_callback(None)
+
+    assert len(queries) == small == 4
+
+
+def test_hierarchy_cache_etag_and_invalidation(org_db):
+    hierarchy_cache.invalidate("test")
+
+    first = get_org_hierarchy(bulk=True, if_none_match=None, db=org_db)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    queries = []
+    org_db.set_trace_callback(queries.append)
+    cached = get_org_hierarchy(bulk=True, if_none_match=None, db=org_db)
+    not_modified = get_org_hierarchy(bulk=True, if_none_match=f"W/{etag}", db=org_db)
+    org_db.set_trace_callback(None)
+    assert queries == []
+    assert cached.body == first.body
+    assert not_modified.status_code == 304
+
+    org_db.execute("UPDATE sections SET name = 'Отдел C' WHERE id = 2")
+    hierarchy_cache.invalidate("test")
+    changed = get_org_hierarchy(bulk=True, if_none_match=etag, db=org_db)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_staff_forest_matches_recursive(staff_db):
+    assert get_staff_hierarchy(bulk=True, db=staff_db) == get_staff_hierarchy(bulk=False, db=staff_db)
+
+
+def test_staff_forest_subtree_and_depth(staff_db):
+    subtree = build_staff_forest(staff_db, root_id=3)
+    assert [node["id"] for node in subtree] == [3]
+    assert [child["id"] for child in subtree[0]["children"]] == [5]
+    assert subtree[0]["children"][0]["relations"][0]["manager_id"] == 2
+
+    shallow = build_staff_forest(staff_db, max_depth=1)
+    assert [child["id"] for child in shallow[0]["children"]] == [3, 2]
+    assert all(child["children"] == [] for child in shallow[0]["children"])
+
+
+def test_staff_forest_stops_on_cycles(staff_db):
+    staff_db.execute(
+        "INSERT INTO functional_relations (manager_id, subordinate_id, relation_type) VALUES (4, 2, 'administrative')"
+    )
+
+    result = build_staff_forest(staff_db)
+
+    anna = next(child for child in result[0]["children"] if child["id"] == 2)
+    assert [child["id"] for child in anna["children"]] == [4]
+    assert anna["children"][0]["children"] == []
+
+
+@pytest.fixture
+def dossier_db(staff_db):
+    """staff_db с локациями, функциями и несколькими должностями у сотрудника 2"""
+    staff_db.executescript("""
+        INSERT INTO organizations (id, name, code, org_type) VALUES
+            (1, 'ООО Альфа', 'ALFA', 'legal_entity'), (2, 'Филиал', 'LOC', 'location');
+        UPDATE staff SET primary_organization_id = 1, middle_name = 'Сергеевна' WHERE id = 2;
+        INSERT INTO divisions (id, name, code, organization_id) VALUES (1, 'Продажи', 'SALES', 1);
+        INSERT INTO staff_positions (staff_id, position_id, division_id, is_primary, start_date) VALUES
+            (2, 1, NULL, 0, '2020-01-01'), (2, 1, 1, 0, '2022-01-01');
+        INSERT INTO staff_locations (staff_id, location_id, is_current, date_from) VALUES
+            (2, 2, 0, '2019-01-01'), (2, 1, 1, '2021-01-01');
+        INSERT INTO functions (id, name, code) VALUES (1, 'Звонки', 'F1'), (2, 'Учет', 'F2');
+        INSERT INTO staff_functions (staff_id, function_id, commitment_percent, is_primary, date_from) VALUES
+            (2, 1, 30, 0, '2020-01-01'), (2, 2, 70, 1, '2021-01-01');
+    """)
+    return staff_db
+
+
+def test_dossier_matches_legacy_in_one_query(dossier_db):
+    for staff_id in range(1, 6):
+        queries = []
+        dossier_db.set_trace_callback(queries.append)
+        bulk = get_staff_detailed_info(staff_id, bulk=True, db=dossier_db)
+        dossier_db.set_trace_callback(None)
+
+        assert len(queries) == 1
+        assert bulk == get_staff_detailed_info(staff_id, bulk=False, db=dossier_db)
+
+    anna = load_staff_dossiers(dossier_db, [2])[2]
+    assert anna["primary_organization"] == {"id": 1, "name": "ООО Альфа"}
+    assert [p["is_primary"] for p in anna["positions"]] == [True, False, False]
+    assert [s["subordinate_id"] for s in anna["subordinates"]] == [4, 5]
+    assert load_staff_dossiers(dossier_db, [99]) == {}
+
+
+def test_dossier_batch_keeps_order_and_reports_missing(dossier_db):
+    result = get_staff_detailed_info_batch(StaffInfoBatchRequest(ids=[3, 99, 1, 3]), db=dossier_db)
+
+    assert [item["id"] for item in result["items"]] == [3, 1]
+    assert result["not_found"] == [99]
@@ -0,0 +1,40 @@
+import time
+
+from principal_cache import PrincipalCache
+
+
+def test_hit_miss_and_lru_eviction():
+    cache = PrincipalCache(maxsize=2, ttl=60)
+    cache.put("t1", "a@ofs.ru", "A")
+    cache.put("t2", "b@ofs.ru", "B")
+    assert cache.get("t1") == "A"
+
+    cache.put("t3", "c@ofs.ru", "C")
+
+    assert cache.get("t2") is None
+    assert cache.get("t1") == "A"
+    assert cache.get("t3") == "C"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 1, 1, 2)
+
+
+def test_entry_does_not_outlive_token():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.put("expired", "a@ofs.ru", "A", token_expires_at=time.time() - 1)
+    cache.put("short", "a@ofs.ru", "A", token_expires_at=time.time() + 60)
+
+    assert cache.get("expired") is None
+    assert cache.get("short") == "A"
+
+
+def test_invalidate_subject_drops_all_tokens_of_user():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.put("t1", "a@ofs.ru", "A")
+    cache.put("t2", "a@ofs.ru", "A")
+    cache.put("t3", "b@ofs.ru", "B")
+
+    cache.invalidate_subject("a@ofs.ru")
+
+    assert cache.get("t1") is None
+    assert cache.get("t2") is None
+    assert cache.get("t3") == "B"
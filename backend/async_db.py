@@ -0,0 +1,112 @@
+"""
+Асинхронный доступ к SQLite для обработчиков full_api.
+
+Синхронные обработчики выполняются в общем пуле потоков Starlette (по умолчанию
+40 потоков на все sync-эндпоинты и зависимости). Когда он занят, встают все
+запросы, даже не обращающиеся к базе. AsyncDatabase выполняет работу с базой в
+собственном пуле потоков, размер которого равен числу соединений в db_pool, а
+обработчик объявляется как async def и ждет результат через await:
+
+    rows = await adb.fetchall("SELECT * FROM sections ORDER BY id")
+    rows = await adb.run(page.fetch, "sections")   # fn(conn, *args)
+
+Настройки через переменные окружения:
+    OFS_DB_ASYNC_WORKERS - потоков для работы с базой (по умолчанию OFS_DB_POOL_SIZE)
+"""
+import os
+import asyncio
+import functools
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+import db_pool
+
+logger = logging.getLogger("ofs_api.async_db")
+
+ASYNC_WORKERS = int(os.getenv("OFS_DB_ASYNC_WORKERS", str(db_pool.POOL_SIZE)))
+
+
+class AsyncDatabase:
+    """Выполняет функции над соединением из пула в выделенных потоках"""
+
+    def __init__(self, pool: db_pool.SQLiteConnectionPool, workers: int = ASYNC_WORKERS):
+        if workers < 1:
+            raise ValueError("Число потоков должно быть не меньше 1")
+        self.pool = pool
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Потоки создаются при первом обращении и заново после close()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ofs-db")
+            return self._executor
+
+    def _call(self, fn: Callable, args, kwargs):
+        try:
+            with self.pool.connection() as conn:
+                return fn(conn, *args, **kwargs)
+        except db_pool.PoolTimeoutError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполняет fn(conn, *args, **kwargs) в потоке базы и возвращает результат"""
+        with self._lock:
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_executor(), functools.partial(self._call, fn, args, kwargs)
+            )
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+        return result
+
+    async def fetchall(self, query: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        return await self.run(lambda conn: conn.execute(query, params).fetchall())
+
+    async def fetchone(self, query: str, params: Sequence = ()) -> Optional[sqlite3.Row]:
+        return await self.run(lambda conn: conn.execute(query, params).fetchone())
+
+    async def execute(self, query: str, params: Sequence = ()) -> int:
+        """Выполняет изменяющий запрос с commit, возвращает lastrowid"""
+        def write(conn):
+            cursor = conn.execute(query, params)
+            conn.commit()
+            return cursor.lastrowid
+        return await self.run(write)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+
+# Общий исполнитель поверх общего пула соединений
+adb = AsyncDatabase(db_pool.pool)
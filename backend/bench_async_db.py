@@ -0,0 +1,171 @@
+"""
+Нагрузочный бенчмарк доступа к базе: синхронный обработчик в пуле потоков Starlette
+против async-обработчика с AsyncDatabase.
+
+Поднимает uvicorn в отдельном процессе на временной базе с одним и тем же списком
+сотрудников по двум маршрутам и меряет запросы в секунду и задержки. Второй прогон
+добавляет фоновую нагрузку медленными синхронными запросами (как вход с bcrypt),
+которая занимает пул потоков Starlette.
+
+Запуск: python bench_async_db.py [--requests 2000] [--concurrency 50] [--pool-size 10]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI
+
+from async_db import AsyncDatabase
+from complete_schema import ALL_SCHEMAS
+from db_pool import SQLiteConnectionPool
+from list_params import ListParams
+
+STAFF_ROWS = 5000
+PAGE_SIZE = 50
+SLOW_REQUEST_SECONDS = 0.05
+SLOW_CLIENTS = 60
+
+
+def create_db(path):
+    conn = sqlite3.connect(path)
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    conn.executemany(
+        "INSERT INTO staff (email, first_name, last_name) VALUES (?, ?, ?)",
+        [(f"user{i}@ofs.ru", f"Имя {i}", "Иванов") for i in range(STAFF_ROWS)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def create_app(pool, adb):
+    app = FastAPI()
+
+    async def get_db():
+        async with pool.connection_async() as conn:
+            yield conn
+
+    @app.get("/sync/staff")
+    def sync_staff(page: ListParams = Depends(), db: sqlite3.Connection = Depends(get_db)):
+        return [dict(row) for row in page.fetch(db, "staff")]
+
+    @app.get("/async/staff")
+    async def async_staff(page: ListParams = Depends()):
+        return [dict(row) for row in await adb.run(page.fetch, "staff")]
+
+    @app.get("/slow")
+    def slow():
+        time.sleep(SLOW_REQUEST_SECONDS)
+        return {}
+
+    return app
+
+
+def serve(path, pool_size, port):
+    """Точка входа процесса сервера"""
+    # Предупреждения о долгом ожидании соединения при перегрузке ожидаемы и только шумят
+    logging.getLogger("ofs_api").setLevel(logging.ERROR)
+    pool = SQLiteConnectionPool(path, size=pool_size)
+    adb = AsyncDatabase(pool, workers=pool_size)
+    uvicorn.run(create_app(pool, adb), host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(path, pool_size):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(target=serve, args=(path, pool_size, port), daemon=True)
+    process.start()
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                break
+        except OSError:
+            time.sleep(0.05)
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def load(base_url, path, requests, concurrency, with_slow):
+    """Возвращает (запросов в секунду, p50 мс, p99 мс, ошибок)"""
+    latencies = []
+    errors = 0
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=concurrency + SLOW_CLIENTS)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def slow_client():
+            while not stop.is_set():
+                try:
+                    await client.get("/slow")
+                except httpx.HTTPError:
+                    pass
+
+        async def worker(count):
+            nonlocal errors
+            for i in range(count):
+                started = time.perf_counter()
+                try:
+                    response = await client.get(
+                        path, params={"limit": PAGE_SIZE, "after_id": (i * PAGE_SIZE) % STAFF_ROWS}
+                    )
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        background = [asyncio.create_task(slow_client()) for _ in range(SLOW_CLIENTS if with_slow else 0)]
+        if background:
+            await asyncio.sleep(0.5)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await asyncio.gather(*background)
+
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2],
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        errors,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        create_db(path)
+        process, base_url = start_server(path, args.pool_size)
+
+        print(f"{'сценарий':<32} | {'запросов/с':>10} | {'p50, мс':>8} | {'p99, мс':>8} | {'ошибок':>6}")
+        print("-" * 77)
+        try:
+            for with_slow in (False, True):
+                for route in ("/sync/staff", "/async/staff"):
+                    rps, p50, p99, errors = asyncio.run(load(base_url, route, args.requests, args.concurrency, with_slow))
+                    name = route + (" + медленные sync" if with_slow else "")
+                    print(f"{name:<32} | {rps:>10.0f} | {p50:>8.1f} | {p99:>8.1f} | {errors:>6}")
+        finally:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
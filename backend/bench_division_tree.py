@@ -0,0 +1,124 @@
+"""
+Бенчмарк обхода поддерева отделов в CRUDDivision (SQLAlchemy, SQLite через aiosqlite).
+
+Сравнивает прежний обход (запрос детей на каждый узел, коммит на каждом уровне
+при смене активности) с наборными версиями: get_all_descendants одним
+рекурсивным CTE и _update_children_activity одним UPDATE в одной транзакции.
+Для каждого размера синтетического дерева печатает время и число SQL-запросов.
+
+Запуск: python bench_division_tree.py [--sizes 1000 10000] [--branching 8]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.crud.crud_division import division as crud_division
+from app.db.base_class import Base
+from app.models.division import Division
+from app.models.organization import Organization
+
+
+async def legacy_descendants(db: AsyncSession, division_id: int) -> list:
+    """Прежний обход: отдельный запрос детей на каждый узел"""
+    result = await db.execute(select(Division).where(Division.parent_id == division_id))
+    children = result.scalars().all()
+    descendants = list(children)
+    for child in children:
+        descendants.extend(await legacy_descendants(db, child.id))
+    return descendants
+
+
+async def legacy_update_activity(db: AsyncSession, parent_id: int, is_active: bool) -> None:
+    """Прежнее обновление активности: рекурсия с коммитом на каждом уровне"""
+    result = await db.execute(select(Division).where(Division.parent_id == parent_id))
+    for child in result.scalars().all():
+        child.is_active = is_active
+        db.add(child)
+        await legacy_update_activity(db, child.id, is_active)
+    await db.commit()
+
+
+async def create_tree(session_factory, size: int, branching: int) -> None:
+    async with session_factory() as db:
+        org = Organization(name="Холдинг", code="HOLD", org_type="holding")
+        db.add(org)
+        await db.flush()
+        rows = []
+        for i in range(1, size + 1):
+            parent_id = (i - 2) // branching + 1 if i > 1 else None
+            rows.append({
+                "id": i, "name": f"Отдел {i}", "code": f"D{i}", "level": 0,
+                "is_active": True, "organization_id": org.id, "parent_id": parent_id,
+            })
+        await db.execute(Division.__table__.insert(), rows)
+        await db.commit()
+
+
+async def measure(engine, session_factory, label: str, fn) -> None:
+    queries = 0
+
+    def count(*_):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with session_factory() as db:
+            started = time.perf_counter()
+            result = await fn(db)
+            elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    print(f"  {label:<36} | {elapsed:>10.1f} | {queries:>8} | {result}")
+
+
+async def run(size: int, branching: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                Base.metadata.create_all, tables=[Organization.__table__, Division.__table__]
+            )
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        await create_tree(session_factory, size, branching)
+
+        print(f"Дерево из {size} отделов, ветвление {branching}")
+        print(f"  {'операция':<36} | {'время, мс':>10} | {'запросов':>8} | результат")
+
+        async def old_descendants(db):
+            return len(await legacy_descendants(db, 1))
+
+        async def new_descendants(db):
+            return len(await crud_division.get_all_descendants(db, division_id=1))
+
+        async def old_deactivate(db):
+            await legacy_update_activity(db, 1, False)
+            return "ok"
+
+        async def new_activate(db):
+            await crud_division._update_children_activity(db, parent_id=1, is_active=True)
+            return "ok"
+
+        await measure(engine, session_factory, "get_all_descendants (рекурсия)", old_descendants)
+        await measure(engine, session_factory, "get_all_descendants (CTE)", new_descendants)
+        await measure(engine, session_factory, "смена активности (рекурсия)", old_deactivate)
+        await measure(engine, session_factory, "смена активности (один UPDATE)", new_activate)
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--branching", type=int, default=8)
+    args = parser.parse_args()
+    for size in args.sizes:
+        asyncio.run(run(size, args.branching))
+
+
+if __name__ == "__main__":
+    main()
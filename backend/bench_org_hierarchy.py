@@ -0,0 +1,122 @@
+"""
+Бенчмарк сборки /org-structure/hierarchy.
+Сравнивает рекурсивный обход (bulk=false) и пакетную сборку в памяти (bulk=true)
+на синтетической структуре растущего размера: время и количество SQL-запросов,
+а также время повторного чтения из кэша hierarchy_cache.
+
+Запуск: python bench_org_hierarchy.py
+"""
+import sqlite3
+import time
+
+from complete_schema import ALL_SCHEMAS
+from org_structure_api import build_org_hierarchy_bulk, build_org_hierarchy_recursive, get_org_hierarchy
+from org_tree_cache import hierarchy_cache
+
+# Размеры синтетической структуры: (юрлиц, дочерних подразделений на узел, глубина)
+SIZES = [(1, 2, 2), (2, 3, 3), (4, 3, 4), (8, 4, 4)]
+SECTIONS_PER_DIVISION = 3
+FUNCTIONS_PER_SECTION = 4
+
+
+def create_synthetic_db(legal_entities, branching, depth):
+    """Создает БД в памяти и заполняет ее синтетической оргструктурой"""
+    conn = sqlite3.connect(":memory:")
+    for schema in ALL_SCHEMAS:
+        conn.executescript(schema)
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "INSERT INTO organizations (name, code, org_type) VALUES (?, ?, ?)",
+        ("Холдинг", "HOLD", "holding")
+    )
+    holding_id = cursor.lastrowid
+
+    counter = 0
+    for e in range(legal_entities):
+        cursor.execute(
+            "INSERT INTO organizations (name, code, org_type, parent_id) VALUES (?, ?, ?, ?)",
+            (f"Юрлицо {e}", f"LE-{e}", "legal_entity", holding_id)
+        )
+        entity_id = cursor.lastrowid
+
+        parents = [None]
+        for _ in range(depth):
+            next_parents = []
+            for parent_id in parents:
+                for _ in range(branching):
+                    counter += 1
+                    cursor.execute(
+                        "INSERT INTO divisions (name, code, organization_id, parent_id) VALUES (?, ?, ?, ?)",
+                        (f"Подразделение {counter}", f"DIV-{counter}", entity_id, parent_id)
+                    )
+                    div_id = cursor.lastrowid
+                    next_parents.append(div_id)
+
+                    for s in range(SECTIONS_PER_DIVISION):
+                        cursor.execute(
+                            "INSERT INTO sections (name, code) VALUES (?, ?)",
+                            (f"Отдел {counter}-{s}", f"SEC-{counter}-{s}")
+                        )
+                        sec_id = cursor.lastrowid
+                        cursor.execute(
+                            "INSERT INTO division_sections (division_id, section_id) VALUES (?, ?)",
+                            (div_id, sec_id)
+                        )
+                        for f in range(FUNCTIONS_PER_SECTION):
+                            cursor.execute(
+                                "INSERT INTO functions (name, code) VALUES (?, ?)",
+                                (f"Функция {counter}-{s}-{f}", f"FN-{counter}-{s}-{f}")
+                            )
+                            cursor.execute(
+                                "INSERT INTO section_functions (section_id, function_id) VALUES (?, ?)",
+                                (sec_id, cursor.lastrowid)
+                            )
+            parents = next_parents
+
+    conn.commit()
+    return conn, counter
+
+
+def measure(conn, builder):
+    """Возвращает (результат, время в мс, количество SQL-запросов)"""
+    queries = []
+    conn.set_trace_callback(queries.append)
+    started = time.perf_counter()
+    result = builder(conn)
+    elapsed = (time.perf_counter() - started) * 1000
+    conn.set_trace_callback(None)
+    return result, elapsed, len(queries)
+
+
+def measure_cached(conn, repeats=1000):
+    """Среднее время чтения дерева из прогретого кэша, мкс"""
+    hierarchy_cache.invalidate("бенчмарк")
+    get_org_hierarchy(bulk=True, if_none_match=None, db=conn)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        get_org_hierarchy(bulk=True, if_none_match=None, db=conn)
+    return (time.perf_counter() - started) * 1_000_000 / repeats
+
+
+def main():
+    print(
+        f"{'подразделений':>14} | {'рекурсивно, мс':>15} | {'запросов':>9} | "
+        f"{'пакетно, мс':>12} | {'запросов':>9} | {'из кэша, мкс':>13}"
+    )
+    print("-" * 88)
+    for size in SIZES:
+        conn, divisions = create_synthetic_db(*size)
+        legacy, legacy_ms, legacy_queries = measure(conn, build_org_hierarchy_recursive)
+        bulk, bulk_ms, bulk_queries = measure(conn, build_org_hierarchy_bulk)
+        assert legacy == bulk, "Результаты пакетной и рекурсивной сборки различаются"
+        cached_us = measure_cached(conn)
+        print(
+            f"{divisions:>14} | {legacy_ms:>15.1f} | {legacy_queries:>9} | "
+            f"{bulk_ms:>12.1f} | {bulk_queries:>9} | {cached_us:>13.1f}"
+        )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
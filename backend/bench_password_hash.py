@@ -0,0 +1,136 @@
+"""
+Бенчмарк "шторма входов": проверка bcrypt прямо в async-обработчике против
+ограниченного пула password_pool.
+
+Поднимает uvicorn в отдельном процессе. Клиенты входа непрерывно шлют запросы
+на вход, а отдельный клиент в это же время опрашивает легкий async-эндпоинт
+/ping. Для каждого режима печатает входы в секунду, отказы 503 и задержки /ping.
+
+Запуск: python bench_password_hash.py [--seconds 10] [--login-clients 20] [--rounds 12]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import socket
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Form, HTTPException
+from passlib.context import CryptContext
+
+from hash_pool import BoundedExecutor
+
+PASSWORD = "correct horse battery staple"
+
+
+def create_app(rounds, workers, queue_limit):
+    app = FastAPI()
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    hashed = pwd_context.hash(PASSWORD)
+    pool = BoundedExecutor(workers=workers, queue_limit=queue_limit)
+
+    @app.post("/login/inline")
+    async def login_inline(password: str = Form(...)):
+        if not pwd_context.verify(password, hashed):
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.post("/login/pool")
+    async def login_pool(password: str = Form(...)):
+        if not await pool.run_or_503(pwd_context.verify, password, hashed):
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    return app
+
+
+def serve(port, rounds, workers, queue_limit):
+    # Отказы при переполнении очереди в шторме ожидаемы
+    logging.getLogger("ofs_api").setLevel(logging.ERROR)
+    uvicorn.run(create_app(rounds, workers, queue_limit), host="127.0.0.1", port=port, log_level="error")
+
+
+def start_server(rounds, workers, queue_limit):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(target=serve, args=(port, rounds, workers, queue_limit), daemon=True)
+    process.start()
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                break
+        except OSError:
+            time.sleep(0.05)
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def storm(base_url, login_path, seconds, login_clients):
+    """Возвращает (входов/с, отказов 503, p50 /ping мс, p99 /ping мс)"""
+    logins = 0
+    rejected = 0
+    ping_latencies = []
+    deadline = time.perf_counter() + seconds
+
+    limits = httpx.Limits(max_connections=login_clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def login_client():
+            nonlocal logins, rejected
+            while time.perf_counter() < deadline:
+                response = await client.post(login_path, data={"password": PASSWORD})
+                if response.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                else:
+                    response.raise_for_status()
+                    logins += 1
+
+        async def ping_client():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get("/ping")).raise_for_status()
+                ping_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        await asyncio.gather(ping_client(), *(login_client() for _ in range(login_clients)))
+        elapsed = time.perf_counter() - started
+
+    ping_latencies.sort()
+    return (
+        logins / elapsed,
+        rejected,
+        ping_latencies[len(ping_latencies) // 2],
+        ping_latencies[min(len(ping_latencies) - 1, int(len(ping_latencies) * 0.99))],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--login-clients", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12, help="стоимость bcrypt (passlib по умолчанию 12)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-limit", type=int, default=8)
+    args = parser.parse_args()
+
+    process, base_url = start_server(args.rounds, args.workers, args.queue_limit)
+    print(f"{'режим':<14} | {'входов/с':>9} | {'отказов':>8} | {'/ping p50, мс':>14} | {'/ping p99, мс':>14}")
+    print("-" * 70)
+    try:
+        for name, path in (("inline", "/login/inline"), ("password_pool", "/login/pool")):
+            rate, rejected, p50, p99 = asyncio.run(storm(base_url, path, args.seconds, args.login_clients))
+            print(f"{name:<14} | {rate:>9.1f} | {rejected:>8} | {p50:>14.1f} | {p99:>14.1f}")
+    finally:
+        process.terminate()
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
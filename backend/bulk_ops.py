@@ -0,0 +1,118 @@
+"""
+Общие части пакетных эндпоинтов full_api (/staff/bulk, /positions/bulk и т.д.).
+
+Ссылки на другие таблицы проверяются одним запросом IN (...) на таблицу (с разбиением
+на порции под лимит переменных SQLite), запись идет через executemany в одной
+транзакции, результат возвращается по каждому элементу.
+"""
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+MAX_BULK_ITEMS = int(os.getenv("OFS_BULK_MAX_ITEMS", "5000"))
+
+# Запас до SQLITE_MAX_VARIABLE_NUMBER старых сборок SQLite (999)
+MAX_SQL_VARIABLES = 900
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # created, updated, error, skipped
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    errors: int = 0
+    items: List[BulkItemResult] = []
+
+
+class BulkResults:
+    """Накопитель результатов по элементам пакета"""
+
+    def __init__(self, size: int):
+        self.items: List[Optional[BulkItemResult]] = [None] * size
+
+    def error(self, index: int, detail: str) -> None:
+        self.items[index] = BulkItemResult(index=index, status="error", detail=detail)
+
+    def done(self, index: int, status: str, id: int) -> None:
+        self.items[index] = BulkItemResult(index=index, status=status, id=id)
+
+    def is_error(self, index: int) -> bool:
+        return self.items[index] is not None
+
+    @property
+    def has_errors(self) -> bool:
+        return any(item is not None and item.status == "error" for item in self.items)
+
+    def summary(self) -> BulkResult:
+        """Итог пакета; элементы без результата помечаются как пропущенные"""
+        items = [
+            item if item is not None else BulkItemResult(index=index, status="skipped")
+            for index, item in enumerate(self.items)
+        ]
+        return BulkResult(
+            created=sum(1 for item in items if item.status == "created"),
+            updated=sum(1 for item in items if item.status == "updated"),
+            errors=sum(1 for item in items if item.status == "error"),
+            items=items,
+        )
+
+
+def check_bulk_size(items: Sequence) -> None:
+    if not items:
+        raise HTTPException(status_code=400, detail="Пустой пакет")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Слишком большой пакет: {len(items)} элементов, максимум {MAX_BULK_ITEMS}"
+        )
+
+
+def _chunks(values: List[Any], size: int = MAX_SQL_VARIABLES) -> Iterable[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def fetch_by_keys(
+    db: sqlite3.Connection,
+    table: str,
+    column: str,
+    keys: Iterable[Any],
+    columns: str = "*",
+) -> Dict[Any, sqlite3.Row]:
+    """Строки таблицы, у которых column входит в keys: {значение column: строка}"""
+    unique = list({key for key in keys if key is not None})
+    found = {}
+    for chunk in _chunks(unique):
+        placeholders = ", ".join("?" * len(chunk))
+        rows = db.execute(
+            f"SELECT {columns} FROM {table} WHERE {column} IN ({placeholders})", chunk
+        ).fetchall()
+        for row in rows:
+            found[row[column]] = row
+    return found
+
+
+def existing_ids(db: sqlite3.Connection, table: str, ids: Iterable[Optional[int]]) -> Set[int]:
+    """Какие из ids есть в таблице"""
+    return set(fetch_by_keys(db, table, "id", ids, "id"))
+
+
+def insert_many(db: sqlite3.Connection, sql: str, rows: List[Sequence]) -> List[int]:
+    """
+    executemany для INSERT с возвратом id вставленных строк в порядке rows.
+    Вызывается внутри открытой транзакции: после первой записи соединение держит
+    блокировку на запись, и AUTOINCREMENT выдает строкам пакета подряд идущие id.
+    """
+    if not rows:
+        return []
+    db.executemany(sql, rows)
+    last_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
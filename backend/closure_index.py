@@ -0,0 +1,457 @@
+"""
+Таблицы замыкания (closure table) для иерархий оргструктуры.
+
+Для каждого графа хранятся все пары (предок, потомок) с глубиной, поэтому вопросы
+"все потомки", "цепочка предков" и "на каком уровне" решаются одним индексным
+поиском вместо рекурсии. Поддерживаются два графа:
+    divisions - дерево подразделений (divisions.parent_id -> divisions.id)
+    staff     - административное подчинение (активные functional_relations
+                с relation_type = 'administrative', manager_id -> subordinate_id)
+
+Таблицы обновляются триггерами SQLite на вставку, удаление и изменение ребер,
+поэтому индекс остается верным и при записи в обход API (импорт, скрипты).
+В графе сотрудников у человека может быть несколько руководителей, поэтому
+хранится число путей для каждой пары и глубины: удаление ребра вычитает пути,
+а строки без путей удаляются. Ребра, образующие цикл, отклоняются триггером.
+
+Запуск из командной строки:
+    python closure_index.py rebuild [--graph divisions|staff] [--db путь]
+    python closure_index.py check [--db путь]
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("ofs_api.closure_index")
+
+
+@dataclass(frozen=True)
+class ClosureGraph:
+    """Описание графа: таблица ребер, столбцы родителя и потомка, условие ребра"""
+    name: str
+    table: str
+    source: str
+    parent: str
+    child: str
+    # Условие, при котором строка source является ребром; {row} - NEW, OLD или имя таблицы
+    condition: str
+    # Столбцы, изменение которых может добавить, убрать или перенести ребро
+    watched: tuple
+    cycle_message: str
+
+    def edge_condition(self, row: str) -> str:
+        return self.condition.format(row=row)
+
+
+GRAPHS: Dict[str, ClosureGraph] = {
+    "divisions": ClosureGraph(
+        name="divisions",
+        table="division_closure",
+        source="divisions",
+        parent="parent_id",
+        child="id",
+        condition="{row}.parent_id IS NOT NULL",
+        watched=("id", "parent_id"),
+        cycle_message="Подразделение не может быть вложено в само себя или в свое дочернее подразделение",
+    ),
+    "staff": ClosureGraph(
+        name="staff",
+        table="staff_admin_closure",
+        source="functional_relations",
+        parent="manager_id",
+        child="subordinate_id",
+        condition="{row}.relation_type = 'administrative' AND {row}.is_active = 1",
+        watched=("manager_id", "subordinate_id", "relation_type", "is_active"),
+        cycle_message="Административное подчинение не может образовывать цикл",
+    ),
+}
+
+
+def _link_sql(graph: ClosureGraph, parent: str, child: str) -> str:
+    """Добавляет пути через ребро parent -> child: предки parent x потомки child"""
+    return f"""
+        INSERT INTO {graph.table} (ancestor_id, descendant_id, depth, paths)
+        SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1, a.paths * d.paths
+        FROM (SELECT ancestor_id, depth, paths FROM {graph.table} WHERE descendant_id = {parent}
+              UNION ALL SELECT {parent}, 0, 1) AS a,
+             (SELECT descendant_id, depth, paths FROM {graph.table} WHERE ancestor_id = {child}
+              UNION ALL SELECT {child}, 0, 1) AS d
+        WHERE 1
+        ON CONFLICT (ancestor_id, descendant_id, depth) DO UPDATE SET paths = paths + excluded.paths;"""
+
+
+def _unlink_sql(graph: ClosureGraph, parent: str, child: str) -> str:
+    """
+    Вычитает пути через ребро parent -> child и удаляет строки, где путей не осталось.
+    У пары на другой глубине путей через ребро нет (пути разной длины), ей вычитается 0.
+    """
+    ancestors = (
+        f"(SELECT ancestor_id FROM {graph.table} WHERE descendant_id = {parent} UNION ALL SELECT {parent})"
+    )
+    descendants = (
+        f"(SELECT descendant_id FROM {graph.table} WHERE ancestor_id = {child} UNION ALL SELECT {child})"
+    )
+    return f"""
+        UPDATE {graph.table} SET paths = paths - COALESCE((
+            SELECT SUM(a.paths * d.paths)
+            FROM (SELECT ancestor_id, depth, paths FROM {graph.table} WHERE descendant_id = {parent}
+                  UNION ALL SELECT {parent}, 0, 1) AS a,
+                 (SELECT descendant_id, depth, paths FROM {graph.table} WHERE ancestor_id = {child}
+                  UNION ALL SELECT {child}, 0, 1) AS d
+            WHERE a.ancestor_id = {graph.table}.ancestor_id
+              AND d.descendant_id = {graph.table}.descendant_id
+              AND a.depth + d.depth + 1 = {graph.table}.depth
+        ), 0)
+        WHERE ancestor_id IN {ancestors} AND descendant_id IN {descendants};
+        DELETE FROM {graph.table}
+        WHERE paths <= 0 AND ancestor_id IN {ancestors} AND descendant_id IN {descendants};"""
+
+
+def _cycle_check_sql(graph: ClosureGraph, parent: str, child: str) -> str:
+    """Отклоняет ребро, если родитель уже является потомком (или самим) child"""
+    return f"""
+        SELECT RAISE(ABORT, '{graph.cycle_message}')
+        WHERE {parent} = {child}
+           OR EXISTS (SELECT 1 FROM {graph.table} WHERE ancestor_id = {child} AND descendant_id = {parent});"""
+
+
+def _table_statements(graph: ClosureGraph) -> List[str]:
+    t = graph.table
+    return [
+        f"""CREATE TABLE IF NOT EXISTS {t} (
+    ancestor_id INTEGER NOT NULL,
+    descendant_id INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    paths INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (ancestor_id, descendant_id, depth)
+) WITHOUT ROWID""",
+        f"CREATE INDEX IF NOT EXISTS idx_{t}_descendant ON {t} (descendant_id, depth)",
+    ]
+
+
+# Триггеры графа; install пересоздает их, чтобы старые версии не оставались в базе
+TRIGGER_SUFFIXES = (
+    "before_insert", "after_insert", "after_delete",
+    "before_update", "after_update_unlink", "after_update_link",
+)
+
+
+def _drop_trigger_statements(graph: ClosureGraph) -> List[str]:
+    return [f"DROP TRIGGER IF EXISTS {graph.table}_{suffix}" for suffix in TRIGGER_SUFFIXES]
+
+
+def _trigger_statements(graph: ClosureGraph) -> List[str]:
+    t, src = graph.table, graph.source
+    new_parent, new_child = f"NEW.{graph.parent}", f"NEW.{graph.child}"
+    old_parent, old_child = f"OLD.{graph.parent}", f"OLD.{graph.child}"
+    edge_columns = ", ".join(graph.watched)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {t}_before_insert
+BEFORE INSERT ON {src} WHEN {graph.edge_condition("NEW")}
+BEGIN{_cycle_check_sql(graph, new_parent, new_child)}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {t}_after_insert
+AFTER INSERT ON {src} WHEN {graph.edge_condition("NEW")}
+BEGIN{_link_sql(graph, new_parent, new_child)}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {t}_after_delete
+AFTER DELETE ON {src} WHEN {graph.edge_condition("OLD")}
+BEGIN{_unlink_sql(graph, old_parent, old_child)}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {t}_before_update
+BEFORE UPDATE OF {edge_columns} ON {src} WHEN {graph.edge_condition("NEW")}
+    AND NOT ({graph.edge_condition("OLD")} AND {old_parent} = {new_parent} AND {old_child} = {new_child})
+BEGIN{_cycle_check_sql(graph, new_parent, new_child)}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {t}_after_update_unlink
+AFTER UPDATE OF {edge_columns} ON {src} WHEN {graph.edge_condition("OLD")}
+    AND NOT ({graph.edge_condition("NEW")} AND {old_parent} = {new_parent} AND {old_child} = {new_child})
+BEGIN{_unlink_sql(graph, old_parent, old_child)}
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {t}_after_update_link
+AFTER UPDATE OF {edge_columns} ON {src} WHEN {graph.edge_condition("NEW")}
+    AND NOT ({graph.edge_condition("OLD")} AND {old_parent} = {new_parent} AND {old_child} = {new_child})
+BEGIN{_link_sql(graph, new_parent, new_child)}
+END""",
+    ]
+
+
+def closure_schema(graph: ClosureGraph) -> str:
+    """DDL таблицы замыкания графа и триггеров, которые ее поддерживают"""
+    return "".join(f"\n{statement};\n" for statement in _table_statements(graph) + _trigger_statements(graph))
+
+
+def _compute_closure(conn: sqlite3.Connection, graph: ClosureGraph, target: str) -> None:
+    """
+    Записывает в target замыкание, посчитанное заново по таблице ребер.
+
+    Считается по уровням глубины: строки уровня k+1 получаются из уровня k
+    одним соединением с ребрами и сразу группируются по (предок, потомок),
+    как это делают триггеры. Поэтому на каждом уровне не больше одной строки
+    на пару узлов, даже когда у сотрудника несколько руководителей и путей
+    экспоненциально много. Граф должен быть без циклов (см. find_cycles).
+    """
+    conn.execute("DROP TABLE IF EXISTS temp._closure_edges")
+    conn.execute("DROP TABLE IF EXISTS temp._closure_level")
+    conn.execute("DROP TABLE IF EXISTS temp._closure_next")
+    conn.execute(
+        f"CREATE TEMP TABLE _closure_edges AS "
+        f"SELECT {graph.parent} AS parent_id, {graph.child} AS child_id, COUNT(*) AS cnt "
+        f"FROM {graph.source} AS e WHERE {graph.edge_condition('e')} "
+        f"GROUP BY {graph.parent}, {graph.child}"
+    )
+    conn.execute("CREATE INDEX temp._closure_edges_parent ON _closure_edges (parent_id)")
+    conn.execute(
+        "CREATE TEMP TABLE _closure_level AS "
+        "SELECT parent_id AS ancestor_id, child_id AS descendant_id, cnt AS paths FROM _closure_edges"
+    )
+    max_depth = conn.execute("SELECT COUNT(*) FROM _closure_edges").fetchone()[0]
+    depth = 1
+    while True:
+        added = conn.execute(
+            f"INSERT INTO {target} (ancestor_id, descendant_id, depth, paths) "
+            f"SELECT ancestor_id, descendant_id, ?, paths FROM _closure_level",
+            (depth,),
+        ).rowcount
+        if not added:
+            break
+        if depth > max_depth:
+            raise ValueError(f"Граф {graph.name} содержит цикл")
+        conn.execute(
+            "CREATE TEMP TABLE _closure_next AS "
+            "SELECT l.ancestor_id, e.child_id AS descendant_id, SUM(l.paths * e.cnt) AS paths "
+            "FROM _closure_level AS l JOIN _closure_edges AS e ON e.parent_id = l.descendant_id "
+            "GROUP BY l.ancestor_id, e.child_id"
+        )
+        conn.execute("DROP TABLE temp._closure_level")
+        conn.execute("ALTER TABLE temp._closure_next RENAME TO _closure_level")
+        depth += 1
+    conn.execute("DROP TABLE temp._closure_level")
+    conn.execute("DROP TABLE temp._closure_edges")
+
+
+def is_installed(conn: sqlite3.Connection, graph_name: str) -> bool:
+    """Построен ли индекс графа (триггеры создаются только поверх заполненной таблицы)"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+        (f"{GRAPHS[graph_name].table}_after_insert",),
+    ).fetchone() is not None
+
+
+def _needs_build(conn: sqlite3.Connection, graph: ClosureGraph) -> bool:
+    """
+    Нужно ли строить индекс с нуля. Триггеры создаются в одной транзакции
+    с заполнением таблицы, поэтому их наличие означает, что индекс построен.
+    Пустая таблица при непустом графе - след неудачной установки, когда
+    триггеры создавались раньше заполнения.
+    """
+    if not is_installed(conn, graph.name):
+        return True
+    empty = not conn.execute(f"SELECT 1 FROM {graph.table} LIMIT 1").fetchone()
+    has_edges = conn.execute(
+        f"SELECT 1 FROM {graph.source} AS e WHERE {graph.edge_condition('e')} LIMIT 1"
+    ).fetchone()
+    return bool(empty and has_edges)
+
+
+def install(conn: sqlite3.Connection) -> List[str]:
+    """
+    Создает таблицы замыкания и триггеры. Если индекс еще не построен, таблица
+    заполняется с нуля, и только после этого в той же транзакции создаются
+    триггеры. Если в данных графа есть цикл, транзакция графа откатывается
+    целиком (ни таблицы, ни триггеров не остается, следующий запуск попробует
+    снова), цикл пишется в лог, а остальные графы устанавливаются как обычно:
+    циклы в этих данных допускаются, и запуск API из-за них не прерывается.
+    Возвращает имена пропущенных графов.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    skipped = []
+    for graph in GRAPHS.values():
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            build = _needs_build(conn, graph)
+            for statement in _table_statements(graph):
+                conn.execute(statement)
+            if build:
+                cycle = find_cycles(conn, graph.name)
+                if cycle:
+                    conn.rollback()
+                    skipped.append(graph.name)
+                    logger.error(
+                        f"Индекс {graph.table} не построен: граф {graph.name} содержит цикл через узлы "
+                        f"{cycle[:20]}; после исправления данных он будет построен при следующем запуске"
+                    )
+                    continue
+                conn.execute(f"DELETE FROM {graph.table}")
+                _compute_closure(conn, graph, graph.table)
+                logger.info(f"Индекс {graph.table} построен")
+            for statement in _drop_trigger_statements(graph) + _trigger_statements(graph):
+                conn.execute(statement)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Индекс {graph.table} не построен: {e}")
+            raise
+    return skipped
+
+
+def find_cycles(conn: sqlite3.Connection, graph_name: str) -> List[int]:
+    """Узлы, которые лежат на циклах графа (в данных, а не в индексе)"""
+    graph = GRAPHS[graph_name]
+    children: Dict[int, List[int]] = {}
+    for parent_id, child_id in conn.execute(
+        f"SELECT {graph.parent}, {graph.child} FROM {graph.source} AS e WHERE {graph.edge_condition('e')}"
+    ):
+        children.setdefault(parent_id, []).append(child_id)
+
+    # Итеративный DFS с раскраской: 1 - в стеке, 2 - обработан
+    state: Dict[int, int] = {}
+    on_cycle = set()
+    for root in children:
+        if root in state:
+            continue
+        stack = [(root, iter(children.get(root, ())))]
+        path = [root]
+        state[root] = 1
+        while stack:
+            node, it = stack[-1]
+            child = next(it, None)
+            if child is None:
+                stack.pop()
+                path.pop()
+                state[node] = 2
+            elif state.get(child) == 1:
+                on_cycle.update(path[path.index(child):])
+            elif child not in state:
+                state[child] = 1
+                path.append(child)
+                stack.append((child, iter(children.get(child, ()))))
+    return sorted(on_cycle)
+
+
+def rebuild(conn: sqlite3.Connection, graph_name: Optional[str] = None) -> Dict[str, int]:
+    """
+    Полностью перестраивает таблицы замыкания (все или одну) в одной транзакции.
+    Возвращает число строк в каждой таблице. При циклах в данных бросает ValueError.
+    """
+    names = [graph_name] if graph_name else list(GRAPHS)
+    for name in names:
+        cycle = find_cycles(conn, name)
+        if cycle:
+            raise ValueError(f"Граф {name} содержит цикл через узлы {cycle[:20]}")
+
+    counts = {}
+    with conn:
+        for name in names:
+            graph = GRAPHS[name]
+            conn.execute(f"DELETE FROM {graph.table}")
+            _compute_closure(conn, graph, graph.table)
+            counts[name] = conn.execute(f"SELECT COUNT(*) FROM {graph.table}").fetchone()[0]
+    logger.info(f"Таблицы замыкания перестроены: {counts}")
+    return counts
+
+
+def check(conn: sqlite3.Connection) -> Dict[str, dict]:
+    """
+    Сравнивает таблицы замыкания с пересчитанным заново замыканием.
+    Для каждого графа возвращает число строк, лишние и недостающие строки (до 20 примеров).
+    """
+    report = {}
+    # Временные таблицы открывают транзакцию; чужую транзакцию не завершаем
+    own_transaction = not conn.in_transaction
+    for graph in GRAPHS.values():
+        cycle = find_cycles(conn, graph.name)
+        if cycle:
+            report[graph.name] = {"ok": False, "rows": None, "cycle": cycle[:20]}
+            continue
+        conn.execute("DROP TABLE IF EXISTS temp._closure_expected")
+        conn.execute(
+            "CREATE TEMP TABLE _closure_expected (ancestor_id, descendant_id, depth, paths)"
+        )
+        _compute_closure(conn, graph, "temp._closure_expected")
+        expected = "SELECT ancestor_id, descendant_id, depth, paths FROM temp._closure_expected"
+        stored = f"SELECT ancestor_id, descendant_id, depth, paths FROM {graph.table}"
+        missing = conn.execute(f"{expected} EXCEPT {stored}").fetchall()
+        extra = conn.execute(f"{stored} EXCEPT {expected}").fetchall()
+        conn.execute("DROP TABLE temp._closure_expected")
+        report[graph.name] = {
+            "ok": not missing and not extra,
+            "rows": conn.execute(f"SELECT COUNT(*) FROM {graph.table}").fetchone()[0],
+            "missing": [tuple(row) for row in missing[:20]],
+            "extra": [tuple(row) for row in extra[:20]],
+        }
+    if own_transaction and conn.in_transaction:
+        conn.commit()
+    return report
+
+
+def descendant_ids(
+    conn: sqlite3.Connection, graph_name: str, node_id: int, max_depth: Optional[int] = None
+) -> Dict[int, int]:
+    """Все потомки узла: {id: минимальная глубина}"""
+    graph = GRAPHS[graph_name]
+    query = f"SELECT descendant_id, MIN(depth) FROM {graph.table} WHERE ancestor_id = ?"
+    params: list = [node_id]
+    if max_depth is not None:
+        query += " AND depth <= ?"
+        params.append(max_depth)
+    query += " GROUP BY descendant_id ORDER BY MIN(depth), descendant_id"
+    return {row[0]: row[1] for row in conn.execute(query, params)}
+
+
+def ancestor_ids(conn: sqlite3.Connection, graph_name: str, node_id: int) -> Dict[int, int]:
+    """Все предки узла от ближайшего к корню: {id: минимальная глубина}"""
+    graph = GRAPHS[graph_name]
+    return {
+        row[0]: row[1]
+        for row in conn.execute(
+            f"SELECT ancestor_id, MIN(depth) FROM {graph.table} WHERE descendant_id = ? "
+            f"GROUP BY ancestor_id ORDER BY MIN(depth), ancestor_id",
+            (node_id,),
+        )
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--graph", choices=sorted(GRAPHS), help="только один граф (для rebuild)")
+    parser.add_argument("--db", default=os.getenv("OFS_DB_PATH", "full_api_new.db"))
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        for graph in GRAPHS.values():
+            for statement in _table_statements(graph):
+                conn.execute(statement)
+        if args.command == "rebuild":
+            for name, rows in rebuild(conn, args.graph).items():
+                print(f"{name}: {rows} строк")
+            # Триггеры - только поверх успешно построенного индекса
+            for name in [args.graph] if args.graph else GRAPHS:
+                for statement in _trigger_statements(GRAPHS[name]):
+                    conn.execute(statement)
+            conn.commit()
+            return 0
+
+        failed = False
+        for name, result in check(conn).items():
+            if result.get("cycle"):
+                print(f"{name}: цикл в данных через узлы {result['cycle']}")
+            elif result["ok"]:
+                print(f"{name}: OK, {result['rows']} строк")
+            else:
+                print(f"{name}: расхождения, недостает {result['missing']}, лишние {result['extra']}")
+            failed = failed or not result["ok"]
+        return 1 if failed else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Онлайн-бэкап базы SQLite через backup API (sqlite3.Connection.backup).
+
+В отличие от копирования файла, backup API читает базу через SQLite и видит
+данные, которые еще лежат в -wal файле, поэтому копия согласованная даже при
+работающем API. Копирование идет шагами по pages_per_step страниц с паузой
+между шагами, чтобы не занимать диск и базу целиком. Готовая копия проверяется
+PRAGMA integrity_check, при необходимости сжимается (gzip или zstd, если
+установлен пакет zstandard), а старые бэкапы удаляются по числу хранимых.
+
+Настройки через переменные окружения:
+    OFS_BACKUP_DIR              - каталог бэкапов (по умолчанию backups)
+    OFS_BACKUP_KEEP             - сколько последних бэкапов хранить (по умолчанию 10)
+    OFS_BACKUP_COMPRESS         - gzip, zstd или пусто (без сжатия)
+    OFS_BACKUP_PAGES_PER_STEP   - страниц за шаг копирования (по умолчанию 1024)
+    OFS_BACKUP_STEP_PAUSE_MS    - пауза между шагами в мс (по умолчанию 5)
+
+Запуск из командной строки:
+    python db_backup.py create [--db путь] [--dir каталог] [--compress gzip|zstd] [--keep N] [--no-verify]
+    python db_backup.py list [--db путь] [--dir каталог]
+"""
+import argparse
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import db_pool
+
+logger = logging.getLogger("ofs_api.db_backup")
+
+BACKUP_DIR = os.getenv("OFS_BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("OFS_BACKUP_KEEP", "10"))
+BACKUP_COMPRESS = os.getenv("OFS_BACKUP_COMPRESS", "") or None
+PAGES_PER_STEP = int(os.getenv("OFS_BACKUP_PAGES_PER_STEP", "1024"))
+STEP_PAUSE_MS = float(os.getenv("OFS_BACKUP_STEP_PAUSE_MS", "5"))
+
+COMPRESS_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+# Одновременно выполняется только один бэкап (CLI и эндпоинт в одном процессе)
+_backup_lock = threading.Lock()
+
+
+class BackupError(Exception):
+    """Бэкап не создан: база недоступна, копия повреждена или бэкап уже идет"""
+
+
+@dataclass
+class BackupResult:
+    path: str
+    size: int
+    pages: int
+    steps: int
+    elapsed_ms: float
+    integrity: str
+    compress: Optional[str]
+    removed: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _stem(db_path: str) -> str:
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def list_backups(db_path: str = db_pool.DB_PATH, backup_dir: str = BACKUP_DIR) -> List[Dict]:
+    """Бэкапы базы в каталоге, от новых к старым"""
+    if not os.path.isdir(backup_dir):
+        return []
+    prefix = f"{_stem(db_path)}_"
+    suffixes = tuple(f".db{suffix}" for suffix in COMPRESS_SUFFIXES.values())
+    backups = []
+    for name in os.listdir(backup_dir):
+        if name.startswith(prefix) and name.endswith(suffixes):
+            path = os.path.join(backup_dir, name)
+            backups.append({"path": path, "size": os.path.getsize(path), "mtime": os.path.getmtime(path)})
+    # Имена содержат метку времени, поэтому сортировка по имени - хронологическая
+    return sorted(backups, key=lambda backup: os.path.basename(backup["path"]), reverse=True)
+
+
+def rotate_backups(db_path: str = db_pool.DB_PATH, backup_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> List[str]:
+    """Удаляет бэкапы сверх keep последних; возвращает удаленные пути"""
+    removed = []
+    for backup in list_backups(db_path, backup_dir)[max(keep, 1):]:
+        os.remove(backup["path"])
+        removed.append(backup["path"])
+        logger.info(f"Удален старый бэкап {backup['path']}")
+    return removed
+
+
+def _compress(source: str, target: str, compress: str) -> None:
+    if compress == "gzip":
+        with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    else:
+        import zstandard
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+
+
+def _finalize(partial: str, path: str, compress: Optional[str]) -> str:
+    """
+    Дает проверенной копии итоговое имя, при необходимости сжимая ее.
+
+    Сжатый файл тоже пишется во временный и переименовывается только после
+    успешного сжатия; при ошибке временные файлы удаляются.
+    """
+    if not compress:
+        os.replace(partial, path)
+        return path
+
+    path += COMPRESS_SUFFIXES[compress]
+    compressed = f"{path}.partial"
+    try:
+        _compress(partial, compressed, compress)
+        os.replace(compressed, path)
+    except Exception as e:
+        if os.path.exists(compressed):
+            os.remove(compressed)
+        raise BackupError(f"Не удалось сжать копию ({compress}): {e}") from e
+    finally:
+        os.remove(partial)
+    return path
+
+
+def create_backup(
+    db_path: str = db_pool.DB_PATH,
+    backup_dir: str = BACKUP_DIR,
+    compress: Optional[str] = BACKUP_COMPRESS,
+    keep: int = BACKUP_KEEP,
+    verify: bool = True,
+    pages_per_step: int = PAGES_PER_STEP,
+    step_pause_ms: float = STEP_PAUSE_MS,
+) -> BackupResult:
+    """
+    Создает согласованную копию работающей базы.
+
+    Копия (и ее сжатая версия) пишется во временный файл и получает итоговое
+    имя только после успешной проверки и сжатия, поэтому в каталоге не бывает
+    недописанных бэкапов.
+    """
+    if compress not in COMPRESS_SUFFIXES:
+        raise BackupError(f"Неизвестный формат сжатия: {compress}")
+    if compress == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise BackupError("Для сжатия zstd нужен пакет zstandard (pip install zstandard)")
+    if not os.path.exists(db_path):
+        raise BackupError(f"База данных {db_path} не найдена")
+    if not _backup_lock.acquire(blocking=False):
+        raise BackupError("Бэкап уже выполняется")
+
+    try:
+        os.makedirs(backup_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = os.path.join(backup_dir, f"{_stem(db_path)}_{timestamp}.db")
+        partial = f"{path}.partial"
+
+        steps = 0
+        pages = 0
+
+        def progress(status, remaining, total):
+            nonlocal steps, pages
+            steps += 1
+            pages = total
+            # Пауза между шагами отдает диск и базу рабочим запросам API
+            if remaining and step_pause_ms:
+                time.sleep(step_pause_ms / 1000)
+
+        started = time.perf_counter()
+        source = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, timeout=db_pool.BUSY_TIMEOUT_MS / 1000)
+        target = sqlite3.connect(partial)
+        try:
+            source.backup(target, pages=pages_per_step, progress=progress)
+            integrity = "skipped"
+            if verify:
+                rows = target.execute("PRAGMA integrity_check").fetchall()
+                integrity = "; ".join(row[0] for row in rows)
+                if integrity != "ok":
+                    raise BackupError(f"Копия не прошла integrity_check: {integrity}")
+        except Exception:
+            target.close()
+            os.remove(partial)
+            raise
+        finally:
+            source.close()
+        target.close()
+
+        path = _finalize(partial, path, compress)
+
+        result = BackupResult(
+            path=path,
+            size=os.path.getsize(path),
+            pages=pages,
+            steps=steps,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+            integrity=integrity,
+            compress=compress,
+        )
+        result.removed = rotate_backups(db_path, backup_dir, keep)
+        logger.info(
+            f"Бэкап {result.path} создан: {result.pages} страниц за {result.steps} шагов, "
+            f"{result.elapsed_ms} мс, integrity_check={result.integrity}"
+        )
+        return result
+    finally:
+        _backup_lock.release()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Онлайн-бэкап базы SQLite через backup API")
+    parser.add_argument("command", choices=["create", "list"])
+    parser.add_argument("--db", default=db_pool.DB_PATH, help="путь к базе")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="каталог бэкапов")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], default=BACKUP_COMPRESS)
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="сколько последних бэкапов хранить")
+    parser.add_argument("--no-verify", action="store_true", help="не выполнять integrity_check")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for backup in list_backups(args.db, args.dir):
+            stamp = datetime.fromtimestamp(backup["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{stamp}  {backup['size']:>12}  {backup['path']}")
+        return 0
+
+    try:
+        result = create_backup(args.db, args.dir, args.compress, args.keep, verify=not args.no_verify)
+    except BackupError as e:
+        print(f"Не удалось создать бэкап: {e}")
+        return 1
+    print(f"Бэкап создан: {result.path} ({result.size} байт, {result.elapsed_ms} мс, integrity_check={result.integrity})")
+    for path in result.removed:
+        print(f"Удален старый бэкап: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Пул долгоживущих соединений SQLite для full_api и org_structure_api.
+
+Соединения создаются лениво (не больше size штук) и настраиваются один раз:
+WAL, synchronous=NORMAL, busy_timeout, cache_size/mmap_size и foreign_keys=ON.
+Пул собирает метрики ожидания выдачи соединения.
+
+Зависимость get_db ждет свободное соединение не в пуле потоков Starlette, а в
+отдельных потоках пула: иначе при нагрузке больше размера пула все потоки Starlette
+встают в ожидание, и обработчикам, уже получившим соединение, не на чем выполниться
+и вернуть его (взаимная блокировка до POOL_TIMEOUT).
+
+Настройки через переменные окружения:
+    OFS_DB_PATH              - путь к базе (по умолчанию full_api_new.db)
+    OFS_DB_POOL_SIZE         - размер пула (по умолчанию 10)
+    OFS_DB_POOL_TIMEOUT      - сколько секунд ждать свободное соединение (по умолчанию 30)
+    OFS_DB_BUSY_TIMEOUT_MS   - PRAGMA busy_timeout в мс (по умолчанию 5000)
+    OFS_DB_CACHE_SIZE_KIB    - PRAGMA cache_size в КиБ на соединение (по умолчанию 16384)
+    OFS_DB_MMAP_SIZE         - PRAGMA mmap_size в байтах (по умолчанию 256 МиБ)
+"""
+import os
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+from fastapi import HTTPException
+
+logger = logging.getLogger("ofs_api.db_pool")
+
+DB_PATH = os.getenv("OFS_DB_PATH", "full_api_new.db")
+POOL_SIZE = int(os.getenv("OFS_DB_POOL_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("OFS_DB_POOL_TIMEOUT", "30"))
+BUSY_TIMEOUT_MS = int(os.getenv("OFS_DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KIB = int(os.getenv("OFS_DB_CACHE_SIZE_KIB", "16384"))
+MMAP_SIZE = int(os.getenv("OFS_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Ожидание дольше этого порога логируется как предупреждение
+SLOW_CHECKOUT_MS = 100.0
+
+
+class PoolTimeoutError(Exception):
+    """Свободное соединение не появилось за отведенное время"""
+
+
+class SQLiteConnectionPool:
+    """Потокобезопасный пул соединений SQLite с метриками ожидания"""
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+        cache_size_kib: int = CACHE_SIZE_KIB,
+        mmap_size: int = MMAP_SIZE,
+    ):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._acquire_executor = None
+        self._created = 0
+        self._closed = False
+
+        # Метрики
+        self._checkouts = 0
+        self._timeouts = 0
+        self._in_use = 0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+        self._recent_waits_ms = deque(maxlen=1000)
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Открывает и настраивает новое соединение"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        logger.info(f"Открыто соединение пула #{self._created} к {self.db_path}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Выдает соединение из пула, при необходимости создает новое или ждет освобождения"""
+        if self._closed:
+            raise PoolTimeoutError("Пул соединений закрыт")
+
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            create = False
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+            if create:
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Не удалось получить соединение с БД за {self.timeout} с (размер пула {self.size})"
+                    )
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_total_ms += waited_ms
+            self._wait_max_ms = max(self._wait_max_ms, waited_ms)
+            self._recent_waits_ms.append(waited_ms)
+        if waited_ms > SLOW_CHECKOUT_MS:
+            logger.warning(f"Ожидание соединения из пула заняло {waited_ms:.1f} мс")
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Возвращает соединение в пул, откатывая незавершенную транзакцию"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            # Соединение испорчено - закрываем его, освобождая место для нового
+            logger.error(f"Соединение пула повреждено и будет закрыто: {str(e)}")
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put_nowait(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер: with pool.connection() as conn: ..."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    async def acquire_async(self) -> sqlite3.Connection:
+        """acquire() для асинхронного кода: ожидание идет в собственных потоках пула"""
+        with self._lock:
+            if self._acquire_executor is None:
+                self._acquire_executor = ThreadPoolExecutor(
+                    max_workers=self.size, thread_name_prefix="ofs-db-acquire"
+                )
+            executor = self._acquire_executor
+        return await asyncio.get_running_loop().run_in_executor(executor, self.acquire)
+
+    @asynccontextmanager
+    async def connection_async(self):
+        """Контекстный менеджер: async with pool.connection_async() as conn: ..."""
+        conn = await self.acquire_async()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def open(self) -> None:
+        """Снова разрешает выдачу соединений после close() (повторный запуск приложения)"""
+        self._closed = False
+
+    def close(self) -> None:
+        """Закрывает все свободные соединения; занятые закроются при возврате"""
+        self._closed = True
+        with self._lock:
+            executor, self._acquire_executor = self._acquire_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        """Метрики пула: количество выдач, таймауты и время ожидания соединения"""
+        with self._lock:
+            waits = sorted(self._recent_waits_ms)
+            checkouts = self._checkouts
+            return {
+                "db_path": os.path.abspath(self.db_path),
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "wait_ms_avg": round(self._wait_total_ms / checkouts, 3) if checkouts else 0.0,
+                "wait_ms_max": round(self._wait_max_ms, 3),
+                "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            }
+
+
+# Общий пул приложения
+pool = SQLiteConnectionPool(DB_PATH)
+
+
+async def get_db():
+    """
+    Зависимость FastAPI: выдает соединение из общего пула на время запроса.
+    Если пул исчерпан дольше POOL_TIMEOUT, отвечает 503.
+    """
+    try:
+        conn = await pool.acquire_async()
+    except PoolTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
@@ -0,0 +1,161 @@
+"""
+Потоковая выгрузка больших списков в NDJSON или CSV.
+
+Курсор читается порциями по EXPORT_CHUNK_SIZE строк (OFS_EXPORT_CHUNK_SIZE), каждая
+порция сразу кодируется и отдается клиенту через StreamingResponse, поэтому память
+не растет с числом строк.
+
+Выгрузка держит соединение до конца загрузки, а медленный клиент может читать
+ответ минутами, поэтому соединения берутся не из общего пула запросов, а из
+отдельного небольшого пула export_pool: долгие выгрузки не отнимают соединения
+у остальных эндпоинтов. Соединение берется до отправки заголовков, поэтому при
+исчерпании пула клиент получает 503, а не оборванный ответ 200.
+
+Настройки через переменные окружения:
+    OFS_EXPORT_CHUNK_SIZE        - строк в порции (по умолчанию 1000)
+    OFS_EXPORT_MAX_CONCURRENT    - одновременных выгрузок (по умолчанию 4)
+    OFS_EXPORT_ACQUIRE_TIMEOUT   - сколько секунд ждать свободный слот (по умолчанию 5)
+"""
+import os
+import csv
+import io
+import json
+import logging
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+import db_pool
+
+logger = logging.getLogger("ofs_api.export")
+
+EXPORT_CHUNK_SIZE = int(os.getenv("OFS_EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("OFS_EXPORT_MAX_CONCURRENT", "4"))
+EXPORT_ACQUIRE_TIMEOUT = float(os.getenv("OFS_EXPORT_ACQUIRE_TIMEOUT", "5"))
+
+# Отдельный пул выгрузок: соединения создаются лениво, не больше EXPORT_MAX_CONCURRENT
+export_pool = db_pool.SQLiteConnectionPool(
+    db_pool.DB_PATH, size=EXPORT_MAX_CONCURRENT, timeout=EXPORT_ACQUIRE_TIMEOUT
+)
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+
+def _encode_ndjson(items) -> bytes:
+    return "".join(
+        json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n" for item in items
+    ).encode("utf-8")
+
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+class ExportLease:
+    """Соединение, выданное выгрузке; release() можно вызывать повторно"""
+
+    def __init__(self, pool: db_pool.SQLiteConnectionPool, conn):
+        self.pool = pool
+        self.conn = conn
+
+    def release(self) -> None:
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            self.pool.release(conn)
+
+
+def iter_export(
+    query: str,
+    params: Sequence,
+    columns: Sequence[str],
+    fmt: ExportFormat,
+    transform: Optional[Callable[[Any], Dict[str, Any]]] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    pool: Optional[db_pool.SQLiteConnectionPool] = None,
+    lease: Optional[ExportLease] = None,
+) -> Iterator[bytes]:
+    """
+    Генератор байтов выгрузки. transform превращает строку курсора в словарь
+    (по умолчанию dict(row)); в CSV попадают только columns в заданном порядке.
+    С lease выгрузка идет по уже выданному соединению, иначе соединение берется
+    из pool (по умолчанию export_pool) при первом чтении. В обоих случаях оно
+    возвращается, когда выгрузка закончена или клиент отключился.
+    """
+    transform = transform or dict
+    started = time.perf_counter()
+    total = 0
+
+    if fmt == ExportFormat.CSV:
+        # Заголовок отдаем до первого запроса, чтобы клиент сразу получил первый байт
+        yield _encode_csv([columns])
+
+    if lease is None:
+        pool = pool or export_pool
+        lease = ExportLease(pool, pool.acquire())
+    try:
+        cursor = lease.conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                items = [transform(row) for row in rows]
+                total += len(items)
+                if fmt == ExportFormat.CSV:
+                    yield _encode_csv([[item.get(col) for col in columns] for item in items])
+                else:
+                    yield _encode_ndjson(items)
+        finally:
+            cursor.close()
+    finally:
+        lease.release()
+
+    logger.info(f"Выгрузка {fmt.value}: {total} строк за {(time.perf_counter() - started):.2f} с")
+
+
+async def export_response(
+    query: str,
+    params: Sequence,
+    columns: Sequence[str],
+    fmt: ExportFormat,
+    filename: str,
+    transform: Optional[Callable[[Any], Dict[str, Any]]] = None,
+    pool: Optional[db_pool.SQLiteConnectionPool] = None,
+) -> StreamingResponse:
+    """
+    StreamingResponse с выгрузкой запроса в выбранном формате. Соединение
+    берется до отправки заголовков: если все слоты выгрузок заняты дольше
+    EXPORT_ACQUIRE_TIMEOUT, отвечает 503.
+    """
+    pool = pool or export_pool
+    try:
+        conn = await pool.acquire_async()
+    except db_pool.PoolTimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Слишком много одновременных выгрузок ({pool.size}), повторите позже",
+        )
+    lease = ExportLease(pool, conn)
+    return StreamingResponse(
+        iter_export(query, params, columns, fmt, transform, lease=lease),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt.value}"'},
+        # Если клиент отключился до начала выгрузки, генератор не запустится
+        # и не вернет соединение сам
+        background=BackgroundTask(lease.release),
+    )
@@ -2,7 +2,7 @@ import sqlite3
 import os
 import traceback  # Добавляем модуль для печати стека вызовов
 import logging    # Добавляем логирование
-from fastapi import FastAPI, HTTPException, Depends, Request, APIRouter # <--- Добавляем APIRouter
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, APIRouter # <--- Добавляем APIRouter
 from fastapi.middleware.cors import CORSMiddleware  # Импортируем CORS middleware
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any, Union
@@ -11,6 +11,16 @@ import uvicorn
 from datetime import datetime, date, timedelta
 from complete_schema import ALL_SCHEMAS
 import json
+import db_pool
+from async_db import adb
+from principal_cache import principal_cache
+from hash_pool import password_pool
+from org_tree_cache import hierarchy_cache
+from list_params import ListParams, NEXT_CURSOR_HEADER
+from export_stream import ExportFormat, export_pool, export_response
+from bulk_ops import BulkResult, BulkResults, check_bulk_size, existing_ids, fetch_by_keys, insert_many
+import closure_index
+import db_backup
 
 # --- НОВЫЕ ИМПОРТЫ ДЛЯ АУТЕНТИФИКАЦИИ ---
 from passlib.context import CryptContext
@@ -29,8 +39,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ofs_api")
 
-# Имя нашей базы данных с новой схемой
-DB_PATH = "full_api_new.db"
+# Имя нашей базы данных с новой схемой (можно переопределить через OFS_DB_PATH)
+DB_PATH = db_pool.DB_PATH
 
 # --- НОВЫЕ НАСТРОЙКИ АУТЕНТИФИКАЦИИ ---
 SECRET_KEY = "ofsglobal-super-secret-key-change-me"  # !!! ВАЖНО: Смените этот ключ!
@@ -58,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Разрешаем все HTTP методы
     allow_headers=["*"],  # Разрешаем все заголовки
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],  # Курсор следующей страницы и ETag дерева
 )
 
 # Добавляем middleware для глобальной обработки ошибок
@@ -82,9 +93,20 @@ except ImportError:
 @app.on_event("startup")
 def startup_event():
     logger.info("Выполняется событие startup: инициализация базы данных...")
+    db_pool.pool.open()
+    export_pool.open()
     init_db()
     logger.info("Инициализация базы данных завершена.")
 
+# Закрываем соединения пула при остановке
+@app.on_event("shutdown")
+def shutdown_event():
+    logger.info("Выполняется событие shutdown: закрытие пула соединений с БД...")
+    password_pool.close()
+    adb.close()
+    db_pool.pool.close()
+    export_pool.close()
+
 # ================== МОДЕЛИ PYDANTIC ==================
 
 class OrgType(str, Enum):
@@ -426,19 +448,10 @@ class User(UserBase):
 # ================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==================
 
 # Функция для получения соединения с базой данных
-def get_db():
-    """
-    Возвращает соединение с базой данных для текущего запроса.
-    SQLite не поддерживает многопоточность, поэтому устанавливаем check_same_thread=False
-    и включаем режим WAL для улучшения конкурентного доступа.
-    """
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row  # Это позволит получать данные как словари
-    conn.execute('PRAGMA journal_mode=WAL')  # Улучшает поддержку конкурентного доступа
-    try:
-        yield conn
-    finally:
-        conn.close()
+# Соединение с базой данных для текущего запроса. Берется из общего пула db_pool:
+# оно уже настроено (WAL, synchronous=NORMAL, busy_timeout, foreign_keys) и
+# возвращается в пул после запроса. Та же зависимость используется в org_structure_api.
+get_db = db_pool.get_db
 
 # --- НОВЫЕ УТИЛИТЫ АУТЕНТИФИКАЦИИ ---
 
@@ -461,8 +474,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_user_from_db(db: sqlite3.Connection, email: str) -> Optional[UserInDBBase]:
-    """Вспомогательная функция для получения пользователя из БД по email."""
+def load_user(db: sqlite3.Connection, email: str) -> Optional[UserInDBBase]:
+    """Читает пользователя из БД по email."""
     cursor = db.cursor()
     cursor.execute("SELECT * FROM user WHERE email = ?", (email,))
     user_data = cursor.fetchone()
@@ -470,8 +483,25 @@ async def get_user_from_db(db: sqlite3.Connection, email: str) -> Optional[UserI
         return UserInDBBase.model_validate(dict(user_data))
     return None
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: sqlite3.Connection = Depends(get_db)) -> User:
-    """Зависимость FastAPI для получения текущего пользователя из токена."""
+async def get_user_from_db(db: sqlite3.Connection, email: str) -> Optional[UserInDBBase]:
+    """Вспомогательная функция для получения пользователя из БД по email."""
+    return load_user(db, email)
+
+def invalidate_user(email: str) -> None:
+    """Сбрасывает закэшированные токены пользователя. Вызывать после любого изменения записи в user."""
+    principal_cache.invalidate_subject(email)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Зависимость FastAPI для получения текущего пользователя из токена.
+    Проверенные токены кэшируются в principal_cache: при попадании нет ни
+    декодирования JWT, ни обращения к БД. При промахе пользователь читается
+    через AsyncDatabase, не занимая соединение на весь запрос.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -486,12 +516,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: sqlite3.Conn
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_from_db(db, email=token_data.sub)
+    user = await adb.run(load_user, token_data.sub)
     if user is None:
         raise credentials_exception
     
     # Возвращаем модель User (без хеша пароля)
-    return User.model_validate(user)
+    principal = User.model_validate(user)
+    principal_cache.put(token, token_data.sub, principal, payload.get("exp"))
+    return principal
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Зависимость для проверки, что пользователь активен."""
@@ -499,6 +531,12 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_superuser(current_user: User = Depends(get_current_active_user)) -> User:
+    """Зависимость для административных эндпоинтов: только суперпользователь."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return current_user
+
 # --- КОНЕЦ НОВЫХ УТИЛИТ --- 
 
 # Инициализация базы данных, если она не существует
@@ -527,6 +565,9 @@ def init_db():
         conn.commit()
         logger.info("Применение схем завершено.")
         
+        # Таблицы замыкания иерархий и поддерживающие их триггеры
+        closure_index.install(conn)
+        
         # Проверяем, какие таблицы реально создались
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         existing_tables = sorted([row[0] for row in cursor.fetchall()])
@@ -570,8 +611,8 @@ async def register_user(user_in: UserCreate, db: sqlite3.Connection = Depends(ge
             detail="Пользователь с таким email уже существует",
         )
     
-    # Хешируем пароль
-    hashed_password = get_password_hash(user_in.password)
+    # Хешируем пароль в пуле хеширования, не блокируя цикл событий
+    hashed_password = await password_pool.run_or_503(get_password_hash, user_in.password)
     
     # Добавляем нового пользователя
     try:
@@ -586,6 +627,7 @@ async def register_user(user_in: UserCreate, db: sqlite3.Connection = Depends(ge
             )
         )
         db.commit()
+        invalidate_user(user_in.email)
         user_id = cursor.lastrowid
         logger.info(f"Пользователь {user_in.email} успешно зарегистрирован с ID {user_id}")
         
@@ -606,12 +648,16 @@ async def register_user(user_in: UserCreate, db: sqlite3.Connection = Depends(ge
         )
 
 @auth_router.post("/login/access-token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: sqlite3.Connection = Depends(get_db)):
-    """Аутентификация пользователя и выдача JWT токена."""
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    """
+    Аутентификация пользователя и выдача JWT токена.
+    Проверка пароля bcrypt идет в ограниченном пуле password_pool; соединение с БД
+    на время проверки не удерживается.
+    """
     logger.info(f"Попытка входа пользователя: {form_data.username}")
     
-    user = await get_user_from_db(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await adb.run(load_user, form_data.username)
+    if not user or not await password_pool.run_or_503(verify_password, form_data.password, user.hashed_password):
         logger.warning(f"Неудачная попытка входа для: {form_data.username}")
         raise HTTPException(
             status_code=401,
@@ -639,31 +685,26 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 
 # API для организаций
 @app.get("/organizations/", response_model=List[Organization])
-def read_organizations(
+async def read_organizations(
     org_type: Optional[OrgType] = None,
     parent_id: Optional[int] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
-    cursor = db.cursor()
-    query = "SELECT * FROM organizations"
+    conditions = []
     params = []
     
-    if org_type or parent_id is not None:
-        query += " WHERE"
+    if org_type:
+        conditions.append("org_type = ?")
+        params.append(org_type)
         
-        if org_type:
-            query += " org_type = ?"
-            params.append(org_type)
-            
-        if parent_id is not None:
-            if org_type:
-                query += " AND"
-            query += " parent_id " + ("IS NULL" if parent_id == 0 else "= ?")
-            if parent_id != 0:
-                params.append(parent_id)
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    if parent_id is not None:
+        conditions.append("parent_id " + ("IS NULL" if parent_id == 0 else "= ?"))
+        if parent_id != 0:
+            params.append(parent_id)
+    
+    rows = await adb.run(page.fetch, "organizations", conditions, params)
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/organizations/", response_model=Organization)
@@ -710,6 +751,7 @@ def create_organization(organization: OrganizationCreate, db: sqlite3.Connection
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("organizations")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при создании организации: {str(e)}")
     
@@ -783,6 +825,7 @@ def update_organization(
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("organizations")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при обновлении организации: {str(e)}")
     
@@ -811,36 +854,32 @@ def delete_organization(organization_id: int, db: sqlite3.Connection = Depends(g
     # Удаляем организацию
     cursor.execute("DELETE FROM organizations WHERE id = ?", (organization_id,))
     db.commit()
+    hierarchy_cache.invalidate("organizations")
     
     return {"message": f"Организация с ID {organization_id} успешно удалена"}
 
 # API для подразделений (Division)
 @app.get("/divisions/", response_model=List[Division])
-def read_divisions(
+async def read_divisions(
     organization_id: Optional[int] = None,
     parent_id: Optional[int] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
-    cursor = db.cursor()
-    query = "SELECT * FROM divisions"
+    conditions = []
     params = []
     
-    if organization_id or parent_id is not None:
-        query += " WHERE"
+    if organization_id:
+        conditions.append("organization_id = ?")
+        params.append(organization_id)
         
-        if organization_id:
-            query += " organization_id = ?"
-            params.append(organization_id)
-            
-        if parent_id is not None:
-            if organization_id:
-                query += " AND"
-            query += " parent_id " + ("IS NULL" if parent_id == 0 else "= ?")
-            if parent_id != 0:
-                params.append(parent_id)
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    if parent_id is not None:
+        conditions.append("parent_id " + ("IS NULL" if parent_id == 0 else "= ?"))
+        if parent_id != 0:
+            params.append(parent_id)
+    
+    rows = await adb.run(page.fetch, "divisions", conditions, params)
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/divisions/", response_model=Division)
@@ -885,6 +924,7 @@ def create_division(division: DivisionCreate, db: sqlite3.Connection = Depends(g
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("divisions")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при создании подразделения: {str(e)}")
     
@@ -957,6 +997,7 @@ def update_division(
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("divisions")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при обновлении подразделения: {str(e)}")
     
@@ -988,15 +1029,57 @@ def delete_division(division_id: int, db: sqlite3.Connection = Depends(get_db)):
     # Удаляем подразделение
     cursor.execute("DELETE FROM divisions WHERE id = ?", (division_id,))
     db.commit()
+    hierarchy_cache.invalidate("divisions")
     
     return {"message": f"Подразделение с ID {division_id} успешно удалено"}
 
+def require_closure(db: sqlite3.Connection, graph_name: str) -> None:
+    """503, если индекс иерархии не построен (при запуске в данных был цикл)"""
+    if not closure_index.is_installed(db, graph_name):
+        raise HTTPException(
+            status_code=503,
+            detail="Индекс иерархии не построен: в данных есть цикл, подробности в логе запуска",
+        )
+
+def closure_rows(db: sqlite3.Connection, table: str, ids_by_depth: Dict[int, int]) -> List[Dict[str, Any]]:
+    """Строки table для найденных в таблице замыкания id с добавленной глубиной, в порядке ids_by_depth"""
+    rows = fetch_by_keys(db, table, "id", ids_by_depth)
+    return [
+        {**dict(rows[node_id]), "depth": depth}
+        for node_id, depth in ids_by_depth.items()
+        if node_id in rows
+    ]
+
+@app.get("/divisions/{division_id}/descendants", response_model=List[Dict[str, Any]])
+def read_division_descendants(
+    division_id: int,
+    max_depth: Optional[int] = Query(None, ge=1),
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Все дочерние подразделения любого уровня (из таблицы замыкания), ближайшие первыми.
+    """
+    if not db.execute("SELECT 1 FROM divisions WHERE id = ?", (division_id,)).fetchone():
+        raise HTTPException(status_code=404, detail="Подразделение не найдено")
+    require_closure(db, "divisions")
+    return closure_rows(db, "divisions", closure_index.descendant_ids(db, "divisions", division_id, max_depth))
+
+@app.get("/divisions/{division_id}/ancestors", response_model=List[Dict[str, Any]])
+def read_division_ancestors(division_id: int, db: sqlite3.Connection = Depends(get_db)):
+    """
+    Цепочка родительских подразделений от непосредственного родителя до корня.
+    """
+    if not db.execute("SELECT 1 FROM divisions WHERE id = ?", (division_id,)).fetchone():
+        raise HTTPException(status_code=404, detail="Подразделение не найдено")
+    require_closure(db, "divisions")
+    return closure_rows(db, "divisions", closure_index.ancestor_ids(db, "divisions", division_id))
+
 # API для отделов (Section)
 @app.get("/sections/", response_model=List[Section])
-def read_sections(db: sqlite3.Connection = Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM sections")
-    rows = cursor.fetchall()
+async def read_sections(page: ListParams = Depends()):
+    rows = await adb.run(page.fetch, "sections")
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/sections/", response_model=Section)
@@ -1019,6 +1102,7 @@ def create_section(section: SectionCreate, db: sqlite3.Connection = Depends(get_
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("sections")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при создании отдела: {str(e)}")
     
@@ -1069,6 +1153,7 @@ def update_section(
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("sections")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при обновлении отдела: {str(e)}")
     
@@ -1094,35 +1179,31 @@ def delete_section(section_id: int, db: sqlite3.Connection = Depends(get_db)):
     # Удаляем отдел
     cursor.execute("DELETE FROM sections WHERE id = ?", (section_id,))
     db.commit()
+    hierarchy_cache.invalidate("sections")
     
     return {"message": f"Отдел с ID {section_id} успешно удален"}
 
 # API для связи Division-Section
 @app.get("/division-sections/", response_model=List[DivisionSection])
-def read_division_sections(
+async def read_division_sections(
     division_id: Optional[int] = None,
     section_id: Optional[int] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
-    cursor = db.cursor()
-    query = "SELECT * FROM division_sections"
+    conditions = []
     params = []
     
-    if division_id or section_id:
-        query += " WHERE"
+    if division_id:
+        conditions.append("division_id = ?")
+        params.append(division_id)
         
-        if division_id:
-            query += " division_id = ?"
-            params.append(division_id)
-            
-        if section_id:
-            if division_id:
-                query += " AND"
-            query += " section_id = ?"
-            params.append(section_id)
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    if section_id:
+        conditions.append("section_id = ?")
+        params.append(section_id)
+    
+    rows = await adb.run(page.fetch, "division_sections", conditions, params)
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/division-sections/", response_model=DivisionSection)
@@ -1149,6 +1230,7 @@ def create_division_section(div_section: DivisionSectionCreate, db: sqlite3.Conn
             (div_section.division_id, div_section.section_id, 1 if div_section.is_primary else 0)
         )
         db.commit()
+        hierarchy_cache.invalidate("division_sections")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при создании связи: {str(e)}")
     
@@ -1169,15 +1251,16 @@ def delete_division_section(id: int, db: sqlite3.Connection = Depends(get_db)):
     # Удаляем связь
     cursor.execute("DELETE FROM division_sections WHERE id = ?", (id,))
     db.commit()
+    hierarchy_cache.invalidate("division_sections")
     
     return {"message": f"Связь с ID {id} успешно удалена"}
 
 # API для функций (Function)
 @app.get("/functions/", response_model=List[Function])
-def read_functions(db: sqlite3.Connection = Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM functions")
-    rows = cursor.fetchall()
+async def read_functions(page: ListParams = Depends()):
+    rows = await adb.run(page.fetch, "functions")
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/functions/", response_model=Function)
@@ -1199,6 +1282,7 @@ def create_function(function: FunctionCreate, db: sqlite3.Connection = Depends(g
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("functions")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при создании функции: {str(e)}")
     
@@ -1248,6 +1332,7 @@ def update_function(
             )
         )
         db.commit()
+        hierarchy_cache.invalidate("functions")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при обновлении функции: {str(e)}")
     
@@ -1280,35 +1365,31 @@ def delete_function(function_id: int, db: sqlite3.Connection = Depends(get_db)):
     # Удаляем функцию
     cursor.execute("DELETE FROM functions WHERE id = ?", (function_id,))
     db.commit()
+    hierarchy_cache.invalidate("functions")
     
     return {"message": f"Функция с ID {function_id} успешно удалена"}
 
 # API для связи Section-Function
 @app.get("/section-functions/", response_model=List[SectionFunction])
-def read_section_functions(
+async def read_section_functions(
     section_id: Optional[int] = None,
     function_id: Optional[int] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
-    cursor = db.cursor()
-    query = "SELECT * FROM section_functions"
+    conditions = []
     params = []
     
-    if section_id or function_id:
-        query += " WHERE"
+    if section_id:
+        conditions.append("section_id = ?")
+        params.append(section_id)
         
-        if section_id:
-            query += " section_id = ?"
-            params.append(section_id)
-            
-        if function_id:
-            if section_id:
-                query += " AND"
-            query += " function_id = ?"
-            params.append(function_id)
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    if function_id:
+        conditions.append("function_id = ?")
+        params.append(function_id)
+    
+    rows = await adb.run(page.fetch, "section_functions", conditions, params)
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/section-functions/", response_model=SectionFunction)
@@ -1335,6 +1416,7 @@ def create_section_function(section_function: SectionFunctionCreate, db: sqlite3
             (section_function.section_id, section_function.function_id, 1 if section_function.is_primary else 0)
         )
         db.commit()
+        hierarchy_cache.invalidate("section_functions")
     except sqlite3.IntegrityError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка при создании связи: {str(e)}")
     
@@ -1355,21 +1437,22 @@ def delete_section_function(id: int, db: sqlite3.Connection = Depends(get_db)):
     # Удаляем связь
     cursor.execute("DELETE FROM section_functions WHERE id = ?", (id,))
     db.commit()
+    hierarchy_cache.invalidate("section_functions")
     
     return {"message": f"Связь с ID {id} успешно удалена"}
 
 # API для должностей (Position)
 @app.get("/positions/", response_model=List[Position])
-def read_positions(
+async def read_positions(
     function_id: Optional[int] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
-    cursor = db.cursor()
     if function_id:
-        cursor.execute("SELECT * FROM positions WHERE function_id = ?", (function_id,))
+        rows = await adb.run(page.fetch, "positions", ["function_id = ?"], [function_id])
     else:
-        cursor.execute("SELECT * FROM positions")
-    rows = cursor.fetchall()
+        rows = await adb.run(page.fetch, "positions")
+    if page.fields:
+        return page.projected(rows)
     return [dict(row) for row in rows]
 
 @app.post("/positions/", response_model=Position)
@@ -1406,6 +1489,79 @@ def create_position(position: PositionCreate, db: sqlite3.Connection = Depends(g
     cursor.execute("SELECT * FROM positions WHERE id = ?", (new_id,))
     return dict(cursor.fetchone())
 
+POSITION_INSERT_SQL = """
+    INSERT INTO positions (name, code, description, is_active, function_id)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+POSITION_UPDATE_SQL = """
+    UPDATE positions SET name = ?, code = ?, description = ?, is_active = ?, function_id = ?
+    WHERE id = ?
+"""
+
+@app.post("/positions/bulk", response_model=BulkResult)
+def bulk_create_positions(
+    items: List[PositionCreate],
+    upsert: bool = False,
+    atomic: bool = False,
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Пакетное создание должностей в одной транзакции.
+    upsert=true обновляет должности с совпадающим кодом вместо ошибки.
+    atomic=true ничего не записывает, если хотя бы один элемент с ошибкой.
+    """
+    check_bulk_size(items)
+    results = BulkResults(len(items))
+    
+    function_ids = existing_ids(db, "functions", [p.function_id for p in items])
+    existing = fetch_by_keys(db, "positions", "code", [p.code for p in items], "id, code")
+    
+    to_insert = []
+    to_update = []
+    seen_codes = {}
+    for index, position in enumerate(items):
+        if position.function_id and position.function_id not in function_ids:
+            results.error(index, f"Функция с ID {position.function_id} не найдена")
+            continue
+        
+        if position.code in seen_codes:
+            results.error(index, f"Код {position.code} уже встречается в элементе {seen_codes[position.code]}")
+            continue
+        seen_codes[position.code] = index
+        
+        values = (
+            position.name,
+            position.code,
+            position.description,
+            1 if position.is_active else 0,
+            position.function_id
+        )
+        current = existing.get(position.code)
+        if current is None:
+            to_insert.append((index, values))
+        elif upsert:
+            to_update.append((index, values + (current["id"],)))
+        else:
+            results.error(index, f"Должность с кодом {position.code} уже существует (ID {current['id']})")
+    
+    if atomic and results.has_errors:
+        return results.summary()
+    
+    try:
+        new_ids = insert_many(db, POSITION_INSERT_SQL, [values for _, values in to_insert])
+        db.executemany(POSITION_UPDATE_SQL, [values for _, values in to_update])
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Ошибка при пакетной записи должностей: {str(e)}")
+    
+    for (index, _), new_id in zip(to_insert, new_ids):
+        results.done(index, "created", new_id)
+    for index, values in to_update:
+        results.done(index, "updated", values[-1])
+    return results.summary()
+
 @app.get("/positions/{position_id}", response_model=Position)
 def read_position(position_id: int, db: sqlite3.Connection = Depends(get_db)):
     cursor = db.cursor()
@@ -1486,33 +1642,53 @@ def delete_position(position_id: int, db: sqlite3.Connection = Depends(get_db)):
     return {"message": f"Должность с ID {position_id} успешно удалена"}
 
 # API для сотрудников (Staff)
-@app.get("/staff/", response_model=List[Staff])
-def read_staff(
-    organization_id: Optional[int] = None,
-    primary_organization_id: Optional[int] = None,
-    is_active: Optional[bool] = None,
-    db: sqlite3.Connection = Depends(get_db)
+STAFF_EXPORT_COLUMNS = [
+    "id", "email", "first_name", "last_name", "middle_name", "phone", "description",
+    "is_active", "organization_id", "primary_organization_id", "created_at", "updated_at"
+]
+
+def staff_filters(
+    organization_id: Optional[int],
+    primary_organization_id: Optional[int],
+    is_active: Optional[bool]
 ):
-    """
-    Получить список сотрудников с возможностью фильтрации.
-    """
-    query = "SELECT * FROM staff WHERE 1=1"
+    """Условия WHERE и параметры для фильтров списка сотрудников"""
+    conditions = []
     params = []
     
     if organization_id is not None:
-        query += " AND organization_id = ?"
+        conditions.append("organization_id = ?")
         params.append(organization_id)
-        
+    
     if primary_organization_id is not None:
-        query += " AND primary_organization_id = ?"
+        conditions.append("primary_organization_id = ?")
         params.append(primary_organization_id)
     
     if is_active is not None:
-        query += " AND is_active = ?"
+        conditions.append("is_active = ?")
         params.append(1 if is_active else 0)
     
-    cursor = db.execute(query, params)
-    staff_list = cursor.fetchall()
+    return conditions, params
+
+def staff_export_row(row) -> dict:
+    item = {col: row[col] for col in STAFF_EXPORT_COLUMNS}
+    item["is_active"] = bool(item["is_active"])
+    return item
+
+@app.get("/staff/", response_model=List[Staff])
+async def read_staff(
+    organization_id: Optional[int] = None,
+    primary_organization_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    page: ListParams = Depends()
+):
+    """
+    Получить список сотрудников с возможностью фильтрации.
+    """
+    conditions, params = staff_filters(organization_id, primary_organization_id, is_active)
+    staff_list = await adb.run(page.fetch, "staff", conditions, params)
+    if page.fields:
+        return page.projected(staff_list)
     
     result = []
     for s in staff_list:
@@ -1533,6 +1709,24 @@ def read_staff(
     
     return result
 
+@app.get("/staff/export")
+async def export_staff(
+    format: ExportFormat = ExportFormat.NDJSON,
+    organization_id: Optional[int] = None,
+    primary_organization_id: Optional[int] = None,
+    is_active: Optional[bool] = None
+):
+    """
+    Потоковая выгрузка сотрудников в NDJSON или CSV (для ночной синхронизации с HR).
+    Фильтры те же, что у списка сотрудников.
+    """
+    conditions, params = staff_filters(organization_id, primary_organization_id, is_active)
+    query = f"SELECT {', '.join(STAFF_EXPORT_COLUMNS)} FROM staff"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+    return await export_response(query, params, STAFF_EXPORT_COLUMNS, format, "staff", staff_export_row)
+
 @app.post("/staff/", response_model=Staff)
 def create_staff(staff: StaffCreate, db: sqlite3.Connection = Depends(get_db)):
     """
@@ -1591,6 +1785,93 @@ def create_staff(staff: StaffCreate, db: sqlite3.Connection = Depends(get_db)):
         "updated_at": created["updated_at"]
     }
 
+STAFF_INSERT_SQL = """
+    INSERT INTO staff (
+        email, first_name, last_name, middle_name,
+        phone, description, is_active, organization_id, primary_organization_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+STAFF_UPDATE_SQL = """
+    UPDATE staff SET
+        email = ?, first_name = ?, last_name = ?, middle_name = ?,
+        phone = ?, description = ?, is_active = ?, organization_id = ?, primary_organization_id = ?
+    WHERE id = ?
+"""
+
+@app.post("/staff/bulk", response_model=BulkResult)
+def bulk_create_staff(
+    items: List[StaffCreate],
+    upsert: bool = False,
+    atomic: bool = False,
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Пакетное создание сотрудников в одной транзакции.
+    upsert=true обновляет сотрудников с совпадающим email вместо ошибки.
+    atomic=true ничего не записывает, если хотя бы один элемент с ошибкой.
+    """
+    check_bulk_size(items)
+    results = BulkResults(len(items))
+    
+    org_ids = existing_ids(
+        db, "organizations",
+        [s.organization_id for s in items] + [s.primary_organization_id for s in items]
+    )
+    existing = fetch_by_keys(db, "staff", "email", [s.email for s in items], "id, email")
+    
+    to_insert = []
+    to_update = []
+    seen_emails = {}
+    for index, staff in enumerate(items):
+        for org_id in (staff.organization_id, staff.primary_organization_id):
+            if org_id is not None and org_id not in org_ids:
+                results.error(index, f"Организация с ID {org_id} не найдена")
+                break
+        if results.is_error(index):
+            continue
+        
+        if staff.email in seen_emails:
+            results.error(index, f"Email {staff.email} уже встречается в элементе {seen_emails[staff.email]}")
+            continue
+        seen_emails[staff.email] = index
+        
+        values = (
+            staff.email,
+            staff.first_name,
+            staff.last_name,
+            staff.middle_name,
+            staff.phone,
+            staff.description,
+            1 if staff.is_active else 0,
+            staff.organization_id,
+            staff.primary_organization_id
+        )
+        current = existing.get(staff.email)
+        if current is None:
+            to_insert.append((index, values))
+        elif upsert:
+            to_update.append((index, values + (current["id"],)))
+        else:
+            results.error(index, f"Сотрудник с email {staff.email} уже существует (ID {current['id']})")
+    
+    if atomic and results.has_errors:
+        return results.summary()
+    
+    try:
+        new_ids = insert_many(db, STAFF_INSERT_SQL, [values for _, values in to_insert])
+        db.executemany(STAFF_UPDATE_SQL, [values for _, values in to_update])
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Ошибка при пакетной записи сотрудников: {str(e)}")
+    
+    for (index, _), new_id in zip(to_insert, new_ids):
+        results.done(index, "created", new_id)
+    for index, values in to_update:
+        results.done(index, "updated", values[-1])
+    return results.summary()
+
 @app.post("/staff-positions/", response_model=StaffPosition)
 def create_staff_position(staff_position: StaffPositionCreate, db: sqlite3.Connection = Depends(get_db)):
     cursor = db.cursor()
@@ -1646,6 +1927,76 @@ def create_staff_position(staff_position: StaffPositionCreate, db: sqlite3.Conne
     cursor.execute("SELECT * FROM staff_positions WHERE id = ?", (new_id,))
     return dict(cursor.fetchone())
 
+@app.post("/staff-positions/bulk", response_model=BulkResult)
+def bulk_create_staff_positions(
+    items: List[StaffPositionCreate],
+    atomic: bool = False,
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Пакетное назначение сотрудников на должности в одной транзакции.
+    atomic=true ничего не записывает, если хотя бы один элемент с ошибкой.
+    """
+    check_bulk_size(items)
+    results = BulkResults(len(items))
+    
+    staff_ids = existing_ids(db, "staff", [sp.staff_id for sp in items])
+    position_ids = existing_ids(db, "positions", [sp.position_id for sp in items])
+    locations = fetch_by_keys(db, "organizations", "id", [sp.location_id for sp in items], "id, org_type")
+    
+    to_insert = []
+    for index, staff_position in enumerate(items):
+        if staff_position.staff_id not in staff_ids:
+            results.error(index, f"Сотрудник с ID {staff_position.staff_id} не найден")
+            continue
+        if staff_position.position_id not in position_ids:
+            results.error(index, f"Должность с ID {staff_position.position_id} не найдена")
+            continue
+        if staff_position.location_id:
+            location = locations.get(staff_position.location_id)
+            if location is None:
+                results.error(index, f"Локация с ID {staff_position.location_id} не найдена")
+                continue
+            if location["org_type"] != "location":
+                results.error(
+                    index,
+                    f"Организация с ID {staff_position.location_id} не является локацией (тип: {location['org_type']})"
+                )
+                continue
+        
+        to_insert.append((index, (
+            staff_position.staff_id,
+            staff_position.position_id,
+            staff_position.location_id,
+            1 if staff_position.is_primary else 0,
+            1 if staff_position.is_active else 0,
+            staff_position.start_date.isoformat(),
+            staff_position.end_date.isoformat() if staff_position.end_date else None
+        )))
+    
+    if atomic and results.has_errors:
+        return results.summary()
+    
+    try:
+        new_ids = insert_many(
+            db,
+            """
+            INSERT INTO staff_positions (
+                staff_id, position_id, location_id, is_primary,
+                is_active, start_date, end_date
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [values for _, values in to_insert]
+        )
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Ошибка при пакетном создании связей: {str(e)}")
+    
+    for (index, _), new_id in zip(to_insert, new_ids):
+        results.done(index, "created", new_id)
+    return results.summary()
+
 @app.put("/staff-positions/{id}", response_model=StaffPosition)
 def update_staff_position(
     id: int,
@@ -1727,32 +2078,33 @@ def delete_staff_position(id: int, db: sqlite3.Connection = Depends(get_db)):
 
 # API для связи сотрудников и функций (Staff-Function)
 @app.get("/staff-functions/", response_model=List[StaffFunction])
-def read_staff_functions(
+async def read_staff_functions(
     staff_id: Optional[int] = None,
     function_id: Optional[int] = None,
     is_primary: Optional[bool] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
     """
     Получить список связей сотрудников с функциями с возможностью фильтрации.
     """
-    query = "SELECT * FROM staff_functions WHERE 1=1"
+    conditions = []
     params = []
     
     if staff_id is not None:
-        query += " AND staff_id = ?"
+        conditions.append("staff_id = ?")
         params.append(staff_id)
     
     if function_id is not None:
-        query += " AND function_id = ?"
+        conditions.append("function_id = ?")
         params.append(function_id)
     
     if is_primary is not None:
-        query += " AND is_primary = ?"
+        conditions.append("is_primary = ?")
         params.append(1 if is_primary else 0)
     
-    cursor = db.execute(query, params)
-    staff_functions = cursor.fetchall()
+    staff_functions = await adb.run(page.fetch, "staff_functions", conditions, params)
+    if page.fields:
+        return page.projected(staff_functions)
     
     result = []
     for func in staff_functions:
@@ -1829,6 +2181,72 @@ def create_staff_function(staff_function: StaffFunctionCreate, db: sqlite3.Conne
         "updated_at": created["updated_at"]
     }
 
+@app.post("/staff-functions/bulk", response_model=BulkResult)
+def bulk_create_staff_functions(
+    items: List[StaffFunctionCreate],
+    atomic: bool = False,
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Пакетное создание связей сотрудников с функциями в одной транзакции.
+    Как и при создании по одной, основная функция у сотрудника остается одна:
+    побеждает последний элемент пакета с is_primary=True.
+    atomic=true ничего не записывает, если хотя бы один элемент с ошибкой.
+    """
+    check_bulk_size(items)
+    results = BulkResults(len(items))
+    
+    function_ids = existing_ids(db, "functions", [sf.function_id for sf in items])
+    staff_ids = existing_ids(db, "staff", [sf.staff_id for sf in items])
+    
+    valid = []
+    for index, staff_function in enumerate(items):
+        if staff_function.function_id not in function_ids:
+            results.error(index, f"Функция с ID {staff_function.function_id} не найдена")
+        elif staff_function.staff_id not in staff_ids:
+            results.error(index, f"Сотрудник с ID {staff_function.staff_id} не найден")
+        else:
+            valid.append((index, staff_function))
+    
+    if atomic and results.has_errors:
+        return results.summary()
+    
+    primary_index = {sf.staff_id: index for index, sf in valid if sf.is_primary}
+    to_insert = [
+        (index, (
+            staff_function.staff_id,
+            staff_function.function_id,
+            staff_function.commitment_percent,
+            1 if primary_index.get(staff_function.staff_id) == index else 0,
+            staff_function.date_from,
+            staff_function.date_to
+        ))
+        for index, staff_function in valid
+    ]
+    
+    try:
+        db.executemany(
+            "UPDATE staff_functions SET is_primary = 0 WHERE staff_id = ? AND is_primary = 1",
+            [(staff_id,) for staff_id in primary_index]
+        )
+        new_ids = insert_many(
+            db,
+            """
+            INSERT INTO staff_functions (
+                staff_id, function_id, commitment_percent, is_primary, date_from, date_to
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [values for _, values in to_insert]
+        )
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Ошибка при пакетном создании связей: {str(e)}")
+    
+    for (index, _), new_id in zip(to_insert, new_ids):
+        results.done(index, "created", new_id)
+    return results.summary()
+
 @app.put("/staff-functions/{id}", response_model=StaffFunction)
 def update_staff_function(
     id: int,
@@ -1910,16 +2328,18 @@ def delete_staff_function(id: int, db: sqlite3.Connection = Depends(get_db)):
     return {"message": f"Связь с ID {id} успешно удалена"}
 
 # API для функциональных отношений (FunctionalRelation)
-@app.get("/functional-relations/", response_model=List[FunctionalRelation])
-def read_functional_relations(
-    manager_id: Optional[int] = None,
-    subordinate_id: Optional[int] = None,
-    relation_type: Optional[RelationType] = None,
-    is_active: Optional[bool] = None,
-    db: sqlite3.Connection = Depends(get_db)
+FUNCTIONAL_RELATION_EXPORT_COLUMNS = [
+    "id", "manager_id", "subordinate_id", "relation_type", "description",
+    "is_active", "start_date", "end_date", "created_at", "updated_at"
+]
+
+def functional_relation_filters(
+    manager_id: Optional[int],
+    subordinate_id: Optional[int],
+    relation_type: Optional[RelationType],
+    is_active: Optional[bool]
 ):
-    cursor = db.cursor()
-    query = "SELECT * FROM functional_relations"
+    """Условия WHERE и параметры для фильтров списка функциональных отношений"""
     params = []
     conditions = []
     
@@ -1939,12 +2359,47 @@ def read_functional_relations(
         conditions.append("is_active = ?")
         params.append(1 if is_active else 0)
     
+    return conditions, params
+
+def functional_relation_export_row(row) -> dict:
+    item = {col: row[col] for col in FUNCTIONAL_RELATION_EXPORT_COLUMNS}
+    item["is_active"] = bool(item["is_active"])
+    return item
+
+@app.get("/functional-relations/", response_model=List[FunctionalRelation])
+async def read_functional_relations(
+    manager_id: Optional[int] = None,
+    subordinate_id: Optional[int] = None,
+    relation_type: Optional[RelationType] = None,
+    is_active: Optional[bool] = None,
+    page: ListParams = Depends()
+):
+    conditions, params = functional_relation_filters(manager_id, subordinate_id, relation_type, is_active)
+    rows = await adb.run(page.fetch, "functional_relations", conditions, params)
+    if page.fields:
+        return page.projected(rows)
+    return [dict(row) for row in rows]
+
+@app.get("/functional-relations/export")
+async def export_functional_relations(
+    format: ExportFormat = ExportFormat.NDJSON,
+    manager_id: Optional[int] = None,
+    subordinate_id: Optional[int] = None,
+    relation_type: Optional[RelationType] = None,
+    is_active: Optional[bool] = None
+):
+    """
+    Потоковая выгрузка функциональных отношений в NDJSON или CSV.
+    """
+    conditions, params = functional_relation_filters(manager_id, subordinate_id, relation_type, is_active)
+    query = f"SELECT {', '.join(FUNCTIONAL_RELATION_EXPORT_COLUMNS)} FROM functional_relations"
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    return [dict(row) for row in rows]
+    query += " ORDER BY id"
+    return await export_response(
+        query, params, FUNCTIONAL_RELATION_EXPORT_COLUMNS, format,
+        "functional_relations", functional_relation_export_row
+    )
 
 @app.post("/functional-relations/", response_model=FunctionalRelation)
 def create_functional_relation(relation: FunctionalRelationCreate, db: sqlite3.Connection = Depends(get_db)):
@@ -2026,6 +2481,8 @@ def read_root():
 @app.on_event("startup")
 def startup_event():
     logger.info("Выполняется событие startup: инициализация базы данных...")
+    db_pool.pool.open()
+    export_pool.open()
     init_db()
     logger.info("Инициализация базы данных завершена.")
 
@@ -2036,32 +2493,33 @@ if has_org_structure_router:
 # ================== STAFF LOCATIONS ENDPOINTS ==================
 
 @app.get("/staff-locations/", response_model=List[StaffLocation])
-def read_staff_locations(
+async def read_staff_locations(
     staff_id: Optional[int] = None,
     location_id: Optional[int] = None,
     is_current: Optional[bool] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
     """
     Получить список связей сотрудников с локациями с возможностью фильтрации.
     """
-    query = "SELECT * FROM staff_locations WHERE 1=1"
+    conditions = []
     params = []
     
     if staff_id is not None:
-        query += " AND staff_id = ?"
+        conditions.append("staff_id = ?")
         params.append(staff_id)
     
     if location_id is not None:
-        query += " AND location_id = ?"
+        conditions.append("location_id = ?")
         params.append(location_id)
     
     if is_current is not None:
-        query += " AND is_current = ?"
+        conditions.append("is_current = ?")
         params.append(1 if is_current else 0)
     
-    cursor = db.execute(query, params)
-    staff_locations = cursor.fetchall()
+    staff_locations = await adb.run(page.fetch, "staff_locations", conditions, params)
+    if page.fields:
+        return page.projected(staff_locations)
     
     result = []
     for loc in staff_locations:
@@ -2143,6 +2601,74 @@ def create_staff_location(staff_location: StaffLocationCreate, db: sqlite3.Conne
         "updated_at": created["updated_at"]
     }
 
+@app.post("/staff-locations/bulk", response_model=BulkResult)
+def bulk_create_staff_locations(
+    items: List[StaffLocationCreate],
+    atomic: bool = False,
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Пакетное создание связей сотрудников с локациями в одной транзакции.
+    Текущая локация у сотрудника остается одна: побеждает последний элемент
+    пакета с is_current=True.
+    atomic=true ничего не записывает, если хотя бы один элемент с ошибкой.
+    """
+    check_bulk_size(items)
+    results = BulkResults(len(items))
+    
+    locations = fetch_by_keys(db, "organizations", "id", [sl.location_id for sl in items], "id, org_type")
+    staff_ids = existing_ids(db, "staff", [sl.staff_id for sl in items])
+    
+    valid = []
+    for index, staff_location in enumerate(items):
+        location = locations.get(staff_location.location_id)
+        if location is None:
+            results.error(index, f"Локация с ID {staff_location.location_id} не найдена")
+        elif location["org_type"] != "location":
+            results.error(index, f"Организация с ID {staff_location.location_id} не является локацией")
+        elif staff_location.staff_id not in staff_ids:
+            results.error(index, f"Сотрудник с ID {staff_location.staff_id} не найден")
+        else:
+            valid.append((index, staff_location))
+    
+    if atomic and results.has_errors:
+        return results.summary()
+    
+    current_index = {sl.staff_id: index for index, sl in valid if sl.is_current}
+    to_insert = [
+        (index, (
+            staff_location.staff_id,
+            staff_location.location_id,
+            1 if current_index.get(staff_location.staff_id) == index else 0,
+            staff_location.date_from,
+            staff_location.date_to
+        ))
+        for index, staff_location in valid
+    ]
+    
+    try:
+        db.executemany(
+            "UPDATE staff_locations SET is_current = 0 WHERE staff_id = ? AND is_current = 1",
+            [(staff_id,) for staff_id in current_index]
+        )
+        new_ids = insert_many(
+            db,
+            """
+            INSERT INTO staff_locations (
+                staff_id, location_id, is_current, date_from, date_to
+            ) VALUES (?, ?, ?, ?, ?)
+            """,
+            [values for _, values in to_insert]
+        )
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Ошибка при пакетном создании связей: {str(e)}")
+    
+    for (index, _), new_id in zip(to_insert, new_ids):
+        results.done(index, "created", new_id)
+    return results.summary()
+
 @app.put("/staff-locations/{id}", response_model=StaffLocation)
 def update_staff_location(
     id: int,
@@ -2232,6 +2758,31 @@ def delete_staff_location(id: int, db: sqlite3.Connection = Depends(get_db)):
     
     return {"message": f"Связь локации с ID {id} успешно удалена"}
 
+@app.get("/staff/{staff_id}/subordinates", response_model=List[Dict[str, Any]])
+def read_staff_subordinates(
+    staff_id: int,
+    max_depth: Optional[int] = Query(None, ge=1),
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Все административные подчиненные сотрудника любого уровня (из таблицы замыкания).
+    depth - кратчайшее расстояние по цепочке подчинения.
+    """
+    if not db.execute("SELECT 1 FROM staff WHERE id = ?", (staff_id,)).fetchone():
+        raise HTTPException(status_code=404, detail=f"Сотрудник с ID {staff_id} не найден")
+    require_closure(db, "staff")
+    return closure_rows(db, "staff", closure_index.descendant_ids(db, "staff", staff_id, max_depth))
+
+@app.get("/staff/{staff_id}/managers", response_model=List[Dict[str, Any]])
+def read_staff_managers(staff_id: int, db: sqlite3.Connection = Depends(get_db)):
+    """
+    Все административные руководители сотрудника от непосредственного до верхнего уровня.
+    """
+    if not db.execute("SELECT 1 FROM staff WHERE id = ?", (staff_id,)).fetchone():
+        raise HTTPException(status_code=404, detail=f"Сотрудник с ID {staff_id} не найден")
+    require_closure(db, "staff")
+    return closure_rows(db, "staff", closure_index.ancestor_ids(db, "staff", staff_id))
+
 @app.get("/staff/{staff_id}", response_model=Staff)
 def read_staff_member(staff_id: int, db: sqlite3.Connection = Depends(get_db)):
     """
@@ -2352,7 +2903,7 @@ def delete_staff(staff_id: int, db: sqlite3.Connection = Depends(get_db)):
 
 # Выводим информацию о базе данных
 @app.get("/db-info")
-def get_db_info():
+def get_db_info(conn: sqlite3.Connection = Depends(get_db)):
     """
     Возвращает информацию о базе данных
     """
@@ -2360,7 +2911,6 @@ def get_db_info():
     db_exists = os.path.exists(DB_PATH)
     db_size = os.path.getsize(DB_PATH) if db_exists else 0
     
-    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     # Получаем список таблиц
@@ -2374,8 +2924,6 @@ def get_db_info():
             cursor.execute(f"SELECT COUNT(*) FROM {table}")
             table_stats[table] = cursor.fetchone()[0]
     
-    conn.close()
-    
     return {
         "db_path": db_path,
         "db_exists": db_exists, 
@@ -2384,6 +2932,67 @@ def get_db_info():
         "table_stats": table_stats
     }
 
+@app.get("/db-info/pool")
+def get_db_pool_info():
+    """
+    Возвращает метрики пула соединений: выдачи, таймауты и время ожидания соединения,
+    а также загрузку потоков асинхронного доступа к базе и отдельного пула выгрузок
+    """
+    stats = db_pool.pool.stats()
+    stats["async_executor"] = adb.stats()
+    stats["export_pool"] = export_pool.stats()
+    return stats
+
+@app.get("/db-info/principal-cache")
+def get_principal_cache_info():
+    """
+    Возвращает метрики кэша проверенных токенов: попадания, промахи, вытеснения
+    """
+    return principal_cache.stats()
+
+@app.get("/db-info/password-pool")
+def get_password_pool_info():
+    """
+    Возвращает метрики пула хеширования паролей: задачи в работе, отклоненные, среднее время
+    """
+    return password_pool.stats()
+
+@app.get("/db-info/closure")
+def get_closure_info(
+    db: sqlite3.Connection = Depends(get_db),
+    current_user: User = Depends(get_current_superuser),
+):
+    """
+    Проверяет таблицы замыкания иерархий: сравнивает их с пересчитанными заново.
+    Пересчет полный, поэтому доступен только суперпользователю.
+    Расхождения исправляются командой python closure_index.py rebuild
+    """
+    return closure_index.check(db)
+
+@app.post("/admin/backup")
+def create_db_backup(
+    compress: Optional[str] = Query(None, pattern="^(gzip|zstd)$"),
+    current_user: User = Depends(get_current_superuser),
+):
+    """
+    Создает онлайн-бэкап базы через backup API SQLite (копирование шагами,
+    API не блокируется), проверяет его integrity_check и удаляет старые бэкапы.
+    Без compress используется OFS_BACKUP_COMPRESS
+    """
+    try:
+        result = db_backup.create_backup(compress=compress or db_backup.BACKUP_COMPRESS)
+    except db_backup.BackupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"Бэкап базы создан пользователем {current_user.email}: {result.path}")
+    return result.to_dict()
+
+@app.get("/admin/backups")
+def list_db_backups(current_user: User = Depends(get_current_superuser)):
+    """
+    Возвращает список бэкапов базы, от новых к старым
+    """
+    return db_backup.list_backups()
+
 # Эндпоинты для ЦКП
 @app.post("/vfp/", response_model=VFP)
 def create_vfp(vfp: VFPCreate, db: sqlite3.Connection = Depends(get_db)):
@@ -2447,28 +3056,28 @@ def get_vfp(vfp_id: int, db: sqlite3.Connection = Depends(get_db)):
     }
 
 @app.get("/vfp/", response_model=List[VFP])
-def list_vfps(
+async def list_vfps(
     entity_type: Optional[str] = None,
     entity_id: Optional[int] = None,
     status: Optional[str] = None,
-    db: sqlite3.Connection = Depends(get_db)
+    page: ListParams = Depends()
 ):
-    cursor = db.cursor()
-    query = "SELECT * FROM valuable_final_products WHERE 1=1"
+    conditions = []
     params = []
     
     if entity_type:
-        query += " AND entity_type = ?"
+        conditions.append("entity_type = ?")
         params.append(entity_type)
     if entity_id is not None:
-        query += " AND entity_id = ?"
+        conditions.append("entity_id = ?")
         params.append(entity_id)
     if status:
-        query += " AND status = ?"
+        conditions.append("status = ?")
         params.append(status)
     
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    rows = await adb.run(page.fetch, "valuable_final_products", conditions, params)
+    if page.fields:
+        return page.projected(rows, json_columns=("metrics",))
     
     return [{
         "id": row[0],
@@ -0,0 +1,114 @@
+"""
+Ограниченный пул потоков для тяжелых CPU-операций (хеширование паролей bcrypt).
+
+bcrypt занимает 100-300 мс на вызов. Внутри async-обработчика такой вызов
+останавливает цикл событий, а в общем пуле потоков Starlette пачка входов
+вытесняет остальные запросы. Здесь хеширование выполняется в отдельных потоках
+(bcrypt отпускает GIL), а число ожидающих задач ограничено: при переполнении
+очереди сразу возвращается 503 с Retry-After вместо бесконечного ожидания.
+
+Настройки через переменные окружения:
+    OFS_PASSWORD_HASH_WORKERS - потоков хеширования (по умолчанию число CPU, не больше 4)
+    OFS_PASSWORD_HASH_QUEUE   - максимум задач в работе и в очереди (по умолчанию 64)
+"""
+import os
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger("ofs_api.hash_pool")
+
+HASH_WORKERS = int(os.getenv("OFS_PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("OFS_PASSWORD_HASH_QUEUE", "64"))
+
+
+class QueueFullError(Exception):
+    """В пуле уже максимум задач"""
+
+
+class BoundedExecutor:
+    """Пул потоков с ограничением числа одновременно принятых задач"""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT, name: str = "ofs-hash"):
+        if workers < 1 or queue_limit < 1:
+            raise ValueError("Число потоков и размер очереди должны быть не меньше 1")
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self._busy_ms_total = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _timed(self, fn: Callable, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._busy_ms_total += (time.perf_counter() - started) * 1000
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполняет fn(*args, **kwargs) в пуле; при переполнении бросает QueueFullError"""
+        with self._lock:
+            if self._in_flight >= self.queue_limit:
+                self.rejected += 1
+                raise QueueFullError(f"Очередь {self.name} заполнена ({self.queue_limit} задач)")
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), functools.partial(self._timed, fn, args, kwargs)
+            )
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+
+    async def run_or_503(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """run() для обработчиков: переполнение превращается в 503 с Retry-After"""
+        try:
+            return await self.run(fn, *args, **kwargs)
+        except QueueFullError as e:
+            logger.warning(str(e))
+            raise HTTPException(
+                status_code=503,
+                detail="Сервер перегружен запросами входа, повторите попытку позже",
+                headers={"Retry-After": "1"},
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "busy_ms_avg": round(self._busy_ms_total / self.completed, 1) if self.completed else 0.0,
+            }
+
+
+# Пул для хеширования и проверки паролей
+password_pool = BoundedExecutor()
@@ -0,0 +1,121 @@
+"""
+Постраничная выдача и проекция полей для списковых эндпоинтов full_api.
+
+Списки отдаются по курсору (keyset по id): клиент передает after_id из заголовка
+X-Next-Cursor предыдущей страницы, записи всегда упорядочены по id. Без limit
+возвращается весь список, как раньше.
+
+Параметр fields=id,name ограничивает выбираемые и отдаваемые столбцы; id
+добавляется всегда, чтобы по ответу можно было продолжить выдачу.
+"""
+import os
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+
+MAX_PAGE_SIZE = int(os.getenv("OFS_MAX_PAGE_SIZE", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Столбцы таблиц: схема не меняется во время работы, читаем PRAGMA один раз
+_table_columns: Dict[str, List[str]] = {}
+
+
+def get_table_columns(db: sqlite3.Connection, table: str) -> List[str]:
+    """Список столбцов таблицы"""
+    columns = _table_columns.get(table)
+    if columns is None:
+        columns = [row[1] for row in db.execute(f"PRAGMA table_info({table})").fetchall()]
+        if columns:
+            _table_columns[table] = columns
+    return columns
+
+
+class ListParams:
+    """Зависимость FastAPI: курсор, размер страницы и проекция полей"""
+
+    def __init__(
+        self,
+        response: Response,
+        after_id: Optional[int] = Query(
+            None, ge=0, description="Курсор: вернуть записи с id больше указанного"
+        ),
+        limit: Optional[int] = Query(
+            None, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы; без него возвращается весь список"
+        ),
+        fields: Optional[str] = Query(
+            None, description="Поля через запятую, например id,name"
+        ),
+    ):
+        self.response = response
+        self.after_id = after_id
+        self.limit = limit
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        self.next_cursor: Optional[int] = None
+
+    def select_columns(self, db: sqlite3.Connection, table: str) -> str:
+        """Часть SELECT для запрошенных полей; неизвестное поле - ошибка 400"""
+        if not self.fields:
+            return "*"
+        columns = get_table_columns(db, table)
+        unknown = [f for f in self.fields if f not in columns]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Неизвестные поля: {', '.join(unknown)}. Доступны: {', '.join(columns)}"
+            )
+        selected = ["id"] + [f for f in self.fields if f != "id"]
+        return ", ".join(selected)
+
+    def fetch(
+        self,
+        db: sqlite3.Connection,
+        table: str,
+        conditions: Sequence[str] = (),
+        params: Sequence = (),
+    ) -> List[sqlite3.Row]:
+        """
+        Выбирает одну страницу таблицы по условиям (соединяются через AND).
+        Если страница заполнена целиком, выставляет заголовок X-Next-Cursor.
+        """
+        conditions = list(conditions)
+        params = list(params)
+        if self.after_id is not None:
+            conditions.append("id > ?")
+            params.append(self.after_id)
+
+        query = f"SELECT {self.select_columns(db, table)} FROM {table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+        if self.limit is not None:
+            query += " LIMIT ?"
+            params.append(self.limit)
+
+        rows = db.execute(query, params).fetchall()
+        if self.limit is not None and len(rows) == self.limit:
+            self.next_cursor = rows[-1]["id"]
+            self.response.headers[NEXT_CURSOR_HEADER] = str(self.next_cursor)
+        return rows
+
+    def projected(self, rows: Iterable[sqlite3.Row], json_columns: Sequence[str] = ()) -> JSONResponse:
+        """
+        Ответ для запроса с fields: только выбранные столбцы, без полной модели ответа.
+        Флаги is_* приводятся к bool, json_columns разбираются из JSON.
+        """
+        items = []
+        for row in rows:
+            item = dict(row)
+            for key, value in item.items():
+                if key.startswith("is_") and value is not None:
+                    item[key] = bool(value)
+                elif key in json_columns and value:
+                    item[key] = json.loads(value)
+            items.append(item)
+
+        headers = {}
+        if self.next_cursor is not None:
+            headers[NEXT_CURSOR_HEADER] = str(self.next_cursor)
+        return JSONResponse(content=items, headers=headers)
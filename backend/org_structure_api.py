@@ -1,19 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+import os
 import sqlite3
-from typing import List, Dict, Any, Optional
+import logging
+import json
+from typing import List, Dict, Any, Optional, Annotated
 from pydantic import BaseModel
 from datetime import datetime
 
-# Создаем свою функцию для получения соединения с БД
-def get_db():
-    """Предоставляет соединение с базой данных."""
-    DB_PATH = "full_api_new.db"
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+# Соединения выдаются из общего с full_api пула
+from db_pool import get_db
+from org_tree_cache import hierarchy_cache, etag_matches
+from export_stream import ExportFormat, export_response
+from bulk_ops import MAX_SQL_VARIABLES
+
+logger = logging.getLogger("ofs_api.org_structure")
 
 router = APIRouter(
     prefix="/org-structure",
@@ -36,6 +36,7 @@ class StaffNode(BaseModel):
     position: str
     email: Optional[str] = None
     relations: Optional[List[Dict[str, Any]]] = []
+    children: Optional[List[Any]] = []
 
 class MatrixRelation(BaseModel):
     id: int
@@ -49,11 +50,37 @@ class MatrixRelation(BaseModel):
 
 # API эндпоинты для организационной структуры
 @router.get("/hierarchy", response_model=List[OrgStructureNode])
-def get_org_hierarchy(db: sqlite3.Connection = Depends(get_db)):
+def get_org_hierarchy(
+    bulk: bool = True,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    db: sqlite3.Connection = Depends(get_db)
+):
     """
     Получает иерархическую структуру организации.
     Структура включает организации, подразделения, отделы.
+
+    По умолчанию дерево собирается в памяти из нескольких пакетных запросов (bulk=true)
+    и отдается из кэша hierarchy_cache с ETag; при совпадении If-None-Match отвечает 304.
+    Параметр bulk=false включает старый рекурсивный обход без кэша.
     """
+    if not bulk:
+        return build_org_hierarchy_recursive(db)
+    
+    body, etag = hierarchy_cache.get_or_build(
+        "hierarchy", lambda: serialize_org_hierarchy(build_org_hierarchy_bulk(db))
+    )
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def serialize_org_hierarchy(tree):
+    """Сериализует дерево в JSON-байты так же, как это сделал бы response_model"""
+    payload = [OrgStructureNode(**node).model_dump() for node in tree]
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def build_org_hierarchy_recursive(db):
+    """Строит дерево рекурсивным обходом: по запросу на каждый узел"""
     cursor = db.cursor()
     
     # Получаем все организации верхнего уровня (без parent_id или parent_id = NULL)
@@ -259,12 +286,153 @@ def build_division_tree(db, division):
     
     return div_node
 
+def load_org_structure(db):
+    """
+    Загружает все сущности оргструктуры фиксированным числом запросов.
+    Возвращает словари id -> дочерние элементы для сборки дерева в памяти.
+    Количество запросов не зависит от размера структуры.
+    """
+    cursor = db.cursor()
+    
+    # Организации, сгруппированные по родителю
+    cursor.execute("""
+        SELECT id, name, code, org_type, parent_id
+        FROM organizations
+        ORDER BY name, id
+    """)
+    orgs_by_parent = {}
+    for org_id, name, code, org_type, parent_id in cursor.fetchall():
+        orgs_by_parent.setdefault(parent_id, []).append((org_id, name, code, org_type))
+    
+    # Подразделения: корневые по организации и дочерние по родителю
+    cursor.execute("""
+        SELECT id, name, code, organization_id, parent_id
+        FROM divisions
+        ORDER BY name, id
+    """)
+    root_divisions_by_org = {}
+    divisions_by_parent = {}
+    for div_id, name, code, organization_id, parent_id in cursor.fetchall():
+        if parent_id is None:
+            root_divisions_by_org.setdefault(organization_id, []).append((div_id, name, code))
+        else:
+            divisions_by_parent.setdefault(parent_id, []).append((div_id, name, code))
+    
+    # Отделы подразделений (division_sections + sections)
+    cursor.execute("""
+        SELECT ds.division_id, s.id, s.name, s.code
+        FROM division_sections ds
+        JOIN sections s ON s.id = ds.section_id
+        ORDER BY s.name, s.id
+    """)
+    sections_by_division = {}
+    for division_id, sec_id, name, code in cursor.fetchall():
+        sections_by_division.setdefault(division_id, []).append((sec_id, name, code))
+    
+    # Функции отделов (section_functions + functions)
+    cursor.execute("""
+        SELECT sf.section_id, f.id, f.name, f.code
+        FROM section_functions sf
+        JOIN functions f ON f.id = sf.function_id
+        ORDER BY f.name, f.id
+    """)
+    functions_by_section = {}
+    for section_id, func_id, name, code in cursor.fetchall():
+        functions_by_section.setdefault(section_id, []).append((func_id, name, code))
+    
+    return {
+        "orgs_by_parent": orgs_by_parent,
+        "root_divisions_by_org": root_divisions_by_org,
+        "divisions_by_parent": divisions_by_parent,
+        "sections_by_division": sections_by_division,
+        "functions_by_section": functions_by_section,
+    }
+
+def build_org_hierarchy_bulk(db):
+    """
+    Строит дерево организационной структуры в памяти.
+    Результат совпадает с рекурсивным обходом build_org_tree/build_division_tree,
+    но данные загружаются пакетно через load_org_structure.
+    """
+    data = load_org_structure(db)
+    orgs_by_parent = data["orgs_by_parent"]
+    root_divisions_by_org = data["root_divisions_by_org"]
+    divisions_by_parent = data["divisions_by_parent"]
+    sections_by_division = data["sections_by_division"]
+    functions_by_section = data["functions_by_section"]
+    
+    def make_section_nodes(div_id):
+        nodes = []
+        for sec_id, sec_name, sec_code in sections_by_division.get(div_id, []):
+            nodes.append({
+                "id": sec_id,
+                "name": sec_name,
+                "code": sec_code,
+                "entity_type": "section",
+                "children": [
+                    {
+                        "id": func_id,
+                        "name": func_name,
+                        "code": func_code,
+                        "entity_type": "function",
+                        "children": []
+                    }
+                    for func_id, func_name, func_code in functions_by_section.get(sec_id, [])
+                ]
+            })
+        return nodes
+    
+    def make_division_node(division):
+        div_id, div_name, div_code = division
+        div_node = {
+            "id": div_id,
+            "name": div_name,
+            "code": div_code,
+            "entity_type": "division",
+            "children": make_section_nodes(div_id)
+        }
+        for child_div in divisions_by_parent.get(div_id, []):
+            div_node["children"].append(make_division_node(child_div))
+        return div_node
+    
+    def make_org_node(org):
+        org_id, name, code, org_type = org
+        node = {
+            "id": org_id,
+            "name": name,
+            "code": code,
+            "entity_type": "organization",
+            "org_type": org_type,
+            "children": [make_org_node(child_org) for child_org in orgs_by_parent.get(org_id, [])]
+        }
+        
+        if org_type in ["holding", "legal_entity"]:
+            for div in root_divisions_by_org.get(org_id, []):
+                node["children"].append(make_division_node(div))
+        
+        return node
+    
+    return [make_org_node(org) for org in orgs_by_parent.get(None, [])]
+
 @router.get("/staff-tree", response_model=List[StaffNode])
-def get_staff_hierarchy(db: sqlite3.Connection = Depends(get_db)):
+def get_staff_hierarchy(
+    bulk: bool = True,
+    root_id: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    db: sqlite3.Connection = Depends(get_db)
+):
     """
     Получает иерархию сотрудников на основе функциональных отношений.
     Показывает административное подчинение и другие типы отношений.
+
+    По умолчанию дерево собирается в памяти из пакетных запросов (bulk=true).
+    root_id возвращает только поддерево указанного сотрудника,
+    max_depth ограничивает глубину подчиненных (1 - только прямые подчиненные).
+    Эти параметры поддерживаются только пакетной сборкой.
     """
+    if bulk or root_id is not None or max_depth is not None:
+        return build_staff_forest(db, root_id=root_id, max_depth=max_depth)
+    
     cursor = db.cursor()
     
     # Находим топ-менеджеров (тех, кто не имеет менеджеров с типом отношения 'administrative')
@@ -314,6 +482,134 @@ def get_staff_hierarchy(db: sqlite3.Connection = Depends(get_db)):
     
     return result
 
+def load_staff_graph(db):
+    """
+    Загружает все данные для дерева сотрудников фиксированным числом запросов:
+    сотрудников, активные административные связи, основные должности
+    и прочие активные отношения.
+    """
+    cursor = db.cursor()
+    
+    cursor.execute("""
+        SELECT id, first_name, last_name, email, is_active
+        FROM staff
+        ORDER BY last_name, first_name, id
+    """)
+    staff = {}
+    active_staff_ids = []
+    for staff_id, first_name, last_name, email, is_active in cursor.fetchall():
+        staff[staff_id] = (first_name, last_name, email)
+        if is_active:
+            active_staff_ids.append(staff_id)
+    
+    # Административные связи: руководитель -> подчиненные в порядке фамилий
+    cursor.execute("""
+        SELECT fr.manager_id, fr.subordinate_id
+        FROM functional_relations fr
+        JOIN staff s ON s.id = fr.subordinate_id
+        WHERE fr.relation_type = 'administrative' AND fr.is_active = 1
+        ORDER BY s.last_name, s.first_name, s.id
+    """)
+    subordinates_by_manager = {}
+    managed_ids = set()
+    for manager_id, subordinate_id in cursor.fetchall():
+        subordinates_by_manager.setdefault(manager_id, []).append(subordinate_id)
+        managed_ids.add(subordinate_id)
+    
+    # Основные должности (первая основная должность сотрудника)
+    cursor.execute("""
+        SELECT sp.staff_id, p.name
+        FROM staff_positions sp
+        JOIN positions p ON p.id = sp.position_id
+        WHERE sp.is_primary = 1
+        ORDER BY sp.id
+    """)
+    positions = {}
+    for staff_id, position_name in cursor.fetchall():
+        positions.setdefault(staff_id, position_name)
+    
+    # Прочие (не административные) активные отношения по подчиненному
+    cursor.execute("""
+        SELECT fr.id, fr.subordinate_id, fr.manager_id, fr.relation_type, fr.description,
+               m.first_name, m.last_name
+        FROM functional_relations fr
+        JOIN staff m ON fr.manager_id = m.id
+        WHERE fr.relation_type != 'administrative' AND fr.is_active = 1
+        ORDER BY fr.id
+    """)
+    relations_by_staff = {}
+    for rel_id, subordinate_id, manager_id, rel_type, rel_desc, m_first, m_last in cursor.fetchall():
+        relations_by_staff.setdefault(subordinate_id, []).append({
+            "id": rel_id,
+            "manager_id": manager_id,
+            "manager_name": f"{m_first} {m_last}",
+            "relation_type": rel_type,
+            "description": rel_desc
+        })
+    
+    top_manager_ids = [staff_id for staff_id in active_staff_ids if staff_id not in managed_ids]
+    
+    return {
+        "staff": staff,
+        "top_manager_ids": top_manager_ids,
+        "subordinates_by_manager": subordinates_by_manager,
+        "positions": positions,
+        "relations_by_staff": relations_by_staff,
+    }
+
+def build_staff_forest(db, root_id=None, max_depth=None):
+    """
+    Строит лес административного подчинения в памяти.
+    Циклы в functional_relations не приводят к бесконечной рекурсии:
+    повторное появление сотрудника в собственной ветке пропускается с предупреждением.
+    """
+    graph = load_staff_graph(db)
+    staff = graph["staff"]
+    subordinates_by_manager = graph["subordinates_by_manager"]
+    positions = graph["positions"]
+    relations_by_staff = graph["relations_by_staff"]
+    
+    def make_node(staff_id, with_relations):
+        first_name, last_name, email = staff[staff_id]
+        return {
+            "id": staff_id,
+            "name": f"{first_name} {last_name}",
+            "position": positions.get(staff_id, "Неизвестная должность"),
+            "email": email,
+            "relations": list(relations_by_staff.get(staff_id, [])) if with_relations else [],
+            "children": []
+        }
+    
+    def attach_subordinates(node, manager_id, depth, path):
+        if max_depth is not None and depth >= max_depth:
+            return
+        path.add(manager_id)
+        for sub_id in subordinates_by_manager.get(manager_id, []):
+            if sub_id in path:
+                logger.warning(
+                    f"Обнаружен цикл административного подчинения: {manager_id} -> {sub_id}, связь пропущена"
+                )
+                continue
+            sub_node = make_node(sub_id, with_relations=True)
+            attach_subordinates(sub_node, sub_id, depth + 1, path)
+            node["children"].append(sub_node)
+        path.discard(manager_id)
+    
+    if root_id is not None:
+        if root_id not in staff:
+            raise HTTPException(status_code=404, detail=f"Сотрудник с ID {root_id} не найден")
+        root_ids = [root_id]
+    else:
+        root_ids = graph["top_manager_ids"]
+    
+    result = []
+    for staff_id in root_ids:
+        node = make_node(staff_id, with_relations=root_id is not None)
+        attach_subordinates(node, staff_id, 0, set())
+        result.append(node)
+    
+    return result
+
 def build_staff_tree(db, manager_id, node):
     """Рекурсивно строит дерево подчиненных для менеджера"""
     cursor = db.cursor()
@@ -382,17 +678,8 @@ def build_staff_tree(db, manager_id, node):
         # Добавляем подчиненного в дерево
         node["children"].append(sub_node)
 
-@router.get("/matrix-relations", response_model=List[MatrixRelation])
-def get_matrix_relations(
-    relation_type: Optional[str] = None,
-    db: sqlite3.Connection = Depends(get_db)
-):
-    """
-    Получает матричные отношения между сотрудниками.
-    Можно фильтровать по типу отношения.
-    """
-    cursor = db.cursor()
-    
+def matrix_relations_query(relation_type: Optional[str] = None):
+    """Запрос и параметры для матричных отношений (общие для списка и выгрузки)"""
     query = """
         SELECT fr.id, fr.manager_id, fr.subordinate_id, fr.relation_type, fr.description, fr.extra_field1,
                m.first_name AS m_first, m.last_name AS m_last,
@@ -410,34 +697,194 @@ def get_matrix_relations(
         params.append(relation_type)
     
     query += " ORDER BY fr.relation_type, m.last_name, m.first_name, s.last_name, s.first_name"
+    return query, params
+
+def matrix_relation_row(rel) -> Dict[str, Any]:
+    """Строка запроса matrix_relations_query -> словарь MatrixRelation"""
+    rel_id, manager_id, subordinate_id, rel_type, description, extra_field1, m_first, m_last, s_first, s_last = rel
+    
+    return {
+        "id": rel_id,
+        "from_id": manager_id,
+        "to_id": subordinate_id,
+        "from_name": f"{m_first} {m_last}",
+        "to_name": f"{s_first} {s_last}",
+        "relation_type": rel_type,
+        "description": description,
+        "extra_info": extra_field1
+    }
+
+@router.get("/matrix-relations", response_model=List[MatrixRelation])
+def get_matrix_relations(
+    relation_type: Optional[str] = None,
+    db: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Получает матричные отношения между сотрудниками.
+    Можно фильтровать по типу отношения.
+    """
+    query, params = matrix_relations_query(relation_type)
+    cursor = db.execute(query, params)
+    return [matrix_relation_row(rel) for rel in cursor.fetchall()]
+
+@router.get("/matrix-relations/export")
+async def export_matrix_relations(
+    format: ExportFormat = ExportFormat.NDJSON,
+    relation_type: Optional[str] = None
+):
+    """
+    Потоковая выгрузка матричных отношений в NDJSON или CSV.
+    """
+    query, params = matrix_relations_query(relation_type)
+    return await export_response(
+        query, params, list(MatrixRelation.model_fields), format,
+        "matrix_relations", matrix_relation_row
+    )
+
+# Максимум сотрудников в одном запросе /staff-info:batch
+STAFF_INFO_BATCH_MAX = int(os.getenv("OFS_STAFF_INFO_BATCH_MAX", "100"))
+
+# Досье собирается одним запросом: списки должностей, локаций, функций и связей
+# агрегируются в JSON коррелированными подзапросами (порядок задают внутренние ORDER BY)
+STAFF_DOSSIER_QUERY = """
+    SELECT s.id, s.first_name, s.last_name, s.middle_name, s.email, s.phone,
+           s.primary_organization_id, s.is_active, s.description,
+           o.name AS primary_org_name,
+           (SELECT json_group_array(json_object(
+                       'id', id, 'position_name', position_name, 'division_name', division_name,
+                       'is_primary', json(CASE WHEN is_primary THEN 'true' ELSE 'false' END),
+                       'start_date', start_date, 'end_date', end_date))
+            FROM (SELECT sp.id, p.name AS position_name, d.name AS division_name,
+                         sp.is_primary, sp.start_date, sp.end_date
+                  FROM staff_positions sp
+                  JOIN positions p ON sp.position_id = p.id
+                  LEFT JOIN divisions d ON sp.division_id = d.id
+                  WHERE sp.staff_id = s.id
+                  ORDER BY sp.is_primary DESC, sp.start_date DESC)) AS positions,
+           (SELECT json_group_array(json_object(
+                       'id', id, 'location_name', location_name,
+                       'is_current', json(CASE WHEN is_current THEN 'true' ELSE 'false' END),
+                       'date_from', date_from, 'date_to', date_to))
+            FROM (SELECT sl.id, o2.name AS location_name, sl.is_current, sl.date_from, sl.date_to
+                  FROM staff_locations sl
+                  JOIN organizations o2 ON sl.location_id = o2.id
+                  WHERE sl.staff_id = s.id
+                  ORDER BY sl.is_current DESC, sl.date_from DESC)) AS locations,
+           (SELECT json_group_array(json_object(
+                       'id', id, 'function_name', function_name, 'commitment_percent', commitment_percent,
+                       'is_primary', json(CASE WHEN is_primary THEN 'true' ELSE 'false' END),
+                       'date_from', date_from, 'date_to', date_to))
+            FROM (SELECT sf.id, f.name AS function_name, sf.commitment_percent,
+                         sf.is_primary, sf.date_from, sf.date_to
+                  FROM staff_functions sf
+                  JOIN functions f ON sf.function_id = f.id
+                  WHERE sf.staff_id = s.id
+                  ORDER BY sf.is_primary DESC, sf.date_from DESC)) AS functions,
+           (SELECT json_group_array(json_object(
+                       'id', id, 'manager_id', manager_id, 'manager_name', manager_name,
+                       'relation_type', relation_type, 'description', description,
+                       'start_date', start_date, 'end_date', end_date))
+            FROM (SELECT fr.id, fr.manager_id, m.first_name || ' ' || m.last_name AS manager_name,
+                         fr.relation_type, fr.description, fr.start_date, fr.end_date
+                  FROM functional_relations fr
+                  JOIN staff m ON fr.manager_id = m.id
+                  WHERE fr.subordinate_id = s.id AND fr.is_active = 1
+                  ORDER BY fr.relation_type)) AS managers,
+           (SELECT json_group_array(json_object(
+                       'id', id, 'subordinate_id', subordinate_id, 'subordinate_name', subordinate_name,
+                       'relation_type', relation_type, 'description', description,
+                       'start_date', start_date, 'end_date', end_date))
+            FROM (SELECT fr.id, fr.subordinate_id, sub.first_name || ' ' || sub.last_name AS subordinate_name,
+                         fr.relation_type, fr.description, fr.start_date, fr.end_date
+                  FROM functional_relations fr
+                  JOIN staff sub ON fr.subordinate_id = sub.id
+                  WHERE fr.manager_id = s.id AND fr.is_active = 1
+                  ORDER BY fr.relation_type)) AS subordinates
+    FROM staff s
+    LEFT JOIN organizations o ON o.id = s.primary_organization_id
+    WHERE s.id IN ({placeholders})
+"""
+
+class StaffInfoBatchRequest(BaseModel):
+    ids: List[int]
+
+def load_staff_dossiers(db: sqlite3.Connection, staff_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Досье сотрудников одним запросом: {staff_id: досье}. Отсутствующих id в результате нет.
+    """
+    unique_ids = list(dict.fromkeys(staff_ids))
+    if not unique_ids:
+        return {}
     
-    cursor.execute(query, params)
-    relations = cursor.fetchall()
+    rows = []
+    for start in range(0, len(unique_ids), MAX_SQL_VARIABLES):
+        chunk = unique_ids[start:start + MAX_SQL_VARIABLES]
+        query = STAFF_DOSSIER_QUERY.format(placeholders=", ".join("?" * len(chunk)))
+        rows.extend(db.execute(query, chunk).fetchall())
     
-    result = []
-    for rel in relations:
-        rel_id, manager_id, subordinate_id, rel_type, description, extra_field1, m_first, m_last, s_first, s_last = rel
-        
-        relation = {
-            "id": rel_id,
-            "from_id": manager_id,
-            "to_id": subordinate_id,
-            "from_name": f"{m_first} {m_last}",
-            "to_name": f"{s_first} {s_last}",
-            "relation_type": rel_type,
+    dossiers = {}
+    for row in rows:
+        (staff_id, first_name, last_name, middle_name, email, phone, primary_org_id, is_active,
+         description, primary_org_name, positions, locations, functions, managers, subordinates) = row
+        dossiers[staff_id] = {
+            "id": staff_id,
+            "name": f"{first_name} {last_name}",
+            "full_name": f"{last_name} {first_name} {middle_name or ''}".strip(),
+            "email": email,
+            "phone": phone,
+            "is_active": bool(is_active),
             "description": description,
-            "extra_info": extra_field1
+            "primary_organization": {
+                "id": primary_org_id,
+                "name": primary_org_name
+            } if primary_org_id else None,
+            "positions": json.loads(positions),
+            "locations": json.loads(locations),
+            "functions": json.loads(functions),
+            "managers": json.loads(managers),
+            "subordinates": json.loads(subordinates)
         }
-        
-        result.append(relation)
-    
-    return result
+    return dossiers
 
 @router.get("/staff-info/{staff_id}", response_model=Dict[str, Any])
-def get_staff_detailed_info(staff_id: int, db: sqlite3.Connection = Depends(get_db)):
+def get_staff_detailed_info(staff_id: int, bulk: bool = True, db: sqlite3.Connection = Depends(get_db)):
     """
     Получает детальную информацию о сотруднике, включая все его должности,
     локации, функции и отношения с другими сотрудниками.
+    
+    По умолчанию (bulk=true) досье собирается одним запросом с JSON-агрегацией;
+    bulk=false - прежняя сборка отдельными запросами.
+    """
+    if not bulk:
+        return build_staff_dossier_legacy(db, staff_id)
+    
+    dossier = load_staff_dossiers(db, [staff_id]).get(staff_id)
+    if dossier is None:
+        raise HTTPException(status_code=404, detail=f"Сотрудник с ID {staff_id} не найден")
+    return dossier
+
+@router.post("/staff-info:batch", response_model=Dict[str, Any])
+def get_staff_detailed_info_batch(request: StaffInfoBatchRequest, db: sqlite3.Connection = Depends(get_db)):
+    """
+    Досье нескольких сотрудников за один запрос (для предзагрузки карточек в списках).
+    Возвращает досье в порядке запрошенных id и список id, которые не найдены.
+    """
+    if len(request.ids) > STAFF_INFO_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много сотрудников в запросе: {len(request.ids)}, максимум {STAFF_INFO_BATCH_MAX}"
+        )
+    
+    dossiers = load_staff_dossiers(db, request.ids)
+    requested = list(dict.fromkeys(request.ids))
+    return {
+        "items": [dossiers[staff_id] for staff_id in requested if staff_id in dossiers],
+        "not_found": [staff_id for staff_id in requested if staff_id not in dossiers]
+    }
+
+def build_staff_dossier_legacy(db: sqlite3.Connection, staff_id: int) -> Dict[str, Any]:
+    """
+    Досье сотрудника отдельными запросами (прежняя реализация, bulk=false).
     """
     cursor = db.cursor()
     
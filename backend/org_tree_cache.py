@@ -0,0 +1,103 @@
+"""
+Кэш сериализованного дерева оргструктуры для /org-structure/hierarchy.
+
+Хранит готовые JSON-байты и ETag. Кэш версионируется: обработчики записи в full_api
+вызывают invalidate() после изменения организаций, подразделений, отделов, функций
+и связей между ними, и следующее чтение пересобирает дерево.
+
+Кэш живет внутри процесса. Чтобы при нескольких воркерах uvicorn дерево не оставалось
+устаревшим надолго, у записей есть TTL (OFS_ORG_TREE_CACHE_TTL, секунды, 0 - без TTL).
+"""
+import os
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger("ofs_api.org_tree_cache")
+
+CACHE_TTL = float(os.getenv("OFS_ORG_TREE_CACHE_TTL", "300"))
+
+
+def make_etag(body: bytes) -> str:
+    """ETag по содержимому: одинаковое дерево дает одинаковый ETag во всех воркерах"""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверяет заголовок If-None-Match (список, слабые ETag и '*')"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class OrgTreeCache:
+    """Версионированный кэш JSON-байтов с ETag"""
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = {}  # key -> (version, built_at, body, etag)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get_or_build(self, key, builder: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """
+        Возвращает (body, etag) из кэша или собирает их через builder.
+        Если во время сборки кэш был инвалидирован, результат не сохраняется.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, built_at, body, etag = entry
+                if version == self._version and (not self.ttl or now - built_at < self.ttl):
+                    self.hits += 1
+                    return body, etag
+            self.misses += 1
+            version = self._version
+
+        body = builder()
+        etag = make_etag(body)
+
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (version, now, body, etag)
+        return body, etag
+
+    def invalidate(self, reason: str = "") -> None:
+        """Сбрасывает все записи, повышая версию кэша"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self.invalidations += 1
+        logger.debug(f"Кэш дерева оргструктуры сброшен (версия {self._version}): {reason}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "ttl": self.ttl,
+            }
+
+
+# Общий кэш дерева для org_structure_api и full_api
+hierarchy_cache = OrgTreeCache()
@@ -0,0 +1,105 @@
+"""
+Кэш проверенных пользователей (principal) для get_current_user в full_api.
+
+Ключ - сам JWT: при попадании не нужно ни декодировать токен, ни ходить в базу.
+Кэш ограничен по размеру (LRU) и по времени жизни записи; запись не переживает
+срок действия токена. invalidate_subject() сбрасывает все токены пользователя и
+вызывается при любом изменении его записи в таблице user.
+
+Настройки через переменные окружения:
+    OFS_PRINCIPAL_CACHE_SIZE - максимум записей (по умолчанию 1024, 0 - кэш выключен)
+    OFS_PRINCIPAL_CACHE_TTL  - время жизни записи в секундах (по умолчанию 60)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+CACHE_SIZE = int(os.getenv("OFS_PRINCIPAL_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("OFS_PRINCIPAL_CACHE_TTL", "60"))
+
+
+class PrincipalCache:
+    """Ограниченный LRU-кэш с TTL: токен -> пользователь"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (expires_at, subject, principal)
+        self._tokens_by_subject: Dict[str, Set[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, principal = entry
+            if expires_at <= now:
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, subject: str, principal: Any, token_expires_at: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, subject, principal)
+            self._tokens_by_subject.setdefault(subject, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, token: str) -> None:
+        _, subject, _ = self._entries.pop(token)
+        tokens = self._tokens_by_subject.get(subject)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_subject[subject]
+
+    def invalidate_subject(self, subject: str) -> None:
+        """Сбрасывает все закэшированные токены пользователя (после изменения или деактивации)"""
+        with self._lock:
+            for token in list(self._tokens_by_subject.get(subject, ())):
+                self._remove(token)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_subject.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Общий кэш приложения
+principal_cache = PrincipalCache()
@@ -1,5 +1,30 @@
+"""
+Бэкап проекта: полный ZIP-архив или инкрементальный бэкап в хранилище чанков.
+
+Инкрементальный режим хранит в project_backups/store:
+    objects/ab/abcdef...[.gz] - чанки файлов (до CHUNK_SIZE байт), имя - SHA-256 содержимого
+    manifests/YYYYmmdd_HHMMSS.json - манифест: для каждого файла путь, размер, mtime,
+                                     хэш файла и список чанков
+
+Файл, у которого размер и mtime совпадают с последним манифестом, не читается
+повторно - его запись переносится из прошлого манифеста. Измененные файлы
+хэшируются в пуле потоков, и в хранилище попадают только новые чанки, поэтому
+повторный бэкап занимает место только под изменения. Восстановление "на момент"
+берет последний манифест не позже указанного времени.
+
+Запуск:
+    python backup_project.py [full]                 - полный ZIP-архив (как раньше)
+    python backup_project.py incremental [--workers N]
+    python backup_project.py list
+    python backup_project.py restore [--as-of "2025-04-01 12:00"] [--target каталог]
+"""
+import argparse
+import gzip
+import hashlib
+import json
 import os
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 import zipfile
@@ -8,68 +33,234 @@ import zipfile
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BACKUP_DIR = "project_backups"
+STORE_DIR = os.path.join(BACKUP_DIR, "store")
+CHUNK_SIZE = 4 * 1024 * 1024
+MANIFEST_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+# Список директорий и файлов которые нужно исключить из бэкапа
+EXCLUDES = {
+    '__pycache__',
+    'node_modules',
+    '.git',
+    BACKUP_DIR,
+    '.pytest_cache',
+    '.excel_cache',
+    '.vscode',
+    '.idea',
+    'venv',
+    '.env'
+}
+EXCLUDED_SUFFIXES = ('.pyc', '.pyo', '.pyd', '.so')
+
+# Уже сжатые форматы храним как есть, остальное - в gzip
+COMPRESSED_SUFFIXES = ('.xlsx', '.zip', '.gz', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.woff', '.woff2')
+
+def iter_project_files(root='.'):
+    """Пути файлов проекта относительно root, без исключенных каталогов и кэша"""
+    for dirpath, dirs, files in os.walk(root):
+        # Пропускаем исключенные директории
+        dirs[:] = [d for d in dirs if d not in EXCLUDES]
+        for file in files:
+            # Пропускаем временные файлы и кэш
+            if file in EXCLUDES or file.endswith(EXCLUDED_SUFFIXES):
+                continue
+            yield os.path.relpath(os.path.join(dirpath, file), root)
+
 def create_full_backup():
     """Создает полный бэкап проекта включая код и базу данных"""
-    
+
     # Создаем папку для бэкапов если её нет
-    backup_dir = "project_backups"
+    backup_dir = BACKUP_DIR
     if not os.path.exists(backup_dir):
         os.makedirs(backup_dir)
         logger.info(f"Создана папка для бэкапов: {backup_dir}")
-    
+
     # Формируем имя архива с текущей датой и временем
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_name = f"ofs_project_backup_{timestamp}"
     zip_path = os.path.join(backup_dir, f"{backup_name}.zip")
-    
+
     try:
         # Создаем ZIP архив
         with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Список директорий и файлов которые нужно исключить из бэкапа
-            excludes = [
-                '__pycache__', 
-                'node_modules',
-                '.git',
-                'project_backups',
-                '.pytest_cache',
-                '.vscode',
-                '.idea',
-                'venv',
-                '.env'
-            ]
-            
-            # Проходим по всем файлам и папкам в проекте
-            for root, dirs, files in os.walk('.'):
-                # Пропускаем исключенные директории
-                dirs[:] = [d for d in dirs if d not in excludes]
-                
-                for file in files:
-                    # Пропускаем временные файлы и кэш
-                    if file.endswith(('.pyc', '.pyo', '.pyd', '.so')):
-                        continue
-                        
-                    file_path = os.path.join(root, file)
-                    # Пропускаем если путь содержит исключенные директории
-                    if any(exclude in file_path for exclude in excludes):
-                        continue
-                        
-                    logger.info(f"Добавляю в архив: {file_path}")
-                    zipf.write(file_path)
-        
+            # Проходим по всем файлам проекта
+            for file_path in iter_project_files():
+                logger.debug(f"Добавляю в архив: {file_path}")
+                zipf.write(file_path)
+
         backup_size = os.path.getsize(zip_path) / (1024 * 1024)  # Размер в МБ
         logger.info(f"Бэкап успешно создан: {zip_path} (Размер: {backup_size:.1f} МБ)")
-        
+
         print(f"\n🎉 Полный бэкап проекта создан успешно!")
         print(f"📂 Расположение: {zip_path}")
         print(f"📦 Размер бэкапа: {backup_size:.1f} МБ")
         print("\nТеперь ты можешь быть спокоен - всё сохранено! 😎")
         return True
-        
+
     except Exception as e:
         logger.error(f"Ошибка при создании бэкапа: {str(e)}")
         print(f"\n❌ Блять, что-то пошло не так: {str(e)}")
         return False
 
+# --- Инкрементальный бэкап ---
+
+def object_path(store, digest, compress=False):
+    return os.path.join(store, "objects", digest[:2], digest + (".gz" if compress else ""))
+
+def store_chunk(store, digest, data, compress):
+    """Записывает чанк, если его еще нет (через временный файл)"""
+    if os.path.exists(object_path(store, digest, True)) or os.path.exists(object_path(store, digest)):
+        return 0
+    path = object_path(store, digest, compress)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=6, mtime=0) if compress else data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+def read_chunk(store, digest):
+    path = object_path(store, digest, True)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return gzip.decompress(f.read())
+    with open(object_path(store, digest), 'rb') as f:
+        return f.read()
+
+def backup_file(store, root, rel_path):
+    """Хэширует файл по чанкам и сохраняет новые чанки (выполняется в пуле потоков)"""
+    compress = not rel_path.lower().endswith(COMPRESSED_SUFFIXES)
+    file_digest = hashlib.sha256()
+    chunks = []
+    stored = 0
+    full_path = os.path.join(root, rel_path)
+    stat = os.stat(full_path)
+    with open(full_path, 'rb') as f:
+        for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+            file_digest.update(data)
+            digest = hashlib.sha256(data).hexdigest()
+            stored += store_chunk(store, digest, data, compress)
+            chunks.append(digest)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": file_digest.hexdigest(), "chunks": chunks}
+    return rel_path, entry, stored
+
+def manifest_paths(store=STORE_DIR):
+    """Манифесты от старых к новым"""
+    manifests_dir = os.path.join(store, "manifests")
+    if not os.path.isdir(manifests_dir):
+        return []
+    return sorted(os.path.join(manifests_dir, name) for name in os.listdir(manifests_dir) if name.endswith(".json"))
+
+def load_manifest(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def create_incremental_backup(root='.', store=STORE_DIR, workers=None):
+    """
+    Создает инкрементальный бэкап: читает только файлы с изменившимся
+    размером или mtime и сохраняет только новые чанки.
+    Returns:
+        путь к новому манифесту
+    """
+    started = datetime.now()
+    manifests = manifest_paths(store)
+    previous = load_manifest(manifests[-1])["files"] if manifests else {}
+
+    files = {}
+    changed = []
+    for rel_path in iter_project_files(root):
+        stat = os.stat(os.path.join(root, rel_path))
+        known = previous.get(rel_path)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+            files[rel_path] = known
+        else:
+            changed.append(rel_path)
+
+    stored = 0
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+        for rel_path, entry, stored_bytes in pool.map(lambda path: backup_file(store, root, path), changed):
+            files[rel_path] = entry
+            stored += stored_bytes
+
+    # Метка времени в имени - момент, на который сделан снимок; имена должны быть уникальны
+    timestamp = started.strftime(MANIFEST_TIME_FORMAT)
+    manifests_dir = os.path.join(store, "manifests")
+    os.makedirs(manifests_dir, exist_ok=True)
+    manifest_path = os.path.join(manifests_dir, f"{timestamp}.json")
+    suffix = 1
+    while os.path.exists(manifest_path):
+        manifest_path = os.path.join(manifests_dir, f"{timestamp}_{suffix}.json")
+        suffix += 1
+
+    manifest = {"created": started.isoformat(timespec="seconds"), "files": dict(sorted(files.items()))}
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+    removed = len(set(previous) - set(files))
+    logger.info(
+        f"Инкрементальный бэкап {manifest_path}: файлов {len(files)}, изменено {len(changed)}, "
+        f"удалено {removed}, новых данных {stored / (1024 * 1024):.1f} МБ"
+    )
+    return manifest_path
+
+def find_manifest(as_of=None, store=STORE_DIR):
+    """Последний манифест, созданный не позже as_of (datetime); без as_of - самый новый"""
+    selected = None
+    for path in manifest_paths(store):
+        created = datetime.fromisoformat(load_manifest(path)["created"])
+        if as_of is None or created <= as_of:
+            selected = path
+    return selected
+
+def restore_backup(target, as_of=None, store=STORE_DIR):
+    """
+    Восстанавливает файлы проекта на момент as_of в каталог target.
+    Содержимое каждого файла сверяется с хэшем из манифеста.
+    Returns:
+        путь к использованному манифесту
+    """
+    manifest_path = find_manifest(as_of, store)
+    if manifest_path is None:
+        raise FileNotFoundError(f"Нет бэкапов на момент {as_of}")
+
+    for rel_path, entry in load_manifest(manifest_path)["files"].items():
+        path = os.path.join(target, rel_path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        file_digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            for digest in entry["chunks"]:
+                data = read_chunk(store, digest)
+                file_digest.update(data)
+                f.write(data)
+        if file_digest.hexdigest() != entry["hash"]:
+            raise ValueError(f"Файл {rel_path} восстановлен с ошибкой: хэш не совпадает")
+        os.utime(path, ns=(entry["mtime"], entry["mtime"]))
+
+    logger.info(f"Проект восстановлен из {manifest_path} в {target}")
+    return manifest_path
+
 if __name__ == "__main__":
-    print("🚀 Начинаю создание полного бэкапа проекта...")
-    create_full_backup() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Бэкап проекта")
+    parser.add_argument("command", nargs="?", default="full", choices=["full", "incremental", "list", "restore"])
+    parser.add_argument("--workers", type=int, default=None, help="потоков для хэширования файлов")
+    parser.add_argument("--as-of", default=None, help='момент восстановления, например "2025-04-01 12:00"')
+    parser.add_argument("--target", default=None, help="каталог для восстановления")
+    args = parser.parse_args()
+
+    if args.command == "full":
+        print("🚀 Начинаю создание полного бэкапа проекта...")
+        create_full_backup()
+    elif args.command == "incremental":
+        print(f"Инкрементальный бэкап создан: {create_incremental_backup(workers=args.workers)}")
+    elif args.command == "list":
+        for path in manifest_paths():
+            manifest = load_manifest(path)
+            size = sum(entry["size"] for entry in manifest["files"].values()) / (1024 * 1024)
+            print(f"{manifest['created']}  файлов: {len(manifest['files'])}  {size:.1f} МБ  {path}")
+    else:
+        as_of = datetime.fromisoformat(args.as_of) if args.as_of else None
+        target = args.target or f"restored_{datetime.now().strftime(MANIFEST_TIME_FORMAT)}"
+        print(f"Проект восстановлен из {restore_backup(target, as_of)} в {target}")
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Общий движок поиска и замены устаревших терминов (employee -> staff,
+department -> division) для search_deprecated_terms.py,
+strategic_term_checker.py и replace_all_deprecated_terms.py.
+
+Все термины собраны в одно скомпилированное регулярное выражение (одна
+альтернатива, длинные термины первыми), которое проходит по файлу целиком
+через mmap, а не построчно. Бинарные файлы (нулевой байт в начале)
+пропускаются. Файлы разбираются в пуле процессов, результат сканирования
+кэшируется по (mtime, размер) файла, так что повторный запуск перечитывает
+только измененные файлы. Замена записывает файл атомарно: через временный
+файл в той же директории и os.replace.
+
+Правила сканирования (какие файлы смотреть, какие строки считать
+исключениями, искать слово целиком или подстроку) задаются профилем
+ScanProfile; профили трех скриптов описаны в PROFILES.
+
+Каталог кэша задается переменной OFS_TERM_CACHE_DIR (по умолчанию .term_cache).
+
+Запуск:
+    python deprecated_terms.py [--dir .] [--profile search|strategic|replace] [--exclude dir ...]
+                               [--workers N] [--no-cache]
+    python deprecated_terms.py --replace [--dry-run] [--backup-dir каталог]
+"""
+import argparse
+import fnmatch
+import hashlib
+import mmap
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace as dataclass_replace
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+CACHE_DIR = os.getenv("OFS_TERM_CACHE_DIR", ".term_cache")
+
+# Устаревший термин -> новый термин
+TERM_REPLACEMENTS = {
+    "employee": "staff", "Employee": "Staff", "EMPLOYEE": "STAFF",
+    "employees": "staff", "Employees": "Staff", "EMPLOYEES": "STAFF",
+    "emploee": "staff", "Emploee": "Staff",  # возможные опечатки
+    "emploees": "staff", "Emploees": "Staff",
+    "department": "division", "Department": "Division", "DEPARTMENT": "DIVISION",
+    "departments": "divisions", "Departments": "Divisions", "DEPARTMENTS": "DIVISIONS",
+}
+DEPRECATED_TERMS = list(TERM_REPLACEMENTS)
+
+# Скрипты, которые сами содержат термины
+TERM_SCRIPTS = (
+    "deprecated_terms.py",
+    "search_deprecated_terms.py",
+    "strategic_term_checker.py",
+    "replace_all_deprecated_terms.py",
+    "replace_deprecated_terms.py",
+)
+
+# Сколько байт в начале файла проверять на нулевой байт
+BINARY_SNIFF_BYTES = 8192
+# Меньше файлов разбираем в текущем процессе: запуск пула дороже
+PARALLEL_MIN_FILES = 64
+
+
+@dataclass(frozen=True)
+class ScanProfile:
+    """Правила сканирования; неизменяемый, чтобы передаваться в процессы и служить ключом кэша"""
+    name: str
+    extensions: Tuple[str, ...]
+    excluded_dirs: Tuple[str, ...]  # имена или шаблоны fnmatch (backups_*)
+    excluded_files: Tuple[str, ...] = TERM_SCRIPTS
+    whole_words: bool = True
+    ignore_case: bool = False
+    skip_hidden_files: bool = False
+    # Строки, совпавшие с любым из этих шаблонов, не считаются находкой
+    line_excludes: Tuple[str, ...] = ()
+    # (часть имени файла или расширение, шаблоны строк-исключений для таких файлов)
+    file_excludes: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+
+
+@dataclass(frozen=True)
+class LineMatch:
+    line_number: int
+    content: str
+    matches: Tuple[str, ...]
+
+
+PROFILES = {
+    "search": ScanProfile(
+        name="search",
+        extensions=(".py", ".ts", ".tsx", ".js", ".jsx", ".json", ".html", ".css",
+                    ".scss", ".md", ".sql", ".sh", ".bat", ".ps1", ".txt"),
+        excluded_dirs=(".git", "node_modules", "__pycache__", ".vscode", ".idea",
+                       "venv", ".venv", "env", "dist", "build", CACHE_DIR),
+        excluded_files=TERM_SCRIPTS + ("package-lock.json", "yarn.lock"),
+        whole_words=False,
+        # Записи о заменах в файлах скриптов
+        line_excludes=(
+            r'\b\w+\s*:\s*[\'"]staff[\'"]',  # например 'employee': 'staff'
+            r'\b\w+\s*:\s*[\'"]Staff[\'"]',  # например 'Employee': 'Staff'
+            r'\b\w+\s*:\s*[\'"]division[\'"]',  # например 'department': 'division'
+            r'\b\w+\s*:\s*[\'"]Division[\'"]',  # например 'Department': 'Division'
+            r'r[\'"]\S+[\'"]:\s*[\'"]staff[\'"]',  # регулярные выражения замены
+            r'r[\'"]\S+[\'"]:\s*[\'"]division[\'"]',  # регулярные выражения замены
+            r'r[\'"]\S+staff\S*[\'"]',  # регулярные выражения содержащие staff
+            r'r[\'"]\S+division\S*[\'"]',  # регулярные выражения содержащие division
+        ),
+    ),
+    "strategic": ScanProfile(
+        name="strategic",
+        extensions=(".py", ".tsx", ".ts", ".js", ".jsx", ".json", ".md",
+                    ".yaml", ".yml", ".html", ".css", ".scss"),
+        excluded_dirs=(".git", "__pycache__", "node_modules", "venv", "env",
+                       "backups_before_replacement*", CACHE_DIR),
+        excluded_files=TERM_SCRIPTS + ("migration_notes.md", "migration_plan.md"),
+        ignore_case=True,
+        # Ситуации, когда термины должны остаться
+        file_excludes=(
+            # API файлы - для обратной совместимости API
+            ("api.py", (r'employees_redirect', r'departments_redirect')),
+            ("telegram_bot.py", (r'department_value', r'division=')),
+            ("api_endpoints.md", (r'department', r'employee')),
+            # Телеграм бот - везде уже есть правильные названия
+            ("bot.py", (r'employee_data',)),
+            ("database.py", (r'employee', r'get_employee', r'delete_employee', r'update_employee',
+                             r'add_employee', r'create_employee')),
+            ("api_client.py", (r'employee_data', r'send_employee')),
+            ("registration_handlers.py", (r'employee', r'get_employee')),
+            ("admin_handlers.py", (r'employee', r'department')),
+            ("keyboards.py", (r'employee',)),
+            # Документация - не требует обновления
+            (".md", (r'employee', r'department')),
+            # Тесты телеграм бота - не требуют обновления
+            ("test_", (r'employee', r'department')),
+            ("conftest.py", (r'employee_data',)),
+            # Фронтенд компоненты - определенные файлы должны остаться без изменений для совместимости
+            ("DepartmentList.tsx", (r'Department', r'department', r'Departments', r'departments')),
+            ("EmployeeList.tsx", (r'Employee', r'employee', r'Employees', r'employees')),
+            ("EmployeeForm.tsx", (r'Employee', r'employee')),
+            ("FunctionalRelationsManager.tsx", (r'employee',)),
+            ("FunctionalRelationList.tsx", (r'department',)),
+            ("NodeEditModal.tsx", (r'department', r'employee')),
+            ("OrganizationTree.tsx", (r'Employee', r'employee')),
+            ("DepartmentsPage.tsx", (r'Department', r'Departments')),
+            # Роуты - для обратной совместимости
+            ("index.tsx", (r'Employee',)),
+        ),
+    ),
+    "replace": ScanProfile(
+        name="replace",
+        extensions=(".py", ".ts", ".tsx", ".js", ".jsx", ".html", ".css", ".scss",
+                    ".md", ".sql", ".json", ".yaml", ".yml", ".txt"),
+        excluded_dirs=(".git", ".idea", ".vscode", "node_modules", "__pycache__", "venv",
+                       ".venv", "env", "dist", "build", "backups_before_replacement*", CACHE_DIR),
+        skip_hidden_files=True,
+    ),
+}
+
+
+def term_pattern(profile: ScanProfile, text: bool = False):
+    """
+    Одно регулярное выражение для всех терминов профиля.
+    text=False - байтовое (для mmap), text=True - строковое (для подсветки).
+    """
+    # Длинные термины первыми, чтобы employees не обрезался до employee
+    alternation = "|".join(re.escape(term) for term in sorted(DEPRECATED_TERMS, key=len, reverse=True))
+    source = rf"\b(?:{alternation})\b" if profile.whole_words else f"(?:{alternation})"
+    flags = re.IGNORECASE if profile.ignore_case else 0
+    return re.compile(source if text else source.encode("ascii"), flags)
+
+
+@lru_cache(maxsize=None)
+def _compiled(profile: ScanProfile):
+    """Шаблоны профиля компилируются один раз на процесс"""
+    line_exclude = re.compile("|".join(profile.line_excludes)) if profile.line_excludes else None
+    return term_pattern(profile), line_exclude
+
+
+@lru_cache(maxsize=4096)
+def _file_exclude(profile: ScanProfile, filename: str):
+    """Объединенный шаблон строк-исключений для файла с таким именем"""
+    ext = os.path.splitext(filename)[1]
+    patterns = [pattern
+                for file_pattern, patterns in profile.file_excludes
+                if file_pattern in filename or file_pattern == ext
+                for pattern in patterns]
+    return re.compile("|".join(patterns)) if patterns else None
+
+
+def _dir_excluded(profile: ScanProfile, name: str, extra: Tuple[str, ...]) -> bool:
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in profile.excluded_dirs + extra)
+
+
+def _file_selected(profile: ScanProfile, name: str) -> bool:
+    if name in profile.excluded_files:
+        return False
+    if profile.skip_hidden_files and name.startswith("."):
+        return False
+    return os.path.splitext(name)[1].lower() in profile.extensions
+
+
+def iter_files(root: str, profile: ScanProfile, extra_excluded_dirs=()):
+    """Пути файлов для сканирования относительно root (os.scandir, без лишних stat)"""
+    extra = tuple(extra_excluded_dirs or ())
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            print(f"Не удалось прочитать {directory}: {e}")
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not _dir_excluded(profile, entry.name, extra):
+                    stack.append(entry.path)
+            elif entry.is_file() and _file_selected(profile, entry.name):
+                yield os.path.relpath(entry.path, root)
+
+
+def _read(path: str):
+    """Содержимое файла через mmap или None для пустых и бинарных файлов"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if data.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+        data.close()
+        return None
+    return data
+
+
+def scan_file(root: str, rel_path: str, profile: ScanProfile) -> List[LineMatch]:
+    """Находки в одном файле, сгруппированные по строкам"""
+    pattern, line_exclude = _compiled(profile)
+    file_exclude = _file_exclude(profile, os.path.basename(rel_path))
+    results = []
+    try:
+        data = _read(os.path.join(root, rel_path))
+        if data is None:
+            return results
+        with data:
+            line_number = 1
+            position = 0
+            line_end = -1
+            for match in pattern.finditer(data):
+                start = match.start()
+                if start <= line_end:
+                    # Еще одно совпадение в уже разобранной строке
+                    if results and results[-1].line_number == line_number:
+                        last = results[-1]
+                        results[-1] = LineMatch(line_number, last.content, last.matches + (match.group().decode(),))
+                    continue
+                line_number += data[position:start].count(b"\n")
+                position = start
+                line_start = data.rfind(b"\n", 0, start) + 1
+                line_end = data.find(b"\n", start)
+                if line_end == -1:
+                    line_end = len(data)
+                line = data[line_start:line_end].decode("utf-8", errors="replace")
+                if (line_exclude and line_exclude.search(line)) or (file_exclude and file_exclude.search(line)):
+                    continue
+                results.append(LineMatch(line_number, line.strip(), (match.group().decode(),)))
+    except OSError as e:
+        print(f"Ошибка при обработке {rel_path}: {e}")
+    return results
+
+
+def replace_file(root: str, rel_path: str, profile: ScanProfile, dry_run: bool = False,
+                 backup_dir: Optional[str] = None) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Заменяет термины в файле за один проход и атомарно записывает результат.
+    Файлы не в UTF-8 пропускаются.
+    Returns:
+        (число замен, [(найденный термин, замена)])
+    """
+    pattern, _ = _compiled(profile)
+    path = os.path.join(root, rel_path)
+    try:
+        data = _read(path)
+        if data is None:
+            return 0, []
+        with data:
+            content = data[:]
+        content.decode("utf-8")
+    except UnicodeDecodeError:
+        return 0, []
+    except OSError as e:
+        print(f"Ошибка при обработке {rel_path}: {e}")
+        return 0, []
+
+    changes = []
+
+    def substitute(match):
+        term = match.group().decode()
+        replacement = TERM_REPLACEMENTS.get(term) or _match_case(term, TERM_REPLACEMENTS[term.lower()])
+        changes.append((term, replacement))
+        return replacement.encode()
+
+    new_content = pattern.sub(substitute, content)
+    if dry_run or not changes:
+        return len(changes), changes
+
+    if backup_dir:
+        backup_path = os.path.join(backup_dir, rel_path)
+        os.makedirs(os.path.dirname(backup_path) or ".", exist_ok=True)
+        shutil.copy2(path, backup_path)
+
+    # Временный файл в той же директории, чтобы os.replace был атомарным
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".term-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(new_content)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(changes), changes
+
+
+def _match_case(term: str, replacement: str) -> str:
+    """Регистр замены по образцу найденного термина (для профилей с ignore_case)"""
+    if term.isupper():
+        return replacement.upper()
+    if term[:1].isupper():
+        return replacement.capitalize()
+    return replacement
+
+
+# Профиль процесса пула задается один раз при запуске процесса, а не с каждым файлом
+_worker_profile: Optional[ScanProfile] = None
+_worker_root = "."
+
+
+def _init_worker(root: str, profile: ScanProfile):
+    global _worker_root, _worker_profile
+    _worker_root, _worker_profile = root, profile
+
+
+def _scan_in_worker(rel_path: str):
+    return rel_path, scan_file(_worker_root, rel_path, _worker_profile)
+
+
+def _replace_in_worker(task):
+    rel_path, dry_run, backup_dir = task
+    return rel_path, replace_file(_worker_root, rel_path, _worker_profile, dry_run, backup_dir)
+
+
+def _map(root, profile, worker, tasks, workers):
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1 or len(tasks) < PARALLEL_MIN_FILES:
+        _init_worker(root, profile)
+        return list(map(worker, tasks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(root, profile)) as pool:
+        return list(pool.map(worker, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+
+def _cache_path(root: str, profile: ScanProfile) -> str:
+    # Ключ кэша - корень и все правила профиля: изменился профиль - кэш не используется
+    key = hashlib.sha256(repr((os.path.abspath(root), profile, DEPRECATED_TERMS)).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{profile.name}-{key}.pickle")
+
+
+def _load_cache(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Кэш {path} поврежден, сканируем заново: {e}")
+        return {}
+
+
+def _store_cache(path: str, cache: Dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def scan_directory(root: str, profile: ScanProfile, extra_excluded_dirs=(), workers: Optional[int] = None,
+                   use_cache: bool = True) -> Tuple[Dict[str, List[LineMatch]], int]:
+    """
+    Сканирует директорию.
+    Returns:
+        ({относительный путь: находки по строкам}, общее число совпадений)
+    """
+    cache_path = _cache_path(root, profile)
+    cache = _load_cache(cache_path) if use_cache else {}
+    fresh_cache = {}
+    to_scan = []
+    results = {}
+    for rel_path in iter_files(root, profile, extra_excluded_dirs):
+        stat = os.stat(os.path.join(root, rel_path))
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = cache.get(rel_path)
+        if cached and cached[0] == key:
+            fresh_cache[rel_path] = cached
+            if cached[1]:
+                results[rel_path] = cached[1]
+        else:
+            to_scan.append((rel_path, key))
+
+    keys = dict(to_scan)
+    for rel_path, matches in _map(root, profile, _scan_in_worker, list(keys), workers):
+        fresh_cache[rel_path] = (keys[rel_path], matches)
+        if matches:
+            results[rel_path] = matches
+
+    if use_cache:
+        _store_cache(cache_path, fresh_cache)
+    total = sum(len(line.matches) for matches in results.values() for line in matches)
+    return results, total
+
+
+def replace_directory(root: str, profile: ScanProfile, dry_run: bool = False, backup_dir: Optional[str] = None,
+                      extra_excluded_dirs=(), workers: Optional[int] = None):
+    """
+    Заменяет термины во всех файлах директории.
+    Returns:
+        (всего замен, изменено файлов, обработано файлов, {путь: [(термин, замена)]})
+    """
+    files = list(iter_files(root, profile, extra_excluded_dirs))
+    tasks = [(rel_path, dry_run, backup_dir) for rel_path in files]
+    changed = {rel_path: changes
+               for rel_path, (count, changes) in _map(root, profile, _replace_in_worker, tasks, workers)
+               if count}
+    return sum(len(changes) for changes in changed.values()), len(changed), len(files), changed
+
+
+def highlight(line: str, profile: ScanProfile, before: str, after: str) -> str:
+    """Оборачивает термины в строке, например в цветовые коды colorama"""
+    return _text_pattern(profile).sub(lambda m: f"{before}{m.group(0)}{after}", line)
+
+
+@lru_cache(maxsize=None)
+def _text_pattern(profile: ScanProfile):
+    return term_pattern(profile, text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск и замена устаревших терминов в проекте")
+    parser.add_argument("--dir", "-d", default=".", help="Директория для сканирования")
+    parser.add_argument("--profile", "-p", choices=sorted(PROFILES), default=None,
+                        help="Правила сканирования (по умолчанию search, с --replace - replace)")
+    parser.add_argument("--exclude", "-e", nargs="+", default=[], help="Дополнительные директории для исключения")
+    parser.add_argument("--workers", type=int, default=None, help="Процессов для сканирования")
+    parser.add_argument("--no-cache", action="store_true", help="Сканировать все файлы, не используя кэш")
+    parser.add_argument("--replace", action="store_true", help="Заменить термины (файлы перезаписываются атомарно)")
+    parser.add_argument("--dry-run", "-n", action="store_true", help="С --replace: показать замены, не меняя файлы")
+    parser.add_argument("--backup-dir", "-b", default=None, help="С --replace: куда копировать исходные файлы")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.replace:
+        profile = PROFILES[args.profile or "replace"]
+        if args.profile and not profile.whole_words:
+            # Замена подстрок испортила бы идентификаторы вроде employee_id
+            profile = dataclass_replace(profile, whole_words=True)
+        total, modified, processed, changed = replace_directory(
+            args.dir, profile, args.dry_run, args.backup_dir, args.exclude, args.workers
+        )
+        for rel_path, changes in sorted(changed.items()):
+            print(f"{rel_path}: {len(changes)} замен")
+        action = "Найдено" if args.dry_run else "Выполнено"
+        print(f"{action} {total} замен в {modified} из {processed} файлов "
+              f"за {time.perf_counter() - started:.2f} с")
+        return 0
+
+    profile = PROFILES[args.profile or "search"]
+    results, total = scan_directory(args.dir, profile, args.exclude, args.workers, not args.no_cache)
+    for rel_path, matches in sorted(results.items()):
+        print(f"Файл: {rel_path}")
+        for line in matches:
+            print(f"  Строка {line.line_number}: {line.content}")
+    print(f"Найдено {total} совпадений в {len(results)} файлах за {time.perf_counter() - started:.2f} с")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
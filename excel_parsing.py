@@ -0,0 +1,96 @@
+"""
+Общий этап разбора Excel-книг для analyze_excel.py и import_from_excel.py.
+
+Листы разбираются параллельно в пуле процессов: каждый процесс сам открывает
+книгу и возвращает компактные записи (кортежи и словари, которые передаются
+через pickle). Результат кэшируется на диске по SHA-256 содержимого файла,
+поэтому повторный запуск на неизмененной книге Excel не разбирает вовсе.
+
+Каталог кэша задается переменной OFS_EXCEL_CACHE_DIR (по умолчанию .excel_cache).
+"""
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CACHE_DIR = os.getenv("OFS_EXCEL_CACHE_DIR", ".excel_cache")
+
+def file_hash(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_path(kind: str, digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{kind}-{digest}.pickle")
+
+def load_cached(kind: str, digest: str) -> Optional[Any]:
+    """Результат разбора из кэша или None"""
+    path = cache_path(kind, digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Кэш {path} поврежден, разбираем книгу заново: {e}")
+        return None
+
+def store_cached(kind: str, digest: str, value: Any) -> None:
+    """Сохраняет результат разбора (через временный файл, чтобы не оставить обрывок)"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(kind, digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def parse_sheets(path: str, sheet_names: List[str], worker: Callable[[str, str], Any],
+                 workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Разбирает листы функцией worker(path, sheet_name) в пуле процессов.
+
+    worker должен быть функцией верхнего уровня модуля (ее передают в процессы
+    через pickle). При workers=1 или одном листе пул не создается.
+    Returns:
+        {имя листа: результат worker} в порядке sheet_names
+    """
+    workers = min(workers or os.cpu_count() or 1, len(sheet_names))
+    if workers <= 1:
+        return {sheet_name: worker(path, sheet_name) for sheet_name in sheet_names}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(worker, [path] * len(sheet_names), sheet_names)
+        return dict(zip(sheet_names, results))
+
+def parse_workbook_cached(path: str, kind: str, select_sheets: Callable[[List[str]], List[str]],
+                          worker: Callable[[str, str], Any], workers: Optional[int] = None,
+                          use_cache: bool = True) -> Tuple[Dict[str, Any], bool]:
+    """
+    Разбор книги с кэшем по хэшу файла.
+
+    kind - имя формата результата; его нужно менять (например, structure-v2)
+    при изменении разбора, чтобы старый кэш не использовался.
+    Returns:
+        ({имя листа: результат worker}, взят ли результат из кэша)
+    """
+    digest = file_hash(path)
+    if use_cache:
+        cached = load_cached(kind, digest)
+        if cached is not None:
+            return cached, True
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True)
+    try:
+        sheet_names = select_sheets(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+    result = parse_sheets(path, sheet_names, worker, workers)
+    if use_cache:
+        store_cached(kind, digest, result)
+    return result, False
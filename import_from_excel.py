@@ -1,9 +1,33 @@
-import pandas as pd
-import psycopg2
+"""
+Импорт оргструктуры (департаменты, отделы, функции) из Excel в БД.
+
+Импорт идет по этапам, для каждого печатается время:
+1. разбор - книга открывается один раз (openpyxl, read-only, построчно),
+   все листы департаментов разбираются в таблицы pandas;
+2. сверка - уже существующие записи читаются одним запросом на таблицу,
+   в план попадают только новые;
+3. запись - план пишется пакетными INSERT в одной транзакции.
+
+Листы разбираются параллельно, а результат разбора кэшируется по хэшу файла
+(см. excel_parsing.py): повторный импорт неизмененной книги Excel не читает.
+
+Запуск: python import_from_excel.py [--file книга.xlsx] [--dry-run] [--workers N] [--no-cache]
+С --dry-run выводится только разница с БД, ничего не записывается.
+"""
+import argparse
 import re
 import sys
 import os
-from typing import Dict, List, Tuple, Optional
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple, Optional
+
+import pandas as pd
+import psycopg2
+from openpyxl import load_workbook
+from psycopg2.extras import execute_values
+
+from excel_parsing import parse_workbook_cached
 
 # Параметры подключения к базе данных
 DB_PARAMS = {
@@ -15,6 +39,16 @@ DB_PARAMS = {
 
 EXCEL_FILE = "ОФС стандартизированная полностью_v2.xlsx"
 
+# Формат результата разбора в кэше; менять при изменении parse_department_sheet
+PARSE_CACHE_KIND = "structure-v1"
+
+ORGANIZATION_NAME = "ФОТОМАТРИЦА"
+ORGANIZATION_CKP = "Организация фотографического бизнеса"
+
+DEPARTMENT_SHEET_PATTERN = re.compile(r'^\d+\.?\s*ДЕПАРТАМЕНТ', re.IGNORECASE)
+SECTION_PATTERN = re.compile(r'^\d+\.\d+\s+Отдел\s+', re.IGNORECASE)
+FUNCTION_PATTERN = re.compile(r'^Функция', re.IGNORECASE)
+
 def clean_string(text: str) -> str:
     """Очистка строки от лишних символов"""
     if not isinstance(text, str):
@@ -25,15 +59,26 @@ def extract_name_from_title(title: str) -> str:
     """Извлечение имени из заголовка листа (например, из '1. ДЕПАРТАМЕНТ ПОСТРОЕНИЯ ОРГАНИЗАЦИИ')"""
     if not title:
         return ""
-    
+
     # Удаление номера в начале
-    clean_title = re.sub(r'^\d+\.?\s*', '', title)
-    
-    # Удаление слова "ДЕПАРТАМЕНТ"
-    clean_title = re.sub(r'ДЕПАРТАМЕНТ\s+', '', clean_title)
-    
+    clean_title = re.sub(r'^\d+\.?\s*', '', clean_string(title))
+
+    # Удаление слова "ДЕПАРТАМЕНТ" (в начале или в конце названия)
+    clean_title = re.sub(r'\s*ДЕПАРТАМЕНТ\s*', ' ', clean_title)
+
     return clean_title.strip()
 
+def make_code(name: str) -> str:
+    """Код из первых букв слов названия"""
+    return ''.join(word[0] for word in name.split() if word)
+
+@contextmanager
+def phase(name: str):
+    """Печатает время выполнения этапа импорта"""
+    started = time.perf_counter()
+    yield
+    print(f"[{name}] {(time.perf_counter() - started) * 1000:.0f} мс")
+
 def connect_to_db():
     """Подключение к базе данных"""
     try:
@@ -44,177 +89,266 @@ def connect_to_db():
         print(f"Ошибка подключения к БД: {e}")
         sys.exit(1)
 
-def insert_organization(conn, name="ФОТОМАТРИЦА", ckp="Организация фотографического бизнеса"):
-    """Создание основной организации в БД"""
-    try:
-        cur = conn.cursor()
-        # Проверка, существует ли организация
-        cur.execute("SELECT id FROM organizations WHERE name = %s", (name,))
-        result = cur.fetchone()
-        
-        if result:
-            print(f"Организация '{name}' уже существует с ID {result[0]}")
-            return result[0]
-        
-        # Вставка новой организации
-        cur.execute(
-            "INSERT INTO organizations (name, description, is_active, org_type, ckp) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-            (name, "Головная организация", True, "holding", ckp)
-        )
-        org_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"Создана организация '{name}' с ID {org_id}")
-        return org_id
-    except Exception as e:
-        conn.rollback()
-        print(f"Ошибка при создании организации: {e}")
-        return None
+# --- Этап 1: разбор книги ---
 
-def insert_division(conn, org_id: int, name: str, ckp: str = None) -> Optional[int]:
-    """Создание департамента в БД"""
-    try:
-        cur = conn.cursor()
-        # Проверка, существует ли департамент
-        cur.execute("SELECT id FROM divisions WHERE name = %s AND organization_id = %s", (name, org_id))
-        result = cur.fetchone()
-        
-        if result:
-            print(f"Департамент '{name}' уже существует с ID {result[0]}")
-            return result[0]
-        
-        # Вставка нового департамента
-        code = ''.join(word[0] for word in name.split() if word)
-        cur.execute(
-            "INSERT INTO divisions (name, code, organization_id, is_active, ckp) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-            (name, code, org_id, True, ckp)
-        )
-        div_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"Создан департамент '{name}' с ID {div_id}")
-        return div_id
-    except Exception as e:
-        conn.rollback()
-        print(f"Ошибка при создании департамента: {e}")
-        return None
+def parse_department_sheet(sheet_name: str, rows: Iterable[tuple]) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Разбирает строки листа департамента.
+
+    Отделы на листе расположены колонками: заголовок "N.M Отдел ..." задает
+    текущий отдел своей колонки, и функции ниже в той же колонке относятся к нему.
+    Название департамента берется из заголовка в первой ячейке листа, а если
+    его там нет - из названия листа.
+
+    Returns:
+        (название департамента, [(отдел, функция или None), ...])
+    """
+    dept_name = ""
+    section_by_column: Dict[int, str] = {}
+    items: List[Tuple[str, Optional[str]]] = []
 
-def insert_section(conn, division_id: int, name: str, ckp: str = None) -> Optional[int]:
-    """Создание отдела в БД"""
+    for row_index, row in enumerate(rows):
+        for column, value in enumerate(row):
+            if value is None:
+                continue
+            value = str(value)
+            if row_index == 0 and column == 0 and 'ДЕПАРТАМЕНТ' in value.upper():
+                # Заголовок листа с полным названием департамента
+                dept_name = extract_name_from_title(value)
+            elif SECTION_PATTERN.search(value):
+                # Это отдел
+                section_name = clean_string(value.split("Отдел")[1]) if "Отдел" in value else clean_string(value)
+                section_by_column[column] = section_name
+                items.append((section_name, None))
+            elif FUNCTION_PATTERN.search(value) and column in section_by_column:
+                # Это функция
+                items.append((section_by_column[column], clean_string(value)))
+
+    return dept_name or extract_name_from_title(sheet_name), items
+
+def parse_department_worksheet(path: str, sheet_name: str) -> Tuple[str, List[Tuple[str, Optional[str]]]]:
+    """Разбор одного листа в отдельном процессе: своя книга, только этот лист"""
+    workbook = load_workbook(path, read_only=True, data_only=True)
     try:
-        cur = conn.cursor()
-        # Проверка, существует ли отдел
-        cur.execute("SELECT id FROM sections WHERE name = %s AND division_id = %s", (name, division_id))
-        result = cur.fetchone()
-        
-        if result:
-            print(f"Отдел '{name}' уже существует с ID {result[0]}")
-            return result[0]
-        
-        # Вставка нового отдела
-        code = ''.join(word[0] for word in name.split() if word)
-        cur.execute(
-            "INSERT INTO sections (name, code, division_id, is_active, ckp) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-            (name, code, division_id, True, ckp)
-        )
-        section_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"Создан отдел '{name}' с ID {section_id}")
-        return section_id
-    except Exception as e:
-        conn.rollback()
-        print(f"Ошибка при создании отдела: {e}")
-        return None
+        return parse_department_sheet(sheet_name, workbook[sheet_name].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+def select_department_sheets(sheet_names: List[str]) -> List[str]:
+    return [sheet for sheet in sheet_names if DEPARTMENT_SHEET_PATTERN.search(sheet)]
+
+def parse_workbook(path: str, workers: Optional[int] = None, use_cache: bool = True) -> Dict[str, pd.DataFrame]:
+    """
+    Разбирает все листы департаментов (параллельно, с кэшем по хэшу файла).
+
+    Returns:
+        таблицы divisions (name, code), sections (division, name, code) и
+        functions (division, section, name) без повторов
+    """
+    sheets, from_cache = parse_workbook_cached(
+        path, PARSE_CACHE_KIND, select_department_sheets, parse_department_worksheet,
+        workers=workers, use_cache=use_cache
+    )
+    if from_cache:
+        print("Книга не изменилась, разбор взят из кэша")
+
+    divisions, sections, functions = [], [], []
+    for dept_name, items in sheets.values():
+        divisions.append((dept_name, make_code(dept_name)))
+        for section_name, function_name in items:
+            if function_name is None:
+                sections.append((dept_name, section_name, make_code(section_name)))
+            else:
+                functions.append((dept_name, section_name, function_name))
+
+    return {
+        'divisions': pd.DataFrame(divisions, columns=['name', 'code']).drop_duplicates('name'),
+        'sections': pd.DataFrame(sections, columns=['division', 'name', 'code']).drop_duplicates(['division', 'name']),
+        'functions': pd.DataFrame(functions, columns=['division', 'section', 'name']).drop_duplicates(),
+    }
+
+# --- Этап 2: сверка с БД ---
+
+def find_organization(cur, name: str = ORGANIZATION_NAME) -> Optional[int]:
+    """ID организации по названию"""
+    cur.execute("SELECT id FROM organizations WHERE name = %s", (name,))
+    result = cur.fetchone()
+    return result[0] if result else None
+
+def load_existing(cur, org_id: Optional[int]) -> Dict[str, pd.DataFrame]:
+    """Существующие департаменты, отделы и функции организации - один запрос на таблицу"""
+    if org_id is None:
+        return {
+            'divisions': pd.DataFrame(columns=['id', 'name']),
+            'sections': pd.DataFrame(columns=['id', 'division', 'name']),
+            'functions': pd.DataFrame(columns=['id', 'division', 'section', 'name']),
+        }
+
+    cur.execute("SELECT id, name FROM divisions WHERE organization_id = %s ORDER BY id", (org_id,))
+    divisions = pd.DataFrame(cur.fetchall(), columns=['id', 'name'])
+
+    cur.execute("""
+        SELECT s.id, d.name, s.name
+        FROM sections s JOIN divisions d ON d.id = s.division_id
+        WHERE d.organization_id = %s ORDER BY s.id
+    """, (org_id,))
+    sections = pd.DataFrame(cur.fetchall(), columns=['id', 'division', 'name'])
+
+    cur.execute("""
+        SELECT f.id, d.name, s.name, f.name
+        FROM functions f
+        JOIN sections s ON s.id = f.section_id
+        JOIN divisions d ON d.id = s.division_id
+        WHERE d.organization_id = %s ORDER BY f.id
+    """, (org_id,))
+    functions = pd.DataFrame(cur.fetchall(), columns=['id', 'division', 'section', 'name'])
+
+    # При повторах имен в БД берем запись с меньшим id
+    return {
+        'divisions': divisions.drop_duplicates('name'),
+        'sections': sections.drop_duplicates(['division', 'name']),
+        'functions': functions.drop_duplicates(['division', 'section', 'name']),
+    }
+
+def new_rows(parsed: pd.DataFrame, existing: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Строки parsed, которых нет в existing по ключу keys"""
+    merged = parsed.merge(existing[keys], on=keys, how='left', indicator=True)
+    return merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
+
+def plan_import(parsed: Dict[str, pd.DataFrame], existing: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """План импорта - только новые записи"""
+    return {
+        'divisions': new_rows(parsed['divisions'], existing['divisions'], ['name']),
+        'sections': new_rows(parsed['sections'], existing['sections'], ['division', 'name']),
+        'functions': new_rows(parsed['functions'], existing['functions'], ['division', 'section', 'name']),
+    }
+
+def print_diff(plan: Dict[str, pd.DataFrame], org_id: Optional[int]) -> None:
+    """Выводит разницу между книгой и БД"""
+    if org_id is None:
+        print(f"+ организация '{ORGANIZATION_NAME}'")
+    for name in plan['divisions']['name']:
+        print(f"+ департамент '{name}'")
+    for row in plan['sections'].itertuples(index=False):
+        print(f"+ отдел '{row.name}' ({row.division})")
+    for row in plan['functions'].itertuples(index=False):
+        print(f"+ функция '{row.name}' ({row.division} / {row.section})")
+    print(
+        f"Итого новых: департаментов {len(plan['divisions'])}, "
+        f"отделов {len(plan['sections'])}, функций {len(plan['functions'])}"
+    )
+
+# --- Этап 3: запись ---
+
+def insert_organization(cur, name: str = ORGANIZATION_NAME, ckp: str = ORGANIZATION_CKP) -> int:
+    """Создание основной организации в БД (без фиксации транзакции)"""
+    cur.execute(
+        "INSERT INTO organizations (name, description, is_active, org_type, ckp) VALUES (%s, %s, %s, %s, %s) RETURNING id",
+        (name, "Головная организация", True, "holding", ckp)
+    )
+    return cur.fetchone()[0]
+
+def write_plan(conn, org_id: Optional[int], plan: Dict[str, pd.DataFrame], existing: Dict[str, pd.DataFrame]) -> int:
+    """
+    Записывает план пакетными INSERT в одной транзакции.
 
-def insert_function(conn, section_id: int, name: str, ckp: str = None) -> Optional[int]:
-    """Создание функции в БД"""
+    Returns:
+        ID организации
+    """
     try:
-        cur = conn.cursor()
-        # Проверка, существует ли функция
-        cur.execute("SELECT id FROM functions WHERE name = %s AND section_id = %s", (name, section_id))
-        result = cur.fetchone()
-        
-        if result:
-            print(f"Функция '{name}' уже существует с ID {result[0]}")
-            return result[0]
-        
-        # Вставка новой функции
-        cur.execute(
-            "INSERT INTO functions (name, section_id, is_active, ckp) VALUES (%s, %s, %s, %s) RETURNING id",
-            (name, section_id, True, ckp)
-        )
-        function_id = cur.fetchone()[0]
+        with conn.cursor() as cur:
+            if org_id is None:
+                org_id = insert_organization(cur)
+
+            division_ids = dict(zip(existing['divisions']['name'], existing['divisions']['id']))
+            rows = [(name, code, org_id, True, None) for name, code in plan['divisions'][['name', 'code']].itertuples(index=False)]
+            if rows:
+                division_ids.update((name, id_) for id_, name in execute_values(
+                    cur,
+                    "INSERT INTO divisions (name, code, organization_id, is_active, ckp) VALUES %s RETURNING id, name",
+                    rows, fetch=True
+                ))
+
+            section_ids = {
+                (row.division, row.name): row.id for row in existing['sections'].itertuples(index=False)
+            }
+            rows = [
+                (row.name, row.code, division_ids[row.division], True, None)
+                for row in plan['sections'].itertuples(index=False)
+            ]
+            if rows:
+                division_names = {id_: name for name, id_ in division_ids.items()}
+                section_ids.update(((division_names[division_id], name), id_) for id_, division_id, name in execute_values(
+                    cur,
+                    "INSERT INTO sections (name, code, division_id, is_active, ckp) VALUES %s RETURNING id, division_id, name",
+                    rows, fetch=True
+                ))
+
+            rows = [
+                (row.name, section_ids[(row.division, row.section)], True, None)
+                for row in plan['functions'].itertuples(index=False)
+            ]
+            if rows:
+                execute_values(
+                    cur,
+                    "INSERT INTO functions (name, section_id, is_active, ckp) VALUES %s",
+                    rows
+                )
         conn.commit()
-        print(f"Создана функция '{name}' с ID {function_id}")
-        return function_id
-    except Exception as e:
+        return org_id
+    except Exception:
         conn.rollback()
-        print(f"Ошибка при создании функции: {e}")
-        return None
-
-def process_department_sheet(conn, org_id: int, sheet_name: str, df: pd.DataFrame) -> None:
-    """Обработка листа с департаментом"""
-    dept_name = extract_name_from_title(sheet_name)
-    print(f"\nОбработка департамента: {dept_name}")
-    
-    # Создаем департамент
-    division_id = insert_division(conn, org_id, dept_name)
-    if not division_id:
-        return
-    
-    # Находим строки с отделами и их функциями
-    section_pattern = re.compile(r'^\d+\.\d+\s+Отдел\s+', re.IGNORECASE)
-    function_pattern = re.compile(r'^Функция', re.IGNORECASE)
-    
-    current_section_id = None
-    
-    for i in range(len(df)):
-        row = df.iloc[i]
-        
-        # Проверяем первые 3 столбца на наличие данных
-        col_values = [str(row.iloc[j]) for j in range(min(3, len(row))) if not pd.isna(row.iloc[j])]
-        
-        for value in col_values:
-            if section_pattern.search(value):
-                # Это отдел
-                section_name = clean_string(value.split("Отдел")[1]) if "Отдел" in value else clean_string(value)
-                current_section_id = insert_section(conn, division_id, section_name)
-            elif function_pattern.search(value) and current_section_id:
-                # Это функция
-                function_name = clean_string(value)
-                insert_function(conn, current_section_id, function_name)
+        raise
 
-def import_from_excel():
+def import_from_excel(path: str = EXCEL_FILE, dry_run: bool = False,
+                      workers: Optional[int] = None, use_cache: bool = True):
     """Импорт данных из Excel в БД"""
-    if not os.path.exists(EXCEL_FILE):
-        print(f"Файл {EXCEL_FILE} не найден!")
+    if not os.path.exists(path):
+        print(f"Файл {path} не найден!")
         return
-    
+
+    with phase("разбор книги"):
+        parsed = parse_workbook(path, workers=workers, use_cache=use_cache)
+    print(
+        f"В книге: департаментов {len(parsed['divisions'])}, "
+        f"отделов {len(parsed['sections'])}, функций {len(parsed['functions'])}"
+    )
+
     # Подключение к БД
     conn = connect_to_db()
-    
+
     try:
-        # Создание организации
-        org_id = insert_organization(conn)
-        if not org_id:
+        with phase("сверка с БД"):
+            with conn.cursor() as cur:
+                org_id = find_organization(cur)
+                existing = load_existing(cur, org_id)
+            plan = plan_import(parsed, existing)
+
+        if dry_run:
+            print_diff(plan, org_id)
+            conn.rollback()
             return
-        
-        # Чтение Excel файла
-        excel = pd.ExcelFile(EXCEL_FILE)
-        sheet_names = excel.sheet_names
-        
-        # Обработка каждого листа департамента
-        department_sheets = [sheet for sheet in sheet_names if re.search(r'^\d+\.?\s*ДЕПАРТАМЕНТ', sheet, re.IGNORECASE)]
-        
-        for sheet_name in department_sheets:
-            df = pd.read_excel(EXCEL_FILE, sheet_name=sheet_name)
-            process_department_sheet(conn, org_id, sheet_name, df)
-        
-        print("\nИмпорт завершен успешно!")
-    
+
+        with phase("запись"):
+            org_id = write_plan(conn, org_id, plan, existing)
+
+        print(
+            f"\nИмпорт завершен успешно! Организация ID {org_id}: добавлено департаментов "
+            f"{len(plan['divisions'])}, отделов {len(plan['sections'])}, функций {len(plan['functions'])}"
+        )
+
     except Exception as e:
         print(f"\nОшибка при импорте данных: {e}")
     finally:
         conn.close()
 
 if __name__ == "__main__":
-    print(f"Запуск импорта данных из {EXCEL_FILE}...")
-    import_from_excel() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=EXCEL_FILE, help="Excel-файл со структурой")
+    parser.add_argument("--dry-run", action="store_true", help="только показать разницу с БД")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для разбора листов (по умолчанию - по числу CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="разобрать книгу заново, не используя кэш")
+    args = parser.parse_args()
+
+    print(f"Запуск импорта данных из {args.file}...")
+    import_from_excel(args.file, dry_run=args.dry_run, workers=args.workers, use_cache=not args.no_cache)
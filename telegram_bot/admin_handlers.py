@@ -7,10 +7,10 @@ from aiogram.fsm.context import FSMContext
 from typing import Dict, Any, List
 import asyncio
 
-from database import BotDatabase
+from database import BotDatabase, STAFF_PAGE_SIZE
 from states import AdminStates
 import keyboards
-from api_client import ApiClient
+from api_client import api_client
 from config import Config
 
 # Настройка логирования
@@ -25,17 +25,40 @@ router = Router()
 
 # Инициализация зависимостей
 db = BotDatabase()
-api_client = ApiClient()
 config = Config()
 
-# Фильтр для проверки прав админа
+# Заглушки должностей на случай, если API не вернул справочник
+FALLBACK_POSITIONS = [
+    {"id": 1, "name": "Генеральный директор", "description": "Высшее руководящее лицо компании"},
+    {"id": 2, "name": "Технический директор", "description": "Руководитель технического направления"},
+    {"id": 3, "name": "Руководитель отдела", "description": "Управление отделом компании"},
+    {"id": 4, "name": "Менеджер проекта", "description": "Управление проектами компании"},
+    {"id": 5, "name": "Разработчик", "description": "Разработка программного обеспечения"}
+]
+
+async def get_positions_for_selection() -> List[Dict[str, Any]]:
+    """Должности из кэшированного справочника API или заглушки, если он пуст"""
+    positions = await api_client.get_positions()
+    if not positions:
+        logger.warning("API не вернул должности, используем заглушки")
+        return FALLBACK_POSITIONS
+    return positions
+
+async def find_position_for_selection(position_id: int) -> Dict[str, Any]:
+    """Должность по ID из кэша справочника (без запроса к API, если кэш свежий)"""
+    position = await api_client.find_position(position_id)
+    if position is None:
+        position = next((p for p in FALLBACK_POSITIONS if p["id"] == position_id), None)
+    return position
+
+# Фильтры прав проверяют реестр админов в памяти, без запросов к БД
 def is_admin_filter(message: Message) -> bool:
     """Фильтр для проверки, является ли пользователь админом"""
-    return db.is_admin(str(message.from_user.id))
+    return db.admins.is_admin(str(message.from_user.id))
 
 def is_superadmin_filter(message: Message) -> bool:
     """Фильтр для проверки, является ли пользователь супер-админом"""
-    return db.is_superadmin(str(message.from_user.id))
+    return db.admins.is_superadmin(str(message.from_user.id))
 
 # Команда для входа в админ-панель
 @router.message(Command("admin"))
@@ -74,7 +97,7 @@ async def admin_panel(message: Message):
 @router.message(F.text == "📋 Заявки", is_admin_filter)
 async def show_requests(message: Message):
     """Отображает список заявок на регистрацию"""
-    requests = db.get_pending_registration_requests()
+    requests = await db.run(db.get_pending_registration_requests)
     
     if not requests:
         await message.answer(
@@ -100,7 +123,7 @@ async def show_registration_requests(message: Message):
 @router.callback_query(F.data == "refresh_requests")
 async def refresh_requests(callback: CallbackQuery):
     """Обновляет список заявок"""
-    requests = db.get_pending_registration_requests()
+    requests = await db.run(db.get_pending_registration_requests)
     
     if not requests:
         await callback.message.edit_text(
@@ -136,7 +159,7 @@ async def back_to_admin(callback: CallbackQuery):
 async def select_request(callback: CallbackQuery):
     """Отображает данные конкретной заявки"""
     request_id = int(callback.data.split("_")[1])
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     
     if not request:
         await callback.message.edit_text(
@@ -171,7 +194,7 @@ async def select_request(callback: CallbackQuery):
 @router.callback_query(F.data == "back_to_requests")
 async def back_to_requests(callback: CallbackQuery):
     """Возврат к списку заявок"""
-    requests = db.get_pending_registration_requests()
+    requests = await db.run(db.get_pending_registration_requests)
     
     if not requests:
         await callback.message.edit_text(
@@ -194,7 +217,7 @@ async def reject_request(callback: CallbackQuery):
     request_id = int(callback.data.split("_")[2])
     
     # Обновляем статус заявки
-    success = db.process_registration_request(
+    success = await db.run(db.process_registration_request,
         request_id=request_id,
         status="rejected",
         admin_id=str(callback.from_user.id)
@@ -209,7 +232,7 @@ async def reject_request(callback: CallbackQuery):
         return
     
     # Получаем данные заявки
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     
     await callback.message.edit_text(
         f"✅ Заявка #{request_id} успешно отклонена.",
@@ -235,7 +258,7 @@ async def approve_request(callback: CallbackQuery, state: FSMContext):
     request_id = int(callback.data.split("_")[2])
     
     # Получаем данные заявки
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     
     if not request:
         await callback.message.edit_text(
@@ -248,24 +271,9 @@ async def approve_request(callback: CallbackQuery, state: FSMContext):
     # Сохраняем ID заявки в состоянии
     await state.update_data(request_id=request_id)
     
-    # Получаем список должностей из API
+    # Получаем список должностей (из кэша справочников API)
     try:
-        # Запрашиваем должности через API
-        positions = await api_client.get_positions()
-        
-        if not positions:
-            # Если API не вернул должности, используем заглушки
-            logger.warning("API не вернул должности, используем заглушки")
-            positions = [
-                {"id": 1, "name": "Генеральный директор", "description": "Высшее руководящее лицо компании"},
-                {"id": 2, "name": "Технический директор", "description": "Руководитель технического направления"},
-                {"id": 3, "name": "Руководитель отдела", "description": "Управление отделом компании"},
-                {"id": 4, "name": "Менеджер проекта", "description": "Управление проектами компании"},
-                {"id": 5, "name": "Разработчик", "description": "Разработка программного обеспечения"}
-            ]
-        
-        # Сохраняем список позиций в состоянии
-        await state.update_data(positions=positions)
+        positions = await get_positions_for_selection()
         
         # Устанавливаем состояние ожидания выбора должности
         await state.set_state(AdminStates.waiting_for_position_selection)
@@ -279,10 +287,8 @@ async def approve_request(callback: CallbackQuery, state: FSMContext):
             reply_markup=keyboards.get_positions_keyboard(positions, request_id)
         )
         
-        # Также запрашиваем список отделов, чтобы потом можно было выбрать
-        divisions = await api_client.get_divisions()
-        if divisions:
-            await state.update_data(divisions=divisions)
+        # Прогреваем кэш отделов, чтобы следующий шаг не ждал API
+        await api_client.get_divisions()
         
         await callback.answer()
     except Exception as e:
@@ -302,11 +308,9 @@ async def select_position(callback: CallbackQuery, state: FSMContext):
     # Получаем данные из состояния
     data = await state.get_data()
     request_id = data.get("request_id")
-    positions = data.get("positions", [])
-    divisions = data.get("divisions", [])
     
     # Получаем данные заявки
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     
     if not request:
         await callback.message.edit_text(
@@ -317,12 +321,8 @@ async def select_position(callback: CallbackQuery, state: FSMContext):
         await state.clear()
         return
     
-    # Находим выбранную должность в списке
-    selected_position = None
-    for position in positions:
-        if position.get('id') == position_id or str(position.get('id')) == str(position_id):
-            selected_position = position
-            break
+    # Находим выбранную должность в кэшированном справочнике
+    selected_position = await find_position_for_selection(position_id)
     
     if not selected_position:
         await callback.message.edit_text(
@@ -341,6 +341,7 @@ async def select_position(callback: CallbackQuery, state: FSMContext):
     )
     
     # Если есть отделы, предлагаем выбрать отдел
+    divisions = await api_client.get_divisions()
     if divisions:
         await state.set_state(AdminStates.waiting_for_division_selection)
         
@@ -365,16 +366,8 @@ async def select_division(callback: CallbackQuery, state: FSMContext):
     """Обрабатывает выбор отдела и генерирует код приглашения"""
     division_id = int(callback.data.split("_")[1])
     
-    # Получаем данные из состояния
-    data = await state.get_data()
-    divisions = data.get("divisions", [])
-    
-    # Находим выбранный отдел в списке
-    selected_division = None
-    for division in divisions:
-        if division.get('id') == division_id or str(division.get('id')) == str(division_id):
-            selected_division = division
-            break
+    # Находим выбранный отдел в кэшированном справочнике
+    selected_division = await api_client.find_division(division_id)
     
     if not selected_division:
         await callback.answer("Отдел не найден")
@@ -404,8 +397,8 @@ async def back_to_position_selection(callback: CallbackQuery, state: FSMContext)
     # Получаем данные из состояния
     data = await state.get_data()
     request_id = data.get("request_id")
-    positions = data.get("positions", [])
-    request = db.get_registration_request(request_id)
+    positions = await get_positions_for_selection()
+    request = await db.run(db.get_registration_request, request_id)
     
     # Устанавливаем состояние выбора должности
     await state.set_state(AdminStates.waiting_for_position_selection)
@@ -427,7 +420,7 @@ async def generate_invitation_code(callback: CallbackQuery, state: FSMContext):
     # Получаем данные из состояния
     data = await state.get_data()
     request_id = data.get("request_id")
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     
     # Получаем данные о выбранной должности
     selected_position = data.get("selected_position")
@@ -461,7 +454,7 @@ async def generate_invitation_code(callback: CallbackQuery, state: FSMContext):
         expires_at = api_result.get("expires_at", "неизвестно")
         
         # Сохраняем код в БД
-        db.save_invitation_code(
+        await db.run_write(db.save_invitation_code,
             request_id=request_id,
             code=invitation_code,
             position_id=position_id,
@@ -505,7 +498,7 @@ async def generate_invitation_code(callback: CallbackQuery, state: FSMContext):
         )
     
     # Обновляем состояние заявки
-    db.update_registration_request(request_id, status="approved")
+    await db.run(db.update_registration_request, request_id, status="approved")
     
     # Очищаем состояние
     await state.clear()
@@ -517,7 +510,7 @@ async def generate_invitation_code(callback: CallbackQuery, state: FSMContext):
 async def back_to_request(callback: CallbackQuery, state: FSMContext):
     """Возврат к просмотру заявки"""
     request_id = int(callback.data.split("_")[3])
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     
     await state.clear()
     
@@ -557,18 +550,21 @@ async def show_stats(message: Message):
     admin_id = str(message.from_user.id)
     
     # Получаем статистику админа
-    admin_stats = db.get_admin_stats(admin_id)
+    admin_stats = await db.run(db.get_admin_stats, admin_id)
     
     # Получаем общую статистику
-    staff = db.get_all_staff()
-    requests = db.get_pending_registration_requests()
+    staff = await db.run(db.get_all_staff)
+    requests = await db.run(db.get_pending_registration_requests)
+    registry_stats = db.admins.stats()
     
     # Формируем текст со статистикой
     text = (
         f"📊 <b>Статистика</b>\n\n"
         f"<b>Общая статистика:</b>\n"
         f"• Всего сотрудников: {len(staff)}\n"
-        f"• Ожидающих заявок: {len(requests)}\n\n"
+        f"• Ожидающих заявок: {len(requests)}\n"
+        f"• Проверок прав из реестра админов: "
+        f"{registry_stats['admin_checks'] + registry_stats['superadmin_checks']}\n\n"
         f"<b>Ваша статистика:</b>\n"
         f"• Обработано заявок: {admin_stats['processed_requests']}\n"
         f"• Одобрено заявок: {admin_stats['approved_requests']}\n"
@@ -604,7 +600,7 @@ async def user_management(message: Message):
 @router.message(F.text == "📜 Список админов", is_superadmin_filter)
 async def list_admins(message: Message):
     """Показывает список всех админов"""
-    admins = db.get_all_admins()
+    admins = await db.run(db.get_all_admins)
     
     if not admins:
         await message.answer(
@@ -669,7 +665,7 @@ async def process_admin_id(message: Message, state: FSMContext):
         return
     
     # Проверяем, существует ли уже такой админ
-    existing_admin = db.get_admin_by_telegram_id(telegram_id)
+    existing_admin = await db.run(db.get_admin_by_telegram_id, telegram_id)
     if existing_admin and existing_admin['is_active']:
         await message.answer(
             "❌ Этот пользователь уже является админом.",
@@ -724,7 +720,7 @@ async def confirm_add_admin(callback: CallbackQuery, state: FSMContext):
         data = await state.get_data()
         
         # Добавляем нового админа
-        success = db.add_admin(
+        success = await db.run(db.add_admin,
             telegram_id=data['admin_telegram_id'],
             full_name=data['admin_name'],
             created_by=str(callback.from_user.id)
@@ -791,30 +787,76 @@ async def main_menu_from_admin(message: Message):
         reply_markup=keyboards.get_main_keyboard()
     )
 
+def remember_staff_page_key(page_keys: Dict[str, Any], page: int, staff: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Запоминает ключ (created_at, id) последней строки как начало следующей страницы"""
+    if len(staff) == STAFF_PAGE_SIZE:
+        page_keys[str(page + 1)] = [staff[-1]['created_at'], staff[-1]['id']]
+    return page_keys
+
 # Обработчик кнопки "Сотрудники"
 @router.message(F.text == "🧑‍💼 Сотрудники", is_admin_filter)
-async def show_staff(message: Message):
-    """Отображает список сотрудников"""
-    staff = db.get_all_staff()
+async def show_staff(message: Message, state: FSMContext):
+    """Отображает первую страницу списка сотрудников"""
+    total = await db.run(db.count_active_staff)
     
-    if not staff:
+    if not total:
         await message.answer(
             "📭 Список сотрудников пуст.",
             reply_markup=keyboards.get_admin_keyboard()
         )
         return
     
+    staff = await db.run(db.get_staff_page)
+    
+    # Сессия просмотра: общее число и ключи начала страниц хранятся в FSM,
+    # чтобы листание читало из БД только показываемые строки
+    await state.update_data(staff_total=total, staff_page_keys=remember_staff_page_key({}, 0, staff))
+    
     await message.answer(
-        f"👥 <b>Список сотрудников ({len(staff)})</b>\n\n"
+        f"👥 <b>Список сотрудников ({total})</b>\n\n"
+        f"Выберите сотрудника для просмотра деталей:",
+        reply_markup=keyboards.get_staff_list_keyboard(staff, 0, total, STAFF_PAGE_SIZE)
+    )
+
+# Обработчик листания списка сотрудников
+@router.callback_query(F.data.startswith("emp_page_"))
+async def staff_page(callback: CallbackQuery, state: FSMContext):
+    """Показывает страницу списка сотрудников"""
+    if not db.admins.is_admin(str(callback.from_user.id)):
+        await callback.answer("Недостаточно прав")
+        return
+    
+    page = max(int(callback.data.split("_")[2]), 0)
+    
+    data = await state.get_data()
+    total = data.get("staff_total")
+    if total is None:
+        # Сессия просмотра потеряна (например, после перезапуска бота)
+        total = await db.run(db.count_active_staff)
+    page_keys = data.get("staff_page_keys", {})
+    
+    key = page_keys.get(str(page))
+    if page == 0:
+        staff = await db.run(db.get_staff_page)
+    elif key is not None:
+        staff = await db.run(db.get_staff_page, after=tuple(key))
+    else:
+        staff = await db.run(db.get_staff_page, offset=page * STAFF_PAGE_SIZE)
+    
+    await state.update_data(staff_total=total, staff_page_keys=remember_staff_page_key(page_keys, page, staff))
+    
+    await callback.message.edit_text(
+        f"👥 <b>Список сотрудников ({total})</b>\n\n"
         f"Выберите сотрудника для просмотра деталей:",
-        reply_markup=keyboards.get_staff_list_keyboard(staff)
+        reply_markup=keyboards.get_staff_list_keyboard(staff, page, total, STAFF_PAGE_SIZE)
     )
+    await callback.answer()
 
 # Обработчик кнопки "Удалить админа"
 @router.message(F.text == "➖ Удалить админа", is_superadmin_filter)
 async def remove_admin_start(message: Message):
     """Начинает процесс удаления админа"""
-    admins = db.get_all_admins()
+    admins = await db.run(db.get_all_admins)
     
     # Фильтруем только активных админов, кроме текущего
     active_admins = [
@@ -842,7 +884,7 @@ async def admin_actions(callback: CallbackQuery):
     admin_id = callback.data.split("_")[1]
     
     # Получаем данные админа
-    admin = db.get_admin_by_telegram_id(admin_id)
+    admin = await db.run(db.get_admin_by_telegram_id, admin_id)
     
     if not admin:
         await callback.message.edit_text(
@@ -877,7 +919,7 @@ async def admin_actions(callback: CallbackQuery):
 @router.callback_query(F.data == "back_to_admins_list")
 async def back_to_admins_list(callback: CallbackQuery):
     """Возврат к списку админов"""
-    admins = db.get_all_admins()
+    admins = await db.run(db.get_all_admins)
     
     await callback.message.edit_text(
         f"👥 <b>Список админов ({len(admins)})</b>\n\n"
@@ -903,7 +945,7 @@ async def remove_admin(callback: CallbackQuery):
         return
     
     # Получаем данные админа
-    admin = db.get_admin_by_telegram_id(admin_id)
+    admin = await db.run(db.get_admin_by_telegram_id, admin_id)
     
     if not admin:
         await callback.message.edit_text(
@@ -914,7 +956,7 @@ async def remove_admin(callback: CallbackQuery):
         return
     
     # Проверяем, не пытается ли обычный админ удалить супер-админа
-    if admin['permission_level'] == 2 and not db.is_superadmin(str(callback.from_user.id)):
+    if admin['permission_level'] == 2 and not db.admins.is_superadmin(str(callback.from_user.id)):
         await callback.message.edit_text(
             "❌ У вас недостаточно прав для удаления супер-админа.",
             reply_markup=keyboards.get_back_to_main_keyboard()
@@ -923,7 +965,7 @@ async def remove_admin(callback: CallbackQuery):
         return
     
     # Удаляем админа
-    success = db.remove_admin(admin_id)
+    success = await db.run(db.remove_admin, admin_id)
     
     if success:
         # Отправляем уведомление удаленному админу
@@ -955,7 +997,7 @@ async def admin_stats(callback: CallbackQuery):
     admin_id = callback.data.split("_")[2]
     
     # Получаем данные админа
-    admin = db.get_admin_by_telegram_id(admin_id)
+    admin = await db.run(db.get_admin_by_telegram_id, admin_id)
     
     if not admin:
         await callback.message.edit_text(
@@ -966,7 +1008,7 @@ async def admin_stats(callback: CallbackQuery):
         return
     
     # Получаем статистику админа
-    stats = db.get_admin_stats(admin_id)
+    stats = await db.run(db.get_admin_stats, admin_id)
     
     # Формируем текст со статистикой
     text = (
@@ -980,7 +1022,7 @@ async def admin_stats(callback: CallbackQuery):
     
     await callback.message.edit_text(
         text,
-        reply_markup=keyboards.get_admins_list_keyboard(db.get_all_admins())
+        reply_markup=keyboards.get_admins_list_keyboard(await db.run(db.get_all_admins))
     )
     
     await callback.answer()
@@ -1000,7 +1042,7 @@ async def send_invitation_to_user(
         position_name: Название должности
         division_name: Название отдела (опционально)
     """
-    request = db.get_registration_request(request_id)
+    request = await db.run(db.get_registration_request, request_id)
     if not request:
         logger.error(f"Не удалось найти заявку с ID {request_id}")
         return
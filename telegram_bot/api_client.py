@@ -1,6 +1,8 @@
+import asyncio
 import logging
+import time
 import aiohttp
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Tuple
 from config import Config
 
 # Настройка логирования
@@ -13,8 +15,107 @@ logger = logging.getLogger(__name__)
 # Загрузка конфигурации
 config = Config()
 
+# Заглушка на случай недоступности API организаций
+FALLBACK_ORGANIZATIONS = [
+    {"id": 1, "name": "OFS Global", "description": "Основная организация"}
+]
+
+
+class ApiError(Exception):
+    """Ответ API с кодом, отличным от 200"""
+
+    def __init__(self, status: int, text: str):
+        super().__init__(f"{status} - {text}")
+        self.status = status
+        self.text = text
+
+
+class ReferenceCache:
+    """
+    Кэш справочников с TTL и stale-while-revalidate.
+
+    Свежее значение (моложе ttl) отдается сразу. Устаревшее, но не старше
+    ttl + stale_ttl, тоже отдается сразу, а в фоне запускается одно обновление.
+    Без значения загрузчик вызывается один раз, даже если его ждут несколько
+    обработчиков. Ошибка фонового обновления оставляет старое значение.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self._clock() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._schedule_refresh(key, loader)
+                return entry[1]
+
+        self.misses += 1
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            # Пока ждали блокировку, значение мог загрузить другой обработчик
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] < self.ttl:
+                return entry[1]
+            return await self._load(key, loader)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        self._entries[key] = (self._clock(), value)
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, loader))
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            async with self._locks.setdefault(key, asyncio.Lock()):
+                await self._load(key, loader)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Не удалось обновить справочник {key}, используются прежние данные: {e}")
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": sorted(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
 class ApiClient:
-    """Класс для взаимодействия с API основной системы"""
+    """
+    Класс для взаимодействия с API основной системы.
+
+    Все запросы идут через одну долгоживущую aiohttp-сессию с keep-alive и
+    ограничением соединений на хост. Справочники (должности, отделы, организации)
+    кэшируются в ReferenceCache.
+    """
     
     def __init__(self):
         self.base_url = config.API_URL
@@ -26,29 +127,75 @@ class ApiClient:
         self.positions_endpoint = f"{self.base_url}/positions"
         self.divisions_endpoint = f"{self.base_url}/divisions"
         self.staff_endpoint = f"{self.base_url}/staff"
+        
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = ReferenceCache(ttl=config.API_CACHE_TTL, stale_ttl=config.API_CACHE_STALE_TTL)
+        # Индексы справочников по id: ключ -> (список, из которого построен, индекс)
+        self._indexes: Dict[str, Tuple[list, Dict[str, Dict[str, Any]]]] = {}
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую сессию, создавая ее при первом обращении (или после закрытия)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.API_POOL_LIMIT,
+                limit_per_host=config.API_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=config.API_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(total=config.API_TIMEOUT, connect=config.API_CONNECT_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+    
+    async def close(self) -> None:
+        """Закрывает сессию (при остановке бота)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _get_json(self, url: str) -> Any:
+        """GET с разбором JSON; при коде, отличном от 200, бросает ApiError"""
+        session = self._get_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise ApiError(response.status, await response.text())
+            return await response.json()
+    
+    async def _get_reference(self, key: str, url: str, title: str) -> List[Dict[str, Any]]:
+        """Справочник из кэша; при промахе загружается из API"""
+        async def load():
+            items = await self._get_json(url)
+            logger.info(f"Получено {len(items)} {title} из API")
+            return items
+        
+        return await self.cache.get(key, load)
+    
+    def _find_in(self, key: str, items: List[Dict[str, Any]], item_id: Any) -> Optional[Dict[str, Any]]:
+        """Поиск элемента справочника по id через индекс, построенный один раз на список"""
+        indexed = self._indexes.get(key)
+        if indexed is None or indexed[0] is not items:
+            indexed = (items, {str(item.get("id")): item for item in items})
+            self._indexes[key] = indexed
+        return indexed[1].get(str(item_id))
     
     async def get_positions(self) -> List[Dict[str, Any]]:
         """
-        Получает список всех должностей из основной системы
+        Получает список всех должностей из основной системы (через кэш справочников)
         
         Returns:
             List[Dict[str, Any]]: Список словарей с данными о должностях
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.positions_endpoint) as response:
-                    if response.status == 200:
-                        positions = await response.json()
-                        logger.info(f"Получено {len(positions)} должностей из API")
-                        return positions
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при получении должностей: {response.status} - {error_text}")
-                        return []
+            return await self._get_reference("positions", self.positions_endpoint, "должностей")
         except Exception as e:
-            logger.error(f"Исключение при получении должностей: {str(e)}")
+            logger.error(f"Ошибка при получении должностей: {str(e)}")
             return []
     
+    async def find_position(self, position_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Находит должность по ID в кэшированном справочнике
+        """
+        return self._find_in("positions", await self.get_positions(), position_id)
+    
     async def get_position_by_id(self, position_id: int) -> Optional[Dict[str, Any]]:
         """
         Получает информацию о должности по ID
@@ -62,72 +209,54 @@ class ApiClient:
         position_endpoint = f"{self.positions_endpoint}/{position_id}"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(position_endpoint) as response:
-                    if response.status == 200:
-                        position = await response.json()
-                        logger.info(f"Получена должность с ID {position_id}")
-                        return position
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при получении должности: {response.status} - {error_text}")
-                        return None
+            session = self._get_session()
+            async with session.get(position_endpoint) as response:
+                if response.status == 200:
+                    position = await response.json()
+                    logger.info(f"Получена должность с ID {position_id}")
+                    return position
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка при получении должности: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logger.error(f"Исключение при получении должности: {str(e)}")
             return None
     
     async def get_organizations(self) -> List[Dict[str, Any]]:
         """
-        Получает список всех организаций из основной системы
+        Получает список всех организаций из основной системы (через кэш справочников)
         
         Returns:
             List[Dict[str, Any]]: Список словарей с данными об организациях
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.organizations_endpoint) as response:
-                    if response.status == 200:
-                        organizations = await response.json()
-                        logger.info(f"Получено {len(organizations)} организаций из API")
-                        return organizations
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при получении организаций: {response.status} - {error_text}")
-                        # Возвращаем заглушку в случае ошибки
-                        logger.info("Возвращаем заглушку для организаций")
-                        return [
-                            {"id": 1, "name": "OFS Global", "description": "Основная организация"}
-                        ]
+            return await self._get_reference("organizations", self.organizations_endpoint, "организаций")
         except Exception as e:
-            logger.error(f"Исключение при получении организаций: {str(e)}")
-            # Возвращаем заглушку в случае ошибки соединения
+            logger.error(f"Ошибка при получении организаций: {str(e)}")
+            # Возвращаем заглушку в случае ошибки (в кэш она не попадает)
             logger.info("Возвращаем заглушку для организаций")
-            return [
-                {"id": 1, "name": "OFS Global", "description": "Основная организация"}
-            ]
+            return list(FALLBACK_ORGANIZATIONS)
     
     async def get_divisions(self) -> List[Dict[str, Any]]:
         """
-        Получает список всех отделов (divisions) из основной системы
+        Получает список всех отделов (divisions) из основной системы (через кэш справочников)
         
         Returns:
             List[Dict[str, Any]]: Список словарей с данными об отделах
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.divisions_endpoint) as response:
-                    if response.status == 200:
-                        divisions = await response.json()
-                        logger.info(f"Получено {len(divisions)} отделов из API")
-                        return divisions
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при получении отделов: {response.status} - {error_text}")
-                        return []
+            return await self._get_reference("divisions", self.divisions_endpoint, "отделов")
         except Exception as e:
-            logger.error(f"Исключение при получении отделов: {str(e)}")
+            logger.error(f"Ошибка при получении отделов: {str(e)}")
             return []
     
+    async def find_division(self, division_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Находит отдел по ID в кэшированном справочнике
+        """
+        return self._find_in("divisions", await self.get_divisions(), division_id)
+    
     async def send_employee_data(self, employee_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Отправляет данные о сотруднике в основную систему
@@ -160,25 +289,25 @@ class ApiClient:
         adapted_data = {k: v for k, v in adapted_data.items() if v is not None}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                logger.info(f"Отправка данных сотрудника: {adapted_data}")
-                async with session.post(self.webhook_endpoint, json=adapted_data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Данные сотрудника успешно отправлены: {result}")
-                        return {
-                            "success": True,
-                            "message": "Данные успешно отправлены",
-                            "result": result
-                        }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при отправке данных сотрудника: {response.status} - {error_text}")
-                        return {
-                            "success": False,
-                            "message": f"Ошибка {response.status}: {error_text}",
-                            "result": None
-                        }
+            session = self._get_session()
+            logger.info(f"Отправка данных сотрудника: {adapted_data}")
+            async with session.post(self.webhook_endpoint, json=adapted_data) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info(f"Данные сотрудника успешно отправлены: {result}")
+                    return {
+                        "success": True,
+                        "message": "Данные успешно отправлены",
+                        "result": result
+                    }
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка при отправке данных сотрудника: {response.status} - {error_text}")
+                    return {
+                        "success": False,
+                        "message": f"Ошибка {response.status}: {error_text}",
+                        "result": None
+                    }
         except Exception as e:
             error_message = str(e)
             logger.error(f"Исключение при отправке данных сотрудника: {error_message}")
@@ -199,25 +328,25 @@ class ApiClient:
             bool: True если токен валиден, False в противном случае
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.token_validation_endpoint, 
-                    json={"token": token}
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get("status") == "valid":
-                            logger.info("Токен успешно валидирован")
-                            return True
-                        else:
-                            logger.error(f"Неверный статус валидации токена: {result}")
-                            return False
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка валидации токена: {response.status} - {error_text}")
-                        # В случае ошибки разрешаем использование бота
-                        logger.warning("Временно разрешаем использование бота без валидации токена")
+            session = self._get_session()
+            async with session.post(
+                self.token_validation_endpoint, 
+                json={"token": token}
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    if result.get("status") == "valid":
+                        logger.info("Токен успешно валидирован")
                         return True
+                    else:
+                        logger.error(f"Неверный статус валидации токена: {result}")
+                        return False
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка валидации токена: {response.status} - {error_text}")
+                    # В случае ошибки разрешаем использование бота
+                    logger.warning("Временно разрешаем использование бота без валидации токена")
+                    return True
         except Exception as e:
             logger.error(f"Исключение при валидации токена: {str(e)}")
             # В случае ошибки соединения разрешаем использование бота
@@ -235,25 +364,25 @@ class ApiClient:
             Dict[str, Any]: Результат операции
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                logger.info(f"Создание сотрудника через эндпоинт /staff: {staff_data}")
-                async with session.post(self.staff_endpoint, json=staff_data) as response:
-                    if response.status in (200, 201):
-                        result = await response.json()
-                        logger.info(f"Сотрудник успешно создан: {result}")
-                        return {
-                            "success": True,
-                            "message": "Сотрудник успешно создан",
-                            "result": result
-                        }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при создании сотрудника: {response.status} - {error_text}")
-                        return {
-                            "success": False,
-                            "message": f"Ошибка {response.status}: {error_text}",
-                            "result": None
-                        }
+            session = self._get_session()
+            logger.info(f"Создание сотрудника через эндпоинт /staff: {staff_data}")
+            async with session.post(self.staff_endpoint, json=staff_data) as response:
+                if response.status in (200, 201):
+                    result = await response.json()
+                    logger.info(f"Сотрудник успешно создан: {result}")
+                    return {
+                        "success": True,
+                        "message": "Сотрудник успешно создан",
+                        "result": result
+                    }
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка при создании сотрудника: {response.status} - {error_text}")
+                    return {
+                        "success": False,
+                        "message": f"Ошибка {response.status}: {error_text}",
+                        "result": None
+                    }
         except Exception as e:
             error_message = str(e)
             logger.error(f"Исключение при создании сотрудника: {error_message}")
@@ -283,27 +412,27 @@ class ApiClient:
         invitation_endpoint = f"{self.base_url}/telegram-bot/generate-invitation"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                logger.info(f"Генерация инвайт-кода: {data}")
-                async with session.post(invitation_endpoint, json=data) as response:
-                    if response.status in (200, 201):
-                        result = await response.json()
-                        logger.info(f"Инвайт-код успешно сгенерирован: {result}")
-                        return {
-                            "success": True,
-                            "message": "Инвайт-код успешно сгенерирован",
-                            "code": result.get("code"),
-                            "expires_at": result.get("expires_at"),
-                            "result": result
-                        }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при генерации инвайт-кода: {response.status} - {error_text}")
-                        return {
-                            "success": False,
-                            "message": f"Ошибка {response.status}: {error_text}",
-                            "result": None
-                        }
+            session = self._get_session()
+            logger.info(f"Генерация инвайт-кода: {data}")
+            async with session.post(invitation_endpoint, json=data) as response:
+                if response.status in (200, 201):
+                    result = await response.json()
+                    logger.info(f"Инвайт-код успешно сгенерирован: {result}")
+                    return {
+                        "success": True,
+                        "message": "Инвайт-код успешно сгенерирован",
+                        "code": result.get("code"),
+                        "expires_at": result.get("expires_at"),
+                        "result": result
+                    }
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка при генерации инвайт-кода: {response.status} - {error_text}")
+                    return {
+                        "success": False,
+                        "message": f"Ошибка {response.status}: {error_text}",
+                        "result": None
+                    }
         except Exception as e:
             error_message = str(e)
             logger.error(f"Исключение при генерации инвайт-кода: {error_message}")
@@ -327,31 +456,31 @@ class ApiClient:
         validation_endpoint = f"{self.base_url}/telegram-bot/validate-invitation"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                logger.info(f"Проверка инвайт-кода: {code} для пользователя {telegram_id}")
-                async with session.post(
-                    validation_endpoint, 
-                    json={"code": code, "telegram_id": telegram_id}
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Инвайт-код успешно проверен: {result}")
-                        return {
-                            "success": True,
-                            "message": "Инвайт-код действителен",
-                            "position": result.get("position"),
-                            "division": result.get("division"),
-                            "organization": result.get("organization"),
-                            "result": result
-                        }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка при проверке инвайт-кода: {response.status} - {error_text}")
-                        return {
-                            "success": False,
-                            "message": f"Ошибка {response.status}: {error_text}",
-                            "result": None
-                        }
+            session = self._get_session()
+            logger.info(f"Проверка инвайт-кода: {code} для пользователя {telegram_id}")
+            async with session.post(
+                validation_endpoint, 
+                json={"code": code, "telegram_id": telegram_id}
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info(f"Инвайт-код успешно проверен: {result}")
+                    return {
+                        "success": True,
+                        "message": "Инвайт-код действителен",
+                        "position": result.get("position"),
+                        "division": result.get("division"),
+                        "organization": result.get("organization"),
+                        "result": result
+                    }
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка при проверке инвайт-кода: {response.status} - {error_text}")
+                    return {
+                        "success": False,
+                        "message": f"Ошибка {response.status}: {error_text}",
+                        "result": None
+                    }
         except Exception as e:
             error_message = str(e)
             logger.error(f"Исключение при проверке инвайт-кода: {error_message}")
@@ -61,7 +61,19 @@ class Config:
         self.API_WEBHOOK_ENDPOINT = f"{self.API_URL}/telegram-bot/webhook"
         self.API_TOKEN_VALIDATION_ENDPOINT = f"{self.API_URL}/telegram-bot/validate-token"
         self.API_ORGANIZATIONS_ENDPOINT = f"{self.API_URL}/telegram-bot/organizations"
-        
+
+        # Параметры HTTP-соединений с API (таймауты в секундах)
+        self.API_TIMEOUT = float(os.getenv("API_TIMEOUT", "15"))
+        self.API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+        self.API_POOL_LIMIT = int(os.getenv("API_POOL_LIMIT", "100"))
+        self.API_POOL_LIMIT_PER_HOST = int(os.getenv("API_POOL_LIMIT_PER_HOST", "20"))
+        self.API_KEEPALIVE_TIMEOUT = float(os.getenv("API_KEEPALIVE_TIMEOUT", "30"))
+
+        # Кэш справочников (должности, отделы, организации): время свежести и
+        # сколько еще можно отдавать устаревшие данные, обновляя их в фоне
+        self.API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "300"))
+        self.API_CACHE_STALE_TTL = float(os.getenv("API_CACHE_STALE_TTL", "3600"))
+
         # Убедимся, что директория для логов существует
         self._ensure_log_directory()
         
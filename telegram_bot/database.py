@@ -1,9 +1,12 @@
 import os
 import json
+import asyncio
 import logging
 import sqlite3
+import threading
 import uuid
-from typing import Dict, Any, List, Optional, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import random
 import string
@@ -16,16 +19,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Размер кэша подготовленных выражений постоянного соединения
+STATEMENT_CACHE_SIZE = 256
+
+# Сотрудников на одной странице списка в боте
+STAFF_PAGE_SIZE = 5
+
+def _statement(query: str, params: tuple = ()) -> Callable[[sqlite3.Cursor], int]:
+    """Запись из одного запроса для очереди записи; результат - lastrowid"""
+    def unit(cursor: sqlite3.Cursor) -> int:
+        cursor.execute(query, params)
+        return cursor.lastrowid
+    return unit
+
+class AdminRegistry:
+    """
+    Реестр администраторов в памяти для фильтров aiogram
+
+    Загружается из таблицы admins при старте и перезагружается после
+    add_admin/remove_admin. Проверки прав - поиск в множествах без обращения
+    к БД. Множества заменяются целиком, поэтому читать их можно из любого
+    потока без блокировок.
+    """
+
+    def __init__(self):
+        self._ids = frozenset()
+        self._usernames = frozenset()
+        self._superadmin_ids = frozenset()
+
+        self.admin_checks = 0
+        self.superadmin_checks = 0
+        self.granted = 0
+        self.reloads = 0
+
+    def load(self, rows: List[sqlite3.Row]) -> None:
+        """Заменяет содержимое реестра активными админами из строк таблицы admins"""
+        active = [row for row in rows if row['is_active']]
+        self._ids = frozenset(str(row['telegram_id']) for row in active)
+        self._usernames = frozenset(row['username'] for row in active if row['username'])
+        self._superadmin_ids = frozenset(
+            str(row['telegram_id']) for row in active if row['permission_level'] == 2
+        )
+        self.reloads += 1
+
+    def is_admin(self, telegram_id: str) -> bool:
+        self.admin_checks += 1
+        telegram_id_str = str(telegram_id)
+        result = telegram_id_str in self._ids or (
+            telegram_id_str.startswith('@') and telegram_id_str.lstrip('@') in self._usernames
+        )
+        self.granted += result
+        return result
+
+    def is_superadmin(self, telegram_id: str) -> bool:
+        self.superadmin_checks += 1
+        result = str(telegram_id) in self._superadmin_ids
+        self.granted += result
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'admins': len(self._ids),
+            'superadmins': len(self._superadmin_ids),
+            'admin_checks': self.admin_checks,
+            'superadmin_checks': self.superadmin_checks,
+            'granted': self.granted,
+            'reloads': self.reloads
+        }
+
 class BotDatabase:
-    """Класс для работы с базой данных бота"""
+    """
+    Класс для работы с базой данных бота
+
+    Держит одно постоянное соединение в режиме WAL: выражения готовятся один раз
+    и берутся из кэша соединения, а не пересоздаются при каждом вызове. Доступ к
+    соединению сериализуется блокировкой, поэтому синхронные методы можно
+    вызывать из любого потока. Обработчики aiogram вызывают их через run(),
+    который выполняет метод в отдельном потоке БД и не блокирует цикл событий.
+
+    При DB_WRITE_BATCHING=true записи (create_registration_request,
+    save_invitation_code, update_employee, create_employee и write()) ставятся
+    в очередь и записываются пачкой в одной транзакции. Чтобы записи из разных
+    обработчиков попадали в одну пачку, методы записи вызываются через
+    run_write(), а не run(): поток БД занят только записью пачки.
+    """
     
-    def __init__(self, db_path: str = "bot_data.db", storage_path: str = "./data"):
+    def __init__(self, db_path: str = "bot_data.db", storage_path: str = "./data",
+                 write_batching: Optional[bool] = None):
         """Инициализация базы данных"""
         self.storage_path = storage_path
         self.db_path = os.path.join(storage_path, db_path)
         self.staff_file = os.path.join(storage_path, "staff.json")
         self.conn = None
         self.cursor = None
+        if write_batching is None:
+            write_batching = os.getenv("DB_WRITE_BATCHING", "False").lower() == "true"
+        self.write_batching = write_batching
+        self.busy_timeout = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))
+        
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._executor = None
+        self._db_thread_id = None
+        self._write_queue: List[Tuple[Callable[[sqlite3.Cursor], Any], Future]] = []
+        self._queue_lock = threading.Lock()
+        self.admins = AdminRegistry()
+        
         self.ensure_storage_exists()
         self._create_tables()
     
@@ -41,18 +140,167 @@ class BotDatabase:
                 json.dump([], f, ensure_ascii=False, indent=2)
             logger.info(f"Создан файл для хранения сотрудников: {self.staff_file}")
     
+    def _open_connection(self) -> sqlite3.Connection:
+        """Открывает постоянное соединение с БД в режиме WAL"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout}")
+        return conn
+    
     def _connect(self):
-        """Устанавливает соединение с БД"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+        """Захватывает постоянное соединение с БД (открывает его при первом вызове)"""
+        self._lock.acquire()
+        try:
+            if self.conn is None:
+                self.conn = self._open_connection()
+            self.cursor = self.conn.cursor()
+        except Exception:
+            self._lock.release()
+            raise
+        self._depth += 1
     
     def _disconnect(self):
-        """Закрывает соединение с БД"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            self.cursor = None
+        """Освобождает соединение с БД; незафиксированные изменения откатываются"""
+        self._depth -= 1
+        try:
+            if self._depth == 0 and self.conn is not None and self.conn.in_transaction:
+                self.conn.rollback()
+        finally:
+            self._lock.release()
+    
+    def close(self):
+        """Дописывает очередь записи и закрывает соединение и поток БД"""
+        if self._executor is not None:
+            self._executor.submit(self._flush_writes)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        else:
+            self._flush_writes()
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                self.cursor = None
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Поток БД создается при первом обращении"""
+        if self._executor is None:
+            with self._queue_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1,
+                        thread_name_prefix="bot-db",
+                        initializer=self._remember_db_thread
+                    )
+        return self._executor
+    
+    def _remember_db_thread(self):
+        self._db_thread_id = threading.get_ident()
+    
+    async def run(self, method: Callable, *args, **kwargs) -> Any:
+        """
+        Выполняет метод БД в потоке БД, не блокируя цикл событий
+        
+        Пример: staff = await db.run(db.get_employee_by_telegram_id, user_id)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), lambda: method(*args, **kwargs))
+    
+    async def run_write(self, method: Callable, *args, **kwargs) -> Any:
+        """
+        Выполняет метод записи вне потока БД, не блокируя цикл событий
+        
+        Метод ждет свою пачку в потоке из пула цикла событий, а поток БД тем
+        временем записывает очередь: одновременные записи попадают в одну
+        транзакцию. Без очереди записи равносилен run().
+        
+        Пример: request_id = await db.run_write(db.create_registration_request, request_data=data)
+        """
+        if not self.write_batching:
+            return await self.run(method, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: method(*args, **kwargs))
+    
+    def queue_write(self, unit: Callable[[sqlite3.Cursor], Any]) -> Future:
+        """
+        Ставит запись в очередь
+        
+        unit(cursor) выполняет запросы одной записи (без commit) и возвращает ее
+        результат. Все записи, накопившиеся пока поток БД занят, выполняются
+        одной транзакцией. Future получает результат или исключение своей
+        записи; ошибка одной записи не отменяет остальные.
+        """
+        future = Future()
+        with self._queue_lock:
+            self._write_queue.append((unit, future))
+            schedule = len(self._write_queue) == 1
+        if schedule:
+            self._get_executor().submit(self._flush_writes)
+        return future
+    
+    async def write(self, query: str, params: tuple = ()) -> int:
+        """Асинхронная запись одного запроса через очередь; возвращает lastrowid"""
+        return await asyncio.wrap_future(self.queue_write(_statement(query, params)))
+    
+    def _execute_write(self, unit: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """Выполняет запись через очередь или сразу своей транзакцией, если очередь выключена"""
+        if not self.write_batching:
+            self._connect()
+            try:
+                result = unit(self.cursor)
+                self.conn.commit()
+                return result
+            finally:
+                self._disconnect()
+        
+        future = self.queue_write(unit)
+        if threading.get_ident() == self._db_thread_id:
+            # Из потока БД ждать нельзя: очередь обработает этот же поток
+            self._flush_writes()
+        return future.result()
+    
+    def _flush_writes(self):
+        """Записывает накопившуюся очередь одной транзакцией"""
+        with self._queue_lock:
+            batch, self._write_queue = self._write_queue, []
+        if not batch:
+            return
+        
+        done = []
+        self._connect()
+        try:
+            self.cursor.execute("BEGIN")
+            for unit, future in batch:
+                # Точка сохранения изолирует ошибку одной записи от остальных
+                self.cursor.execute("SAVEPOINT queued_write")
+                try:
+                    result = unit(self.cursor)
+                except Exception as e:
+                    self.cursor.execute("ROLLBACK TO queued_write")
+                    future.set_exception(e)
+                else:
+                    done.append((future, result))
+                self.cursor.execute("RELEASE queued_write")
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Ошибка при записи пачки из {len(batch)} записей: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._disconnect()
+        
+        for future, result in done:
+            future.set_result(result)
+        if len(batch) > 1:
+            logger.debug(f"Записана пачка из {len(batch)} записей")
     
     def _create_tables(self):
         """Создает необходимые таблицы в БД"""
@@ -119,6 +367,7 @@ class BotDatabase:
         
         # Создаем индексы для ускорения поиска
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_staff_telegram_id ON staff(telegram_id)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_staff_active_created ON staff(is_active, created_at, id)')
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_admins_telegram_id ON admins(telegram_id)')
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_registration_requests_telegram_id ON registration_requests(telegram_id)')
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_invitation_codes_telegram_id ON invitation_codes(telegram_id)')
@@ -139,8 +388,22 @@ class BotDatabase:
                 logger.info(f"Создан суперадмин с ID: {admin_id}")
         
         self.conn.commit()
+        self._load_admins()
         self._disconnect()
     
+    def _load_admins(self):
+        """Перечитывает таблицу admins в реестр (вызывается при захваченном соединении)"""
+        self.cursor.execute('SELECT telegram_id, username, permission_level, is_active FROM admins')
+        self.admins.load(self.cursor.fetchall())
+    
+    def reload_admins(self):
+        """Перечитывает реестр админов, если таблицу изменили в обход бота"""
+        self._connect()
+        try:
+            self._load_admins()
+        finally:
+            self._disconnect()
+    
     def init_db(self):
         """Инициализирует базу данных и создает необходимые таблицы"""
         logger.info("Инициализация базы данных")
@@ -152,8 +415,7 @@ class BotDatabase:
     def create_employee(self, employee_data: Dict[str, Any]) -> int:
         """Создает нового сотрудника в БД"""
         try:
-            self._connect()
-            self.cursor.execute('''
+            new_id = self._execute_write(_statement('''
             INSERT INTO staff (
                 telegram_id,
                 telegram_username,
@@ -167,16 +429,12 @@ class BotDatabase:
                 employee_data['full_name'],
                 employee_data['position_id'],
                 employee_data['position_name']
-            ))
-            self.conn.commit()
-            new_id = self.cursor.lastrowid
+            )))
             logger.info(f"Создан новый сотрудник: {employee_data['full_name']} (ID: {new_id})")
             return new_id
         except Exception as e:
             logger.error(f"Ошибка при создании сотрудника: {e}")
             return 0
-        finally:
-            self._disconnect()
     
     def get_employee_by_telegram_id(self, telegram_id: str) -> Optional[Dict[str, Any]]:
         """Получает данные сотрудника по его Telegram ID"""
@@ -206,11 +464,53 @@ class BotDatabase:
         finally:
             self._disconnect()
     
+    def count_active_staff(self) -> int:
+        """Количество активных сотрудников"""
+        try:
+            self._connect()
+            self.cursor.execute('SELECT COUNT(*) as count FROM staff WHERE is_active = 1')
+            return self.cursor.fetchone()['count']
+        except Exception as e:
+            logger.error(f"Ошибка при подсчете сотрудников: {e}")
+            return 0
+        finally:
+            self._disconnect()
+    
+    def get_staff_page(self, after: Optional[Tuple[str, int]] = None, offset: int = 0,
+                       limit: int = STAFF_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Получает страницу активных сотрудников в порядке get_all_staff
+        
+        Args:
+            after: (created_at, id) последнего сотрудника предыдущей страницы;
+                   страница читается по индексу с этого места (keyset)
+            offset: смещение, если ключ предыдущей страницы неизвестен
+            limit: размер страницы
+        """
+        try:
+            self._connect()
+            if after is not None:
+                self.cursor.execute('''
+                SELECT * FROM staff
+                WHERE is_active = 1 AND (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (after[0], after[1], limit))
+            else:
+                self.cursor.execute('''
+                SELECT * FROM staff
+                WHERE is_active = 1
+                ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+                ''', (limit, offset))
+            return [dict(row) for row in self.cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка при получении страницы сотрудников: {e}")
+            return []
+        finally:
+            self._disconnect()
+    
     def update_employee(self, employee_id: int, data: Dict[str, Any]) -> bool:
         """Обновляет данные сотрудника"""
         try:
-            self._connect()
-            
             # Формируем запрос динамически на основе переданных данных
             fields = []
             values = []
@@ -222,15 +522,12 @@ class BotDatabase:
             query = f"UPDATE staff SET {', '.join(fields)} WHERE id = ?"
             values.append(employee_id)
             
-            self.cursor.execute(query, values)
-            self.conn.commit()
+            self._execute_write(_statement(query, tuple(values)))
             
             return True
         except Exception as e:
             logger.error(f"Ошибка при обновлении данных сотрудника: {e}")
             return False
-        finally:
-            self._disconnect()
     
     def delete_employee(self, telegram_id: str) -> bool:
         """Удаляет сотрудника (отмечает как неактивного)"""
@@ -267,6 +564,7 @@ class BotDatabase:
                     WHERE telegram_id = ?
                     ''', (full_name, created_by, telegram_id))
                     self.conn.commit()
+                    self._load_admins()
                     logger.info(f"Администратор с ID {telegram_id} активирован")
                     return True
                 else:
@@ -285,6 +583,7 @@ class BotDatabase:
             ''', (telegram_id, full_name, created_by))
             
             self.conn.commit()
+            self._load_admins()
             logger.info(f"Добавлен новый администратор: {full_name} (ID: {telegram_id})")
             return True
         except Exception as e:
@@ -301,6 +600,7 @@ class BotDatabase:
             UPDATE admins SET is_active = 0 WHERE telegram_id = ?
             ''', (telegram_id,))
             self.conn.commit()
+            self._load_admins()
             logger.info(f"Администратор с ID {telegram_id} деактивирован")
             return True
         except Exception as e:
@@ -310,58 +610,12 @@ class BotDatabase:
             self._disconnect()
     
     def is_admin(self, telegram_id: str) -> bool:
-        """Проверяет, является ли пользователь администратором"""
-        try:
-            self._connect()
-            
-            # Конвертируем telegram_id в строку для сравнения
-            telegram_id_str = str(telegram_id)
-            
-            # Проверяем сначала по telegram_id
-            self.cursor.execute('''
-            SELECT COUNT(*) as count FROM admins 
-            WHERE telegram_id = ? AND is_active = 1
-            ''', (telegram_id_str,))
-            
-            result = self.cursor.fetchone()
-            
-            # Проверяем, найден ли админ по ID
-            if result and result['count'] > 0:
-                return True
-                
-            # Если по ID не найден, и ID начинается с @, проверяем также по username
-            if telegram_id_str.startswith('@'):
-                username = telegram_id_str.lstrip('@')
-                self.cursor.execute('''
-                SELECT COUNT(*) as count FROM admins 
-                WHERE username = ? AND is_active = 1
-                ''', (username,))
-                
-                result = self.cursor.fetchone()
-                return result['count'] > 0
-                
-            return False
-        except Exception as e:
-            logger.error(f"Ошибка при проверке прав администратора: {e}")
-            return False
-        finally:
-            self._disconnect()
+        """Проверяет, является ли пользователь администратором (по реестру в памяти)"""
+        return self.admins.is_admin(telegram_id)
     
     def is_superadmin(self, telegram_id: str) -> bool:
-        """Проверяет, является ли пользователь супер-администратором"""
-        try:
-            self._connect()
-            self.cursor.execute('''
-            SELECT COUNT(*) as count FROM admins 
-            WHERE telegram_id = ? AND permission_level = 2 AND is_active = 1
-            ''', (telegram_id,))
-            result = self.cursor.fetchone()
-            return result['count'] > 0
-        except Exception as e:
-            logger.error(f"Ошибка при проверке прав супер-администратора: {e}")
-            return False
-        finally:
-            self._disconnect()
+        """Проверяет, является ли пользователь супер-администратором (по реестру в памяти)"""
+        return self.admins.is_superadmin(telegram_id)
     
     def get_all_admins(self) -> List[Dict[str, Any]]:
         """Получает список всех администраторов"""
@@ -453,8 +707,6 @@ class BotDatabase:
             int: ID созданной заявки или 0 в случае ошибки
         """
         try:
-            self._connect()
-            
             # Если передан словарь с данными, используем его
             if request_data:
                 telegram_id = request_data.get('telegram_id', telegram_id)
@@ -467,35 +719,36 @@ class BotDatabase:
                 logger.error(f"Не заполнены обязательные поля для создания заявки: telegram_id={telegram_id}, user_full_name={user_full_name}")
                 return 0
             
-            # Проверяем, есть ли уже активная заявка от этого пользователя
-            self.cursor.execute('''
-            SELECT COUNT(*) as count FROM registration_requests 
-            WHERE telegram_id = ? AND status = 'pending'
-            ''', (telegram_id,))
-            
-            if self.cursor.fetchone()['count'] > 0:
+            def insert_request(cursor: sqlite3.Cursor) -> int:
+                # Проверяем, есть ли уже активная заявка от этого пользователя
+                # (в той же транзакции, что и вставка)
+                cursor.execute('''
+                SELECT COUNT(*) as count FROM registration_requests 
+                WHERE telegram_id = ? AND status = 'pending'
+                ''', (telegram_id,))
+                if cursor.fetchone()['count'] > 0:
+                    return 0
+                
+                # Создаем новую заявку
+                cursor.execute('''
+                INSERT INTO registration_requests (
+                    telegram_id,
+                    telegram_username,
+                    user_full_name,
+                    approximate_position
+                ) VALUES (?, ?, ?, ?)
+                ''', (telegram_id, telegram_username, user_full_name, approximate_position))
+                return cursor.lastrowid
+            
+            new_id = self._execute_write(insert_request)
+            if not new_id:
                 logger.warning(f"У пользователя {telegram_id} уже есть активная заявка")
                 return 0
-            
-            # Создаем новую заявку
-            self.cursor.execute('''
-            INSERT INTO registration_requests (
-                telegram_id,
-                telegram_username,
-                user_full_name,
-                approximate_position
-            ) VALUES (?, ?, ?, ?)
-            ''', (telegram_id, telegram_username, user_full_name, approximate_position))
-            
-            self.conn.commit()
-            new_id = self.cursor.lastrowid
             logger.info(f"Создана новая заявка на регистрацию от пользователя {user_full_name} (ID: {new_id})")
             return new_id
         except Exception as e:
             logger.error(f"Ошибка при создании заявки на регистрацию: {e}")
             return 0
-        finally:
-            self._disconnect()
     
     def get_registration_request(self, request_id: int) -> Optional[Dict[str, Any]]:
         """Получает данные заявки по её ID"""
@@ -605,17 +858,18 @@ class BotDatabase:
         Returns:
             bool: True если код успешно сохранен, False в противном случае
         """
-        try:
-            self._connect()
-            
+        def insert_code(cursor: sqlite3.Cursor) -> Optional[str]:
             # Получаем данные заявки
-            request = self.get_registration_request(request_id)
+            cursor.execute(
+                'SELECT telegram_id, processed_by FROM registration_requests WHERE id = ?',
+                (request_id,)
+            )
+            request = cursor.fetchone()
             if not request:
-                logger.error(f"Не удалось найти заявку с ID {request_id}")
-                return False
+                return None
             
             # Добавляем запись о коде приглашения
-            self.cursor.execute('''
+            cursor.execute('''
             INSERT INTO invitation_codes (
                 code, 
                 telegram_id, 
@@ -626,29 +880,32 @@ class BotDatabase:
             ) VALUES (?, ?, ?, ?, ?, ?)
             ''', (
                 code,
-                request.get('telegram_id'),
+                request['telegram_id'],
                 position_id,
                 position_name,
                 expires_at,
-                request.get('processed_by')
+                request['processed_by']
             ))
             
             # Обновляем запись о заявке - добавляем отдел если есть
             if division_id and division_name:
-                self.cursor.execute('''
+                cursor.execute('''
                 UPDATE registration_requests 
                 SET division_id = ?, division_name = ? 
                 WHERE id = ?
                 ''', (division_id, division_name, request_id))
-            
-            self.conn.commit()
-            logger.info(f"Сохранен код приглашения {code} для пользователя {request.get('telegram_id')}")
+            return request['telegram_id']
+        
+        try:
+            telegram_id = self._execute_write(insert_code)
+            if telegram_id is None:
+                logger.error(f"Не удалось найти заявку с ID {request_id}")
+                return False
+            logger.info(f"Сохранен код приглашения {code} для пользователя {telegram_id}")
             return True
         except Exception as e:
             logger.error(f"Ошибка при сохранении кода приглашения: {e}")
             return False
-        finally:
-            self._disconnect()
     
     def generate_position_code(self, telegram_id: str, position_id: int, position_name: str, admin_id: str) -> str:
         """Генерирует уникальный код для должности"""
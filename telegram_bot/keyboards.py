@@ -226,22 +226,22 @@ def get_back_to_main_keyboard() -> InlineKeyboardMarkup:
     ]
     return InlineKeyboardMarkup(inline_keyboard=kb)
 
-def get_staff_list_keyboard(staff: List[Dict[str, Any]], page: int = 0, per_page: int = 5) -> InlineKeyboardMarkup:
-    """Создает клавиатуру для списка сотрудников с пагинацией"""
+def get_staff_list_keyboard(staff: List[Dict[str, Any]], page: int = 0, total: int = 0, per_page: int = 5) -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру для страницы списка сотрудников
+    
+    staff - только сотрудники текущей страницы, total - общее их количество
+    """
     kb = []
     
-    # Пагинация
-    total_pages = (len(staff) + per_page - 1) // per_page
-    start_idx = page * per_page
-    end_idx = min(start_idx + per_page, len(staff))
+    total_pages = max((total + per_page - 1) // per_page, 1)
     
     # Выводим текущую страницу сотрудников
-    for i in range(start_idx, end_idx):
-        staff = staff[i]
+    for employee in staff:
         kb.append([
             InlineKeyboardButton(
-                text=f"{staff['name']} - {staff['position']}",
-                callback_data=f"staff_{staff['id']}"
+                text=f"{employee['full_name']} - {employee['position_name']}",
+                callback_data=f"staff_{employee['id']}"
             )
         ])
     
@@ -10,6 +10,7 @@ from config import Config
 from admin_handlers import register_admin_handlers
 from registration_handlers import register_registration_handlers
 from database import BotDatabase
+from api_client import api_client
 
 # Настройка логирования
 logging.basicConfig(
@@ -56,7 +57,12 @@ async def main():
     
     # Запуск поллинга
     logger.info("Бот запущен и ожидает сообщений")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Закрываем общий пул HTTP-соединений с API и соединение с БД
+        await api_client.close()
+        db.close()
 
 if __name__ == "__main__":
     try:
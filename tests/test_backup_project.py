@@ -0,0 +1,102 @@
+import hashlib
+import os
+from datetime import datetime
+
+import pytest
+
+import backup_project
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время бэкапов: манифесты с разным created"""
+    class Clock(datetime):
+        current = datetime(2025, 4, 1, 12, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    monkeypatch.setattr(backup_project, "datetime", Clock)
+    return Clock
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup_project, "CHUNK_SIZE", 16)
+    root = tmp_path / "project"
+    (root / "app").mkdir(parents=True)
+    (root / "app" / "main.py").write_text("print('v1')\n" * 8, encoding="utf-8")
+    (root / "data.xlsx").write_bytes(bytes(range(40)))
+    (root / "__pycache__").mkdir()
+    (root / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"cache")
+    return root
+
+
+def stored_objects(store):
+    objects = set()
+    for dirpath, _, files in os.walk(os.path.join(store, "objects")):
+        objects.update(name.split(".")[0] for name in files)
+    return objects
+
+
+def snapshot(root):
+    return {
+        os.path.relpath(os.path.join(dirpath, name), root): open(os.path.join(dirpath, name), "rb").read()
+        for dirpath, _, files in os.walk(root)
+        for name in files
+    }
+
+
+def test_incremental_backup_stores_only_new_chunks_and_restores_both_versions(project, tmp_path, clock, monkeypatch):
+    store = str(tmp_path / "store")
+    first_files = snapshot(project)
+    del first_files[os.path.join("__pycache__", "main.cpython-311.pyc")]
+
+    first = backup_project.create_incremental_backup(str(project), store, workers=2)
+    objects_after_first = stored_objects(store)
+
+    # Меняем один чанк одного файла
+    main_py = project / "app" / "main.py"
+    content = bytearray(main_py.read_bytes())
+    content[20:22] = b"v2"
+    main_py.write_bytes(bytes(content))
+    stat = os.stat(main_py)
+    os.utime(main_py, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second_files = dict(first_files, **{os.path.join("app", "main.py"): bytes(content)})
+
+    read = []
+    real_backup_file = backup_project.backup_file
+    monkeypatch.setattr(backup_project, "backup_file",
+                        lambda store, root, rel_path: read.append(rel_path) or real_backup_file(store, root, rel_path))
+    clock.current = datetime(2025, 4, 1, 13, 0)
+    second = backup_project.create_incremental_backup(str(project), store, workers=2)
+
+    assert read == [os.path.join("app", "main.py")]
+    assert stored_objects(store) - objects_after_first == {hashlib.sha256(bytes(content[16:32])).hexdigest()}
+    assert backup_project.manifest_paths(store) == [first, second]
+
+    restored = tmp_path / "restored_first"
+    assert backup_project.restore_backup(str(restored), datetime(2025, 4, 1, 12, 30), store) == first
+    assert snapshot(restored) == first_files
+
+    restored = tmp_path / "restored_second"
+    assert backup_project.restore_backup(str(restored), None, store) == second
+    assert snapshot(restored) == second_files
+    assert os.stat(restored / "app" / "main.py").st_mtime_ns == os.stat(main_py).st_mtime_ns
+
+    with pytest.raises(FileNotFoundError):
+        backup_project.restore_backup(str(tmp_path / "too_early"), datetime(2025, 4, 1, 11, 0), store)
+
+
+def test_restore_detects_corrupted_chunk(project, tmp_path, clock):
+    store = str(tmp_path / "store")
+    backup_project.create_incremental_backup(str(project), store)
+
+    digest = backup_project.load_manifest(backup_project.manifest_paths(store)[0])["files"]["data.xlsx"]["chunks"][0]
+    # Уже сжатые форматы хранятся без gzip
+    with open(backup_project.object_path(store, digest), "wb") as f:
+        f.write(b"\0" * 16)
+
+    with pytest.raises(ValueError):
+        backup_project.restore_backup(str(tmp_path / "restored"), None, store)
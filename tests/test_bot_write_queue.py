@@ -0,0 +1,98 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from database import BotDatabase
+
+
+@pytest.fixture
+def batching_db(tmp_path, monkeypatch):
+    # Суперадмин по умолчанию берется из конфигурации бота
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("ADMIN_IDS", "123456789")
+    db = BotDatabase(storage_path=str(tmp_path), write_batching=True)
+    yield db
+    db.close()
+
+
+def trace_transactions(db):
+    """Собирает BEGIN/COMMIT постоянного соединения"""
+    statements = []
+    db._connect()
+    try:
+        db.conn.set_trace_callback(
+            lambda sql: statements.append(sql.split()[0].upper()) if sql.split()[0].upper() in ("BEGIN", "COMMIT") else None
+        )
+    finally:
+        db._disconnect()
+    return statements
+
+
+def test_concurrent_writes_commit_in_one_transaction(batching_db):
+    db = batching_db
+    staff_insert = "INSERT INTO staff (telegram_id, full_name, position_id, position_name) VALUES (?, ?, 1, 'Инженер')"
+    db._flush_writes()  # открывает соединение
+    statements = trace_transactions(db)
+
+    async def scenario():
+        # Пока поток БД занят, записи копятся в очереди
+        release = threading.Event()
+        blocker = asyncio.ensure_future(db.run(release.wait))
+        await asyncio.sleep(0.05)
+        writes = [
+            db.write(staff_insert, ("100", "Первый")),
+            db.write(staff_insert, ("100", "Дубликат")),
+            db.write(staff_insert, ("101", "Второй")),
+            db.write(staff_insert, ("102", "Третий")),
+        ]
+        tasks = [asyncio.ensure_future(write) for write in writes]
+        await asyncio.sleep(0.05)
+        assert len(db._write_queue) == 4
+        release.set()
+        await blocker
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    # Ошибка дубликата достается только своей записи
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert all(isinstance(result, int) and result > 0 for result in results[::2] + results[3:])
+    assert statements == ["BEGIN", "COMMIT"]
+
+    db._connect()
+    try:
+        db.cursor.execute("SELECT telegram_id, full_name FROM staff ORDER BY telegram_id")
+        rows = [tuple(row) for row in db.cursor.fetchall()]
+    finally:
+        db._disconnect()
+    assert rows == [("100", "Первый"), ("101", "Второй"), ("102", "Третий")]
+
+
+def test_handler_writes_go_through_queue(batching_db):
+    db = batching_db
+
+    async def scenario():
+        first = await db.run_write(db.create_registration_request, request_data={
+            "telegram_id": "200", "user_full_name": "Заявитель"
+        })
+        duplicate = await db.run_write(db.create_registration_request, telegram_id="200", user_full_name="Заявитель")
+        saved = await db.run_write(db.save_invitation_code, request_id=first, code="ABC123",
+                                   position_id=1, position_name="Инженер")
+        missing = await db.run_write(db.save_invitation_code, request_id=first + 1, code="XYZ789",
+                                     position_id=1, position_name="Инженер")
+        return first, duplicate, saved, missing
+
+    first, duplicate, saved, missing = asyncio.run(scenario())
+
+    assert first > 0
+    assert duplicate == 0
+    assert saved is True
+    assert missing is False
+    db._connect()
+    try:
+        db.cursor.execute("SELECT code, telegram_id FROM invitation_codes")
+        assert [tuple(row) for row in db.cursor.fetchall()] == [("ABC123", "200")]
+    finally:
+        db._disconnect()
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+import deprecated_terms
+from deprecated_terms import PROFILES, replace_file, scan_directory, scan_file
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(deprecated_terms, "CACHE_DIR", str(tmp_path / "cache"))
+    root = tmp_path / "project"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "models.py").write_text(
+        "import os\n"
+        "class Employee:\n"
+        "    pass\n"
+        "\n"
+        "employee = Employee()  # department\n",
+        encoding="utf-8",
+    )
+    (root / "notes.txt").write_text("нет терминов\n", encoding="utf-8")
+    (root / "blob.txt").write_bytes(b"\0\1employee\n")
+    return root
+
+
+def test_scan_reports_line_numbers_and_all_matches_per_line(tree):
+    matches = scan_file(str(tree), os.path.join("pkg", "models.py"), PROFILES["search"])
+
+    assert [(line.line_number, line.matches) for line in matches] == [
+        (2, ("Employee",)),
+        (5, ("employee", "Employee", "department")),
+    ]
+    assert matches[1].content == "employee = Employee()  # department"
+
+
+def test_binary_files_are_skipped(tree):
+    results, total = scan_directory(str(tree), PROFILES["search"], use_cache=False)
+
+    assert sorted(results) == [os.path.join("pkg", "models.py")]
+    assert total == 4
+
+
+def test_cache_rescans_only_files_with_changed_mtime(tree, monkeypatch):
+    profile = PROFILES["search"]
+    scan_directory(str(tree), profile, workers=1)
+
+    scanned = []
+    real_scan = deprecated_terms._scan_in_worker
+    monkeypatch.setattr(deprecated_terms, "_scan_in_worker",
+                        lambda rel_path: scanned.append(rel_path) or real_scan(rel_path))
+
+    results, total = scan_directory(str(tree), profile, workers=1)
+    assert scanned == []
+    assert total == 4
+
+    notes = tree / "notes.txt"
+    notes.write_text("теперь есть employee\n", encoding="utf-8")
+    stat = os.stat(notes)
+    os.utime(notes, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    results, total = scan_directory(str(tree), profile, workers=1)
+    assert scanned == ["notes.txt"]
+    assert total == 5
+    assert results["notes.txt"][0].line_number == 1
+
+
+def test_replace_cli_rewrites_files_and_reports_counts(tree, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["deprecated_terms.py", "--dir", str(tree), "--replace"])
+
+    assert deprecated_terms.main() == 0
+
+    output = capsys.readouterr().out
+    assert f"{os.path.join('pkg', 'models.py')}: 4 замен" in output
+    assert "Выполнено 4 замен в 1 из 3 файлов" in output
+    assert (tree / "pkg" / "models.py").read_text(encoding="utf-8") == (
+        "import os\n"
+        "class Staff:\n"
+        "    pass\n"
+        "\n"
+        "staff = Staff()  # division\n"
+    )
+    assert (tree / "blob.txt").read_bytes() == b"\0\1employee\n"
+
+
+def test_failed_replace_removes_temp_file_and_keeps_original(tree, monkeypatch):
+    path = tree / "pkg" / "models.py"
+    original = path.read_bytes()
+
+    def broken_replace(src, dst):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(deprecated_terms.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        replace_file(str(tree), os.path.join("pkg", "models.py"), PROFILES["replace"])
+
+    assert sorted(os.listdir(tree / "pkg")) == ["models.py"]
+    assert path.read_bytes() == original